@@ -0,0 +1,264 @@
+# Copyright 2015 Maxime Terras <maxime.terras@numergy.com>
+# Copyright 2015 Pierre Padrixe <pierre.padrixe@gmail.com>
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+
+# Time to live (in seconds) of cached GET responses by entity type.
+# Responses for entity types not listed here are never cached.
+CACHE_TTL = {
+    'enterprises': 300,
+    'enterpriseprofiles': 300,
+    'domaintemplates': 300,
+    'l2domaintemplates': 300,
+    'zonetemplates': 300,
+    'subnettemplates': 300,
+    'licenses': 3600,
+    'vsps': 3600,
+    'vsds': 600,
+    'metadatatags': 600,
+}
+
+# Count of responses kept in cache. Least recently used are evicted first
+CACHE_MAX_ENTRIES = 1000
+
+
+def url_path(url):
+    """Return url without query string nor leading and trailing slash"""
+    return url.split('?')[0].strip('/')
+
+
+def entity_type(url):
+    """Return the entity type of an url, ie the last collection of its path:
+       enterprises/<id> and <parent>/<id>/enterprises are both enterprises"""
+    path = url_path(url).split('/')
+    if len(path) % 2 == 0:
+        return path[-2]
+    return path[-1]
+
+
+class ResponseCache(object):
+    """Cache of GET responses stored in a SQLite database, shared by all
+       vsd processes of a user"""
+    def __init__(self, path, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        data_dir = os.path.dirname(path)
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                       " key TEXT PRIMARY KEY,"
+                       " path TEXT,"
+                       " entity TEXT,"
+                       " expiry REAL,"
+                       " used REAL,"
+                       " data TEXT)")
+            db.execute("CREATE INDEX IF NOT EXISTS responses_entity"
+                       " ON responses (entity)")
+        os.chmod(path, 0o600)
+
+    @contextmanager
+    def _connect(self):
+        # One connection per call: connections can not be shared by threads
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def is_cacheable(self, url):
+        return self.ttl.get(entity_type(url), 0) > 0
+
+    def get(self, key):
+        """Return cached objects for key, or None if missing or expired"""
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT data FROM responses"
+                             " WHERE key = ? AND expiry > ?",
+                             (key, now)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE responses SET used = ? WHERE key = ?",
+                       (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, url, objects):
+        """Store objects returned by url for key and evict expired and least
+           recently used entries"""
+        ttl = self.ttl.get(entity_type(url), 0)
+        if ttl <= 0:
+            return
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO responses"
+                       " (key, path, entity, expiry, used, data)"
+                       " VALUES (?, ?, ?, ?, ?, ?)",
+                       (key, url_path(url), entity_type(url), now + ttl, now,
+                        json.dumps(objects)))
+            db.execute("DELETE FROM responses WHERE expiry <= ?", (now,))
+            db.execute("DELETE FROM responses WHERE key IN ("
+                       " SELECT key FROM responses ORDER BY used DESC"
+                       " LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def invalidate(self, url):
+        """Forget responses of url, of its children and of every collection
+           holding objects of the same entity type"""
+        path = url_path(url)
+        with self._connect() as db:
+            db.execute("DELETE FROM responses"
+                       " WHERE path = ? OR substr(path, 1, ?) = ?"
+                       " OR entity = ?",
+                       (path, len(path) + 1, path + '/', entity_type(url)))
+
+
+# Time to live (in seconds) of names resolved for name:<path> references
+NAME_TTL = 300
+
+# Collections from the root of the VSD down to objects of each entity type,
+# for name:<path> references. Paths of one entity type have different
+# lengths
+NAME_PATHS = {
+    'enterprises': [['enterprises']],
+    'gateways': [['gateways']],
+    'vms': [['vms']],
+    'domains': [['enterprises', 'domains']],
+    'l2domains': [['enterprises', 'l2domains']],
+    'domaintemplates': [['enterprises', 'domaintemplates']],
+    'l2domaintemplates': [['enterprises', 'l2domaintemplates']],
+    'groups': [['enterprises', 'groups']],
+    'users': [['enterprises', 'users']],
+    'zones': [['enterprises', 'domains', 'zones']],
+    'subnets': [['enterprises', 'domains', 'zones', 'subnets']],
+    'vports': [['enterprises', 'l2domains', 'vports'],
+               ['enterprises', 'domains', 'zones', 'subnets', 'vports']],
+    'ports': [['gateways', 'ports']],
+}
+
+# Attribute holding the name of objects, when it is not name
+NAME_FIELDS = {
+    'users': 'userName',
+}
+
+
+class NameCache(object):
+    """Cache of names and IDs of the objects of collections, shared by all
+       vsd processes of a user. A collection is listed at once, so that
+       its other names are resolved without request. Names are kept per
+       scope, the VSD, user and enterprise they were resolved with"""
+    def __init__(self, path, ttl=NAME_TTL):
+        self.path = path
+        self.ttl = ttl
+        data_dir = os.path.dirname(path)
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        with self._connect() as db:
+            columns = [row[1] for row in
+                       db.execute("PRAGMA table_info(names)")]
+            if columns and 'scope' not in columns:
+                # Names cached by former versions are not scoped
+                db.execute("DROP TABLE names")
+            db.execute("CREATE TABLE IF NOT EXISTS names ("
+                       " scope TEXT,"
+                       " collection TEXT,"
+                       " name TEXT,"
+                       " id TEXT,"
+                       " expiry REAL,"
+                       " PRIMARY KEY (scope, collection, name, id))")
+        os.chmod(path, 0o600)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, scope, collection, name):
+        """Return sorted IDs of name in collection, empty if missing or
+           expired"""
+        with self._connect() as db:
+            rows = db.execute("SELECT id FROM names WHERE scope = ?"
+                              " AND collection = ? AND name = ?"
+                              " AND expiry > ? ORDER BY id",
+                              (scope, collection, name,
+                               time.time())).fetchall()
+        return [row[0] for row in rows]
+
+    def set(self, scope, collection, names):
+        """Replace names of collection by names, pairs of name and ID, and
+           forget expired names"""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM names WHERE (scope = ? AND"
+                       " collection = ?) OR expiry <= ?",
+                       (scope, collection, now))
+            db.executemany("INSERT OR REPLACE INTO names"
+                           " (scope, collection, name, id, expiry)"
+                           " VALUES (?, ?, ?, ?, ?)",
+                           [(scope, collection, name, obj_id,
+                             now + self.ttl)
+                            for name, obj_id in names])
+
+    def invalidate(self, scope, url):
+        """Forget names of every collection holding objects of the entity
+           type of url"""
+        entity = entity_type(url)
+        with self._connect() as db:
+            db.execute("DELETE FROM names WHERE scope = ?"
+                       " AND (collection = ? OR collection LIKE ?)",
+                       (scope, entity, '%/' + entity))
+
+
+def resolve_name(nc, cache, scope, entity, path, refresh=False):
+    """Return ID of the object of entity type reached by path, the names of
+       the object and of its parents from the root separated by /. Raise
+       ValueError if path does not lead to this entity type and LookupError
+       if a name is not found or is shared by several objects"""
+    names = path.split('/')
+    collections = [c for c in NAME_PATHS.get(entity, [])
+                   if len(c) == len(names)]
+    if entity not in NAME_PATHS:
+        raise ValueError('Names of %s can not be resolved' % entity)
+    if not collections:
+        raise ValueError('Path of a %s is %s' % (entity[:-1], ' or '.join(
+            '/'.join(c[:-1] for c in p) for p in NAME_PATHS[entity])))
+    url = ''
+    for collection, name in zip(collections[0], names):
+        url += collection
+        ids = [] if refresh else cache.get(scope, url, name)
+        if not ids:
+            field = NAME_FIELDS.get(collection, 'name')
+            pairs = set((obj[field], obj['ID']) for obj in nc.get(url)
+                        if obj.get(field))
+            cache.set(scope, url, pairs)
+            ids = sorted(obj_id for n, obj_id in pairs if n == name)
+        if not ids:
+            raise LookupError('Cannot find %s named %s' %
+                              (collection[:-1], name))
+        if len(ids) > 1:
+            raise LookupError('Several %s named %s: %s' %
+                              (collection, name, ', '.join(ids)))
+        url = '%s/%s/' % (collection, ids[0])
+    return ids[0]
@@ -16,6 +16,167 @@
 
 import json
 import base64
+import itertools
+import threading
+from contextlib import contextmanager
+
+
+# Renew API key when it expires in less than this count of seconds
+APIKEY_EXPIRY_MARGIN = 60
+
+# Adaptive page size never grows over this count of objects per page
+PAGE_SIZE_MAX = 500
+
+# Count of objects per page when X-Nuage-PageSize is not set
+PAGE_SIZE_DEFAULT = 50
+
+# API keys of this process, by VSD, user and enterprise
+_api_sessions = {}
+_api_sessions_lock = threading.Lock()
+
+
+@contextmanager
+def _locked_file(path):
+    """Hold an exclusive lock on path, shared with other processes"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_json(path, default):
+    try:
+        with open(path) as data_file:
+            return json.load(data_file)
+    except (IOError, OSError, ValueError):
+        return default
+
+
+def _dump_json_atomic(path, data):
+    """Write data in a temporary file then move it to path, so readers
+       see either the old or the new content"""
+    import os
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w') as data_file:
+            json.dump(data, data_file)
+        os.rename(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _api_session_is_valid(api_session):
+    import time
+    if not isinstance(api_session, dict) or 'APIKeyExpiry' not in api_session:
+        return False
+    return (int(api_session['APIKeyExpiry']) / 1000 - APIKEY_EXPIRY_MARGIN >
+            time.time())
+
+
+def _count_connections(manager, count):
+    """Make connection pools of an urllib3 pool manager call count() each
+       time a TCP connection is opened"""
+    if getattr(manager, 'counted', False):
+        return
+
+    def counting_pool(pool_cls):
+        class Connection(pool_cls.ConnectionCls):
+            def connect(self):
+                count()
+                return super(Connection, self).connect()
+
+        class Pool(pool_cls):
+            ConnectionCls = Connection
+        return Pool
+
+    manager.pool_classes_by_scheme = dict(
+        (scheme, counting_pool(pool_cls))
+        for scheme, pool_cls in manager.pool_classes_by_scheme.items())
+    manager.counted = True
+
+
+def _strip_json_array(chunks):
+    """Yield chunks of a JSON array body without its enclosing brackets,
+       without decoding it. Bytes that could be the closing bracket are only
+       yielded once more data follows them"""
+    started = False
+    held = b''
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+            if chunk[:1] != b'[':
+                # Not an array: pass the body as is
+                for chunk in itertools.chain([chunk], chunks):
+                    yield chunk
+                return
+            chunk = chunk[1:]
+        data = held + chunk
+        end = len(data.rstrip(b' \t\r\n]'))
+        held = data[end:]
+        if end:
+            yield data[:end]
+    held = held.rstrip()
+    if held.endswith(b']'):
+        held = held[:-1]
+    if held:
+        yield held
+
+
+def _last_page(offset, count, page_size):
+    """Return page and page size of the smallest request for count objects
+       from offset. Pages are numbered in page size unit: page size must
+       divide offset"""
+    for size in range(count, page_size):
+        if offset % size == 0:
+            return offset // size, size
+    return offset // page_size, page_size
+
+
+def imap_parallel(func, iterable, workers):
+    """Yield func(item) for each item of iterable, in order, with up to
+       `workers` calls running concurrently. No more than `workers` results
+       are computed ahead of the caller. An exception raised by func
+       (SystemExit on VSD error included) is raised again to the caller"""
+    if workers <= 1:
+        for item in iterable:
+            yield func(item)
+        return
+    from collections import deque
+    from itertools import islice
+    from multiprocessing.pool import ThreadPool
+
+    def call(item):
+        try:
+            return True, func(item)
+        except BaseException as error:
+            return False, error
+
+    items = iter(iterable)
+    pool = ThreadPool(workers)
+    try:
+        pending = deque(pool.apply_async(call, (item,))
+                        for item in islice(items, workers))
+        while pending:
+            success, result = pending.popleft().get()
+            for item in islice(items, 1):
+                pending.append(pool.apply_async(call, (item,)))
+            if not success:
+                raise result
+            yield result
+    finally:
+        pool.terminate()
 
 
 class VSDConnection(object):
@@ -29,20 +190,30 @@ class VSDConnection(object):
 
     def __init__(self, username, password, enterprise,
                  api, api_version, disable_proxy=False, proxy={},
-                 debug=False, force_auth=False):
+                 debug=False, force_auth=False, pool_size=10,
+                 keep_alive=True, page_workers=1, page_size=None,
+                 adaptive_page_size=False, cache=None, refresh_cache=False,
+                 names=None):
         if api.endswith('/'):
             self.base_url = '%snuage/api/v%s/' % (api, api_version)
         else:
             self.base_url = '%s/nuage/api/v%s/' % (api, api_version)
         self.username = username
+        self.enterprise = enterprise
+        # API keys are cached per VSD, user and enterprise
+        self.api_session_id = '%s@%s %s' % (username, enterprise,
+                                            self.base_url)
         #  in byte
         auth_base64 = self._encode_b64(username + ":" + password)
+        self.password_auth = "XREST %s" % auth_base64
+        # Headers shared by all requests. Never modified once set, each
+        # request works on its own copy (see _request_headers)
         self.headers = {
-            'Authorization': "XREST %s" % auth_base64,
             'Content-Type': "application/json",
             'X-Nuage-Organization': enterprise
         }
         self.debug = debug
+        self._local = threading.local()
         self.force_auth = force_auth
         if disable_proxy:
             self.proxies = {
@@ -54,16 +225,100 @@ class VSDConnection(object):
                 self.proxies = proxy
             else:
                 self.proxies = None
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.page_workers = page_workers
+        self.page_size = page_size
+        self.adaptive_page_size = adaptive_page_size
+        self.cache = cache
+        self.refresh_cache = refresh_cache
+        # Path of the NameCache database of name:<path> references
+        self.names = names
+        self.timeout = 10
+        self.session = None
+        self.requests_count = 0
+        self.connections_count = 0
+        # A connection can be shared by threads: protect session creation,
+        # counters and debug output
+        self._lock = threading.Lock()
+        self._print_lock = threading.Lock()
+
+    @property
+    def debug(self):
+        """Print requests and responses, of all threads or only of threads
+           running thread_debug"""
+        return self._debug or getattr(self._local, 'debug', False)
+
+    @debug.setter
+    def debug(self, debug):
+        self._debug = debug
+
+    @contextmanager
+    def thread_debug(self, debug=True):
+        """Print requests and responses sent by this thread, for instance
+           those of one client of vsd serve"""
+        self._local.debug = debug
+        try:
+            yield
+        finally:
+            self._local.debug = False
+
+    def _count_connection(self):
+        with self._lock:
+            self.connections_count += 1
+
+    def _get_session(self):
+        """Return the HTTP session, created on first use. The session keeps
+           up to pool_size connections open and reuses them across requests"""
+        with self._lock:
+            if self.session is None:
+                self.session = self._new_session()
+        return self.session
 
-    def _do_request(self, method, url, headers=None, params=None):
+    def _new_session(self):
         import requests
         requests.packages.urllib3.disable_warnings()
-        try:
-            data = json.dumps(params) if params is not None else None
-            if self.debug:
-                print_headers = "# Headers:"
-                for line in json.dumps(headers, indent=4).split('\n'):
-                    print_headers += '\n#    %s' % line
+        count = self._count_connection
+
+        class CountingAdapter(requests.adapters.HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super(CountingAdapter, self).init_poolmanager(*args, **kwargs)
+                _count_connections(self.poolmanager, count)
+
+            def proxy_manager_for(self, *args, **kwargs):
+                manager = super(CountingAdapter, self).proxy_manager_for(
+                    *args, **kwargs)
+                _count_connections(manager, count)
+                return manager
+
+        adapter = CountingAdapter(pool_connections=1,
+                                  pool_maxsize=self.pool_size,
+                                  pool_block=True)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def connection_stats(self):
+        """Return a dict with count of requests sent, connections opened
+           and connections reused"""
+        return {'requests': self.requests_count,
+                'opened': self.connections_count,
+                'reused': max(self.requests_count - self.connections_count,
+                              0)}
+
+    def _do_request(self, method, url, headers=None, params=None,
+                    stream=False):
+        import requests
+        session = self._get_session()
+        if not self.keep_alive:
+            headers = dict(headers, Connection='close')
+        data = json.dumps(params) if params is not None else None
+        if self.debug:
+            print_headers = "# Headers:"
+            for line in json.dumps(headers, indent=4).split('\n'):
+                print_headers += '\n#    %s' % line
+            with self._print_lock:
                 print('#####################################################')
                 print('# Request')
                 print('# Method: %s' % method)
@@ -71,9 +326,14 @@ class VSDConnection(object):
                 print(print_headers)
                 print("# Parameters: %s" % data)
                 print('#####################################################')
-            response = requests.request(method, url, headers=headers,
-                                        verify=False, timeout=10, data=data,
-                                        proxies=self.proxies)
+        with self._lock:
+            self.requests_count += 1
+        try:
+            response = session.request(method, url, headers=headers,
+                                       verify=False, timeout=self.timeout,
+                                       data=data,
+                                       proxies=self.proxies,
+                                       stream=stream)
         except requests.exceptions.RequestException as error:
             print('Error: Unable to connect.')
             print('Detail: %s' % error)
@@ -83,14 +343,26 @@ class VSDConnection(object):
             for line in json.dumps(dict(response.headers),
                                    indent=4).split('\n'):
                 print_headers += '\n#    %s' % line
-            print('# Response')
-            print('# Status code: %s' % response)
-            print(print_headers)
-            print('# Body: %s' % response.text)
-            print('#####################################################')
-            print('')
+            with self._print_lock:
+                print('# Response')
+                print('# Status code: %s' % response)
+                print(print_headers)
+                if stream:
+                    print('# Body: <streamed>')
+                else:
+                    print('# Body: %s' % response.text)
+                print('#####################################################')
+                print('')
         return response
 
+    def _request_headers(self, headers={}, authorization=None):
+        """Return a new dict of headers for one request: shared headers,
+           Authorization then headers given by the caller"""
+        h = self.headers.copy()
+        h['Authorization'] = authorization or self.authenticate()
+        h.update(headers)
+        return h
+
     def _response(self, resp):
         if resp.status_code == 401:
             print('Error: Athentication failed. '
@@ -117,7 +389,56 @@ class VSDConnection(object):
         return wrapper
 
     @remove_extra_slash_url
-    def get(self, url, filter=None, headers={}):
+    def get(self, url, filter=None, headers={}, limit=None, page=None):
+        return list(self.iter_get(url, filter=filter, headers=headers,
+                                  limit=limit, page=page))
+
+    @remove_extra_slash_url
+    def iter_get(self, url, filter=None, headers={}, limit=None, page=None):
+        """Yield objects page by page. Next page is only requested once
+           the objects of the previous one have been consumed.
+           With limit, paging stops once limit objects are yielded. With
+           page, only this page is requested, limit being its size"""
+        if self.cache is None or not self.cache.is_cacheable(url):
+            for obj in self._iter_get(url, filter, headers, limit, page):
+                yield obj
+            return
+        key = json.dumps([self.base_url + url, filter, self.username,
+                          self.enterprise, sorted(headers.items()), limit,
+                          page])
+        if not self.refresh_cache:
+            objects = self.cache.get(key)
+            if objects is not None:
+                if self.debug:
+                    print('# Response from cache: %s' % url)
+                for obj in objects:
+                    yield obj
+                return
+        objects = []
+        for obj in self._iter_get(url, filter, headers, limit, page):
+            objects.append(obj)
+            yield obj
+        self.cache.set(key, url, objects)
+
+    @remove_extra_slash_url
+    def count(self, url, filter=None, headers={}):
+        """Return count of objects of url, read in X-Nuage-Count of a
+           single page of one object"""
+        request_headers = self._request_headers()
+        if filter:
+            request_headers['X-Nuage-Filter'] = filter
+        request_headers.update(headers)
+        request_headers['X-Nuage-PageSize'] = '1'
+        request_headers['X-Nuage-Page'] = '0'
+        r = self._do_request('GET', self.base_url + url,
+                             headers=request_headers)
+        objects = self._response(r)
+        if 'X-Nuage-Count' not in r.headers:
+            # Not paged: the whole collection is in the response
+            return len(objects)
+        return int(r.headers['X-Nuage-Count'])
+
+    def _iter_get(self, url, filter, headers, limit=None, page=None):
         def _next_page_is_invalid(headers):
             if ('X-Nuage-PageSize' not in headers or
                     'X-Nuage-Page' not in r.headers or
@@ -129,83 +450,205 @@ class VSDConnection(object):
                 return True
             return False
 
-        self.authenticate()
-        if filter:
-            self.headers['X-Nuage-Filter'] = filter
-        resp = []
-        X_Nuage_Page = 0
-        while True:
-            self.headers['X-Nuage-Page'] = str(X_Nuage_Page)
-            h = self.headers.copy()
+        def _get_page(page, page_size=None):
+            # Headers of each page are built when it is requested, as in
+            # get(): the API key is renewed if it expires during a listing
+            h = self._request_headers()
+            if filter:
+                h['X-Nuage-Filter'] = filter
+            if self.page_size:
+                h['X-Nuage-PageSize'] = str(self.page_size)
             h.update(headers)
-            r = self._do_request('GET', self.base_url + url,
-                                 headers=h)
-            resp += self._response(r)
-            X_Nuage_Page += 1
+            if page_size:
+                h['X-Nuage-PageSize'] = str(page_size)
+            h['X-Nuage-Page'] = str(page)
+            return self._do_request('GET', self.base_url + url,
+                                    headers=h)
+
+        if page is not None:
+            for obj in self._response(_get_page(page, limit)):
+                yield obj
+            return
+        first_page_size = None
+        if limit:
+            first_page_size = int(headers.get('X-Nuage-PageSize') or
+                                  self.page_size or PAGE_SIZE_DEFAULT)
+            first_page_size = min(limit, first_page_size)
+        r = _get_page(0, first_page_size)
+        count = 0
+        for obj in self._response(r):
+            if limit and count >= limit:
+                return
+            count += 1
+            yield obj
+        if _next_page_is_invalid(r.headers) or (limit and count >= limit):
+            return
+        if self.page_workers > 1:
+            # Count and page size are known: fetch remaining pages together
+            page_size = int(r.headers['X-Nuage-PageSize'])
+            object_count = int(r.headers['X-Nuage-Count'])
+            if limit:
+                object_count = min(object_count, limit)
+            page_count = (object_count + page_size - 1) // page_size
+            pages = range(1, page_count)
+            for r in imap_parallel(_get_page, pages,
+                                   min(self.page_workers, len(pages))):
+                for obj in self._response(r):
+                    if limit and count >= limit:
+                        return
+                    count += 1
+                    yield obj
+            return
+        while not limit or count < limit:
+            # Pages are numbered in page size unit: keep the offset of the
+            # next object when page size changes
+            page_size = int(r.headers['X-Nuage-PageSize'])
+            offset = page_size * (1 + int(r.headers['X-Nuage-Page']))
+            if self.adaptive_page_size:
+                page_size = self._adapt_page_size(page_size, offset,
+                                                  r.elapsed.total_seconds())
+            page = offset // page_size
+            if limit and limit - count < page_size:
+                page, page_size = _last_page(offset, limit - count,
+                                             page_size)
+            r = _get_page(page, page_size)
+            for obj in self._response(r):
+                if limit and count >= limit:
+                    return
+                count += 1
+                yield obj
             if _next_page_is_invalid(r.headers):
                 break
-        return resp
+
+    @remove_extra_slash_url
+    def iter_raw(self, url, filter=None, headers={}, chunk_size=65536):
+        """Yield the bodies of all pages of url as bytes, without decoding
+           them. Pages are joined in a single JSON array"""
+        page = 0
+        empty = True
+        while True:
+            h = self._request_headers()
+            if filter:
+                h['X-Nuage-Filter'] = filter
+            if self.page_size:
+                h['X-Nuage-PageSize'] = str(self.page_size)
+            h.update(headers)
+            h['X-Nuage-Page'] = str(page)
+            r = self._do_request('GET', self.base_url + url, headers=h,
+                                 stream=True)
+            try:
+                if r.status_code < 200 or r.status_code >= 300:
+                    self._response(r)
+                if page == 0:
+                    yield b'['
+                separator = b'' if empty else b','
+                for chunk in _strip_json_array(r.iter_content(chunk_size)):
+                    yield separator + chunk
+                    separator = b''
+                    empty = False
+            finally:
+                r.close()
+            if ('X-Nuage-PageSize' not in r.headers or
+                    'X-Nuage-Page' not in r.headers or
+                    'X-Nuage-Count' not in r.headers):
+                break
+            page_size = int(r.headers['X-Nuage-PageSize'])
+            if (page_size * (1 + int(r.headers['X-Nuage-Page'])) >=
+                    int(r.headers['X-Nuage-Count'])):
+                break
+            page = int(r.headers['X-Nuage-Page']) + 1
+        yield b']'
+
+    def _adapt_page_size(self, page_size, offset, elapsed):
+        """Double page size while pages are fast to come, halve it when a
+           page takes more than half the request timeout. Page size must
+           divide offset to be able to request next page"""
+        if (elapsed < self.timeout / 5.0 and
+                page_size * 2 <= PAGE_SIZE_MAX and
+                offset % (page_size * 2) == 0):
+            return page_size * 2
+        if elapsed > self.timeout / 2.0 and page_size % 2 == 0:
+            return page_size // 2
+        return page_size
+
+    def _invalidate(self, url):
+        """Forget cached responses and names made stale by a write to url"""
+        if self.cache is not None:
+            self.cache.invalidate(url)
+        if self.names is not None:
+            import os
+            if os.path.exists(self.names):
+                from open_vsdcli.vsd_cache import NameCache
+                NameCache(self.names).invalidate(self.api_session_id, url)
 
     @remove_extra_slash_url
     def post(self, url, params, headers={}):
-        self.authenticate()
-        h = self.headers.copy()
-        h.update(headers)
         r = self._do_request('POST', self.base_url + url,
-                             headers=h, params=params)
+                             headers=self._request_headers(headers),
+                             params=params)
+        self._invalidate(url)
         return self._response(r)
 
     @remove_extra_slash_url
     def put(self, url, params, headers={}):
-        self.authenticate()
-        h = self.headers.copy()
-        h.update(headers)
         r = self._do_request('PUT', self.base_url + url,
-                             headers=h, params=params)
+                             headers=self._request_headers(headers),
+                             params=params)
+        self._invalidate(url)
         return self._response(r)
 
     @remove_extra_slash_url
     def delete(self, url):
-        self.authenticate()
         r = self._do_request('DELETE', self.base_url + url,
-                             headers=self.headers)
+                             headers=self._request_headers())
+        self._invalidate(url)
         return self._response(r)
 
     def me(self):
         r = self._do_request('GET', self.base_url + "me",
-                             headers=self.headers)
+                             headers=self._request_headers(
+                                 authorization=self.password_auth))
         return self._response(r)
 
     def authenticate(self):
+        """Return Authorization header built with an API key. The key is
+           kept in memory and in ~/.vsd/APIKey, and is only renewed when near
+           expiry"""
+        with _api_sessions_lock:
+            api_session = _api_sessions.get(self.api_session_id)
+            if self.force_auth or not _api_session_is_valid(api_session):
+                api_session = self._load_api_session()
+                _api_sessions[self.api_session_id] = api_session
+                # Authentication is replayed only once per process
+                self.force_auth = False
+        auth_base64 = self._encode_b64(
+                self.username + ":" + api_session['APIKey'])
+        return "XREST %s" % auth_base64
+
+    def _load_api_session(self):
+        """Return API key from ~/.vsd/APIKey, or from the VSD if none valid.
+           The file is locked so concurrent processes authenticate once"""
         import os
-        import time
         data_dir = '%s/.vsd' % os.path.expanduser("~")
         APIKey_file = data_dir + '/APIKey'
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
-        do_auth = False
-        if os.path.exists(APIKey_file) and not self.force_auth:
-            with open(APIKey_file) as data_file:
-                api_session = json.load(data_file)
-            # replay auth if expire
-            if int(api_session['APIKeyExpiry'])/1000 < int(time.time()):
-                do_auth = True
-            # replay auth every 5 min
-            if int(api_session['APIKeyCreation']) + 300 < int(time.time()):
-                do_auth = True
-        else:
-            do_auth = True
-        if do_auth:
+        with _locked_file(APIKey_file + '.lock'):
+            api_sessions = _load_json(APIKey_file, {})
+            if not isinstance(api_sessions, dict):
+                api_sessions = {}
+            api_session = api_sessions.get(self.api_session_id)
+            if not self.force_auth and _api_session_is_valid(api_session):
+                return api_session
             r = self._do_request('GET', self.base_url + "me",
-                                 headers=self.headers)
+                                 headers=self._request_headers(
+                                     authorization=self.password_auth))
             rjson = self._response(r)[0]
             api_session = {'APIKey': rjson['APIKey'],
-                           'APIKeyExpiry': rjson['APIKeyExpiry'],
-                           'APIKeyCreation': time.time()}
-            with open(APIKey_file, 'w') as data_file:
-                json.dump(api_session, data_file)
-        auth_base64 = base64.urlsafe_b64encode(
-            ('%s:%s' % (self.username, api_session['APIKey'])).encode("utf-8"))
-        auth_base64 = self._encode_b64(
-                self.username + ":" + api_session['APIKey'])
-        self.headers['Authorization'] = "XREST %s" % auth_base64
+                           'APIKeyExpiry': rjson['APIKeyExpiry']}
+            # Drop expired keys and the former single key format
+            api_sessions = dict((k, v) for k, v in api_sessions.items()
+                                if _api_session_is_valid(v))
+            api_sessions[self.api_session_id] = api_session
+            _dump_json_atomic(APIKey_file, api_sessions)
+        return api_session
@@ -1,6 +1,76 @@
 from prettytable import PrettyTable
 import click
 from open_vsdcli.vsd_client import VSDConnection
+from open_vsdcli.vsd_index import COMMANDS
+
+
+FORMATS = ['table', 'json', 'jsonl', 'csv', 'tsv']
+
+
+def output_format():
+    """Return format chosen with --format for the running command"""
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or not ctx.obj:
+        return 'table'
+    return ctx.obj.get('format', 'table')
+
+
+class Table(object):
+    """Drop-in replacement of PrettyTable printing rows in the format chosen
+       with --format. Except for table, each row is written as soon as it is
+       added. Call close() once all rows are added"""
+    def __init__(self, field_names):
+        import sys
+        self.field_names = field_names
+        self.format = output_format()
+        self.stream = sys.stdout
+        self.count = 0
+        if self.format == 'table':
+            self.table = PrettyTable(field_names)
+        else:
+            self.table = None
+        if self.format in ['csv', 'tsv']:
+            import csv
+            self.writer = csv.writer(
+                self.stream, lineterminator='\n',
+                delimiter=',' if self.format == 'csv' else '\t')
+
+    @property
+    def align(self):
+        return self.table.align if self.table else {}
+
+    @property
+    def max_width(self):
+        return self.table.max_width if self.table else {}
+
+    def add_row(self, row):
+        import json
+        if self.table:
+            self.table.add_row(row)
+        elif self.format in ['csv', 'tsv']:
+            if self.count == 0:
+                self.writer.writerow(self.field_names)
+            self.writer.writerow(row)
+        else:
+            line = json.dumps(dict(zip(self.field_names, row)), default=str)
+            if self.format == 'jsonl':
+                self.stream.write(line + '\n')
+            elif self.count == 0:
+                self.stream.write('[\n' + line)
+            else:
+                self.stream.write(',\n' + line)
+        self.count += 1
+
+    def close(self):
+        """Print the table, or end the output of streamed rows"""
+        if self.table:
+            print(self.table)
+        elif self.format in ['csv', 'tsv']:
+            if self.count == 0:
+                self.writer.writerow(self.field_names)
+        elif self.format == 'json':
+            self.stream.write('\n]\n' if self.count else '[]\n')
+        self.stream.flush()
 
 
 def print_object(obj, only=None, exclude=[]):
@@ -17,7 +87,7 @@ def print_object(obj, only=None, exclude=[]):
     def _print_table(obj, exclude):
         from time import gmtime
         from time import strftime
-        table = PrettyTable(["Field", "Value"])
+        table = Table(["Field", "Value"])
         table.align["Field"] = "l"
 
         for key in obj.keys():
@@ -37,12 +107,22 @@ def print_object(obj, only=None, exclude=[]):
                     else:
                         value = obj[key]
                     table.add_row([key, value])
-        print(table)
+        table.close()
+
+    def _print_json(obj, exclude):
+        import json
+        obj = dict((k, v) for k, v in obj.items() if k not in exclude)
+        if output_format() == 'json':
+            print(json.dumps(obj, indent=4, sort_keys=True))
+        else:
+            print(json.dumps(obj, sort_keys=True))
     if only:
         if only in obj:
             print(obj[only])
         else:
             print("No such key : %s" % only)
+    elif output_format() in ['json', 'jsonl']:
+        _print_json(obj, exclude)
     else:
         _print_table(obj, exclude)
 
@@ -96,6 +176,135 @@ def length_to_netmask(length):
     return '.'.join(octet)
 
 
+def object_cidr(obj):
+    """Return network of a subnet, l2domain or static route as
+       address/length"""
+    if obj.get('address') and obj.get('netmask'):
+        return '%s/%s' % (obj['address'], netmask_to_length(obj['netmask']))
+    return obj.get('IPv6Address')
+
+
+def list_options(computed={}):
+    """Add --where, --sort, --order-by, --limit, --page and --count options
+       to a list command. computed maps names of fields which are not
+       attributes of VSD objects to functions returning their value for
+       an object"""
+    import functools
+
+    def decorator(f):
+        @click.option('--count', is_flag=True,
+                      help='Only print count of objects')
+        @click.option('--page', metavar='<number>', type=click.IntRange(0),
+                      help='Only show this page, of --limit objects if set.'
+                           ' First page is 0')
+        @click.option('--limit', metavar='<count>', type=click.IntRange(1),
+                      help='Stop after this count of objects')
+        @click.option('--order-by', metavar='<expression>',
+                      help='Order given to the VSD. Ex: "lastUpdatedDate'
+                           ' DESC"')
+        @click.option('--sort', metavar='<fields>',
+                      help='Sort by comma separated fields, prefixed by -'
+                           ' for descending order. Ex: name,-creationDate')
+        @click.option('--where', metavar='<expression>',
+                      help='Select objects matching an expression. Ex:'
+                           ' name startswith "web" and (cidr in 10.0.0.0/8'
+                           ' or description =~ "^prod")')
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            from open_vsdcli.vsd_filter import FilterError
+            from open_vsdcli.vsd_filter import Query
+            try:
+                query = Query(kwargs.pop('where'), kwargs.pop('sort'),
+                              computed, order_by=kwargs.pop('order_by'),
+                              limit=kwargs.pop('limit'),
+                              page=kwargs.pop('page'),
+                              count=kwargs.pop('count'))
+            except FilterError as error:
+                raise click.exceptions.UsageError(str(error))
+            click.get_current_context().query = query
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def list_objects(ctx, request, filter=None):
+    """Return iterator on objects of request selected by --filter and
+       --where, sorted by --sort or --order-by, paged by --limit and
+       --page. With --count, print count of these objects and exit"""
+    from open_vsdcli.vsd_filter import Query
+    query = getattr(ctx, 'query', None) or Query()
+    if query.count_only:
+        # Count is all the command prints
+        print(query.count(ctx.obj['nc'], request, filter))
+        ctx.exit()
+    return query.iter_objects(ctx.obj['nc'], request, filter)
+
+
+class ThreadOutput(object):
+    """Output stream sending writes of a thread to its own buffer once
+       capture() is called in this thread. Other threads write to stream"""
+    def __init__(self, stream):
+        import threading
+        self.stream = stream
+        self.local = threading.local()
+
+    @property
+    def encoding(self):
+        return getattr(self.stream, 'encoding', None)
+
+    @property
+    def errors(self):
+        return getattr(self.stream, 'errors', None)
+
+    def capture(self):
+        self.local.chunks = []
+
+    def release(self):
+        """Stop capture in this thread and return captured output"""
+        chunks = self.local.chunks
+        del self.local.chunks
+        return ''.join(chunks)
+
+    def write(self, data):
+        if isinstance(data, bytes) and not isinstance(data, str):
+            raise TypeError('write() argument must be str')
+        chunks = getattr(self.local, 'chunks', None)
+        if chunks is None:
+            self.stream.write(data)
+        else:
+            chunks.append(data)
+
+    def flush(self):
+        if getattr(self.local, 'chunks', None) is None:
+            self.stream.flush()
+
+    def isatty(self):
+        return False
+
+
+def write_bytes(chunks):
+    """Write chunks of UTF-8 bytes to stdout, followed by a new line"""
+    import sys
+    stdout = sys.stdout
+    binary = getattr(stdout, 'buffer', None)
+    if binary is None and not isinstance(b'', str):
+        # Text only stream, such as output captured by batch
+        import codecs
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        for chunk in chunks:
+            stdout.write(decoder.decode(chunk))
+        stdout.write(decoder.decode(b'', final=True) + '\n')
+        return
+    if binary is None:
+        binary = stdout
+    for chunk in chunks:
+        # Keep order with text printed before, debug output for instance
+        stdout.flush()
+        binary.write(chunk)
+    binary.write(b'\n')
+    binary.flush()
+
+
 def print_creds(ctx, param, value):
     if not value or ctx.resilient_parsing:
         return
@@ -141,7 +350,67 @@ def print_completion(ctx, param, value):
     ctx.exit()
 
 
-@click.group()
+def print_pool_stats(nc):
+    stats = nc.connection_stats()
+    click.echo('# Connections: %s opened, %s reused (%s requests)' %
+               (stats['opened'], stats['reused'], stats['requests']),
+               err=True)
+
+
+class NameCommand(click.Command):
+    """Command accepting name:<path> references in place of IDs, for
+       instance --zone-id name:enterprise/domain/zone. References are
+       resolved through the name cache before the command runs"""
+    def invoke(self, ctx):
+        for param in self.params:
+            value = ctx.params.get(param.name)
+            if not param.name.endswith('_id'):
+                continue
+            if isinstance(value, tuple):
+                ctx.params[param.name] = tuple(
+                    self.resolve(ctx, param, v) for v in value)
+            else:
+                ctx.params[param.name] = self.resolve(ctx, param, value)
+        return click.Command.invoke(self, ctx)
+
+    def resolve(self, ctx, param, value):
+        if not hasattr(value, 'startswith') or not value.startswith('name:'):
+            return value
+        from os.path import expanduser
+        from open_vsdcli.vsd_cache import NameCache
+        from open_vsdcli.vsd_cache import resolve_name
+        cache = NameCache('%s/.vsd/names.db' % expanduser('~'))
+        entity = '%ss' % param.name[:-len('_id')]
+        try:
+            return resolve_name(ctx.obj['nc'], cache, ctx.obj['name_scope'],
+                                entity, value[len('name:'):],
+                                refresh=ctx.obj.get('refresh_cache'))
+        except ValueError as error:
+            raise click.exceptions.UsageError(
+                '%s: %s' % (param.get_error_hint(ctx), error))
+        except LookupError as error:
+            print('Error: %s' % error)
+            raise SystemExit(1)
+
+
+class LazyGroup(click.Group):
+    """Group importing the module of a command only when the command is
+       used. Modules are found in the command index of vsd_index"""
+    def command(self, *args, **kwargs):
+        kwargs.setdefault('cls', NameCommand)
+        return click.Group.command(self, *args, **kwargs)
+
+    def list_commands(self, ctx):
+        return sorted(set(COMMANDS) | set(self.commands))
+
+    def get_command(self, ctx, name):
+        if name not in self.commands and name in COMMANDS:
+            from importlib import import_module
+            import_module('open_vsdcli.%s' % COMMANDS[name])
+        return self.commands.get(name)
+
+
+@click.group(cls=LazyGroup)
 @click.option('--creds', is_flag=True, callback=print_creds, is_eager=True,
               expose_value=False, help='Display creds example')
 @click.option('--version', is_flag=True, callback=print_version, is_eager=True,
@@ -178,6 +447,10 @@ def print_completion(ctx, param, value):
               help='Use this proxy to reach the vsd and override env'
               ' https_proxy. If ommited, https proxy will be set with the'
               ' given http-proxy (Env: VSD_HTTPS_PROXY)')
+@click.option('--format', 'output', type=click.Choice(FORMATS),
+              envvar='VSD_FORMAT', default='table',
+              help='Output format. Except for table, rows are printed as soon'
+                   ' as they are received. Default : table (Env: VSD_FORMAT)')
 @click.option('--show-only', metavar='<key>',
               help='Show only the value for a given key'
                    ' (usable for show and create command)')
@@ -185,14 +458,58 @@ def print_completion(ctx, param, value):
               help='Active debug for request and response')
 @click.option('--force-auth', is_flag=True,
               help='Do not use existing APIkey. Replay authentication')
+@click.option('--pool-size', metavar='<size>', envvar='VSD_POOL_SIZE',
+              type=click.IntRange(1), default=10,
+              help='Maximum count of HTTP connections kept open to the VSD.'
+                   ' Default : 10 (Env: VSD_POOL_SIZE)')
+@click.option('--no-keep-alive', envvar='VSD_NO_KEEP_ALIVE', is_flag=True,
+              help='Close HTTP connection after each request'
+                   ' (Env: VSD_NO_KEEP_ALIVE)')
+@click.option('--page-workers', metavar='<count>', envvar='VSD_PAGE_WORKERS',
+              type=click.IntRange(1), default=1,
+              help='Count of pages fetched concurrently by list commands.'
+                   ' Default : 1 (Env: VSD_PAGE_WORKERS)')
+@click.option('--page-size', metavar='<size>', envvar='VSD_PAGE_SIZE',
+              type=click.IntRange(1),
+              help='Count of objects requested per page. Default is set by'
+                   ' the VSD (Env: VSD_PAGE_SIZE)')
+@click.option('--adaptive-page-size', envvar='VSD_ADAPTIVE_PAGE_SIZE',
+              is_flag=True,
+              help='Grow page size while pages are fast to come and shrink it'
+                   ' when they get close to request timeout. Ignored with'
+                   ' --page-workers (Env: VSD_ADAPTIVE_PAGE_SIZE)')
+@click.option('--cache/--no-cache', envvar='VSD_CACHE', default=False,
+              help='Keep GET responses of slowly changing objects'
+                   ' (enterprises, templates, licenses...) in ~/.vsd/cache.db'
+                   ' and reuse them until they expire or are modified'
+                   ' through vsd. Default : no cache (Env: VSD_CACHE)')
+@click.option('--refresh-cache', is_flag=True,
+              help='Ignore cached responses and cache new ones.'
+                   ' Implies --cache')
+@click.option('--daemon-socket', metavar='<path>', envvar='VSD_DAEMON_SOCKET',
+              help='UNIX socket of vsd serve. Default : ~/.vsd/daemon.sock'
+                   ' (Env: VSD_DAEMON_SOCKET)')
+@click.option('--no-daemon', envvar='VSD_NO_DAEMON', is_flag=True,
+              help='Do not send requests through vsd serve, even if it is'
+                   ' running. Implied by --force-auth and --refresh-cache'
+                   ' (Env: VSD_NO_DAEMON)')
+@click.option('--pool-stats', is_flag=True,
+              help='Display count of opened and reused connections on exit')
 @click.option('--completion', is_flag=True, callback=print_completion,
               is_eager=True, expose_value=False,
               help='Display script to enable completion')
 @click.pass_context
 def vsdcli(ctx, vsd_username, vsd_password, vsd_enterprise,
-           vsd_api_version, vsd_api_url, show_only, vsd_disable_proxy,
-           vsd_http_proxy, vsd_https_proxy, debug, force_auth):
-    """Command-line interface to the VSD APIs"""
+           vsd_api_version, vsd_api_url, output, show_only, vsd_disable_proxy,
+           vsd_http_proxy, vsd_https_proxy, debug, force_auth, pool_size,
+           no_keep_alive, page_workers, page_size, adaptive_page_size,
+           cache, refresh_cache, daemon_socket, no_daemon, pool_stats):
+    """Command-line interface to the VSD APIs
+
+       IDs of enterprises, domains, l2domains, zones, subnets, vports,
+       templates, groups, users, gateways, ports and VMs can be given by
+       name as name:<path>, for instance name:enterprise/domain/zone.
+       Resolved names are kept 5 minutes in ~/.vsd/names.db"""
     if vsd_http_proxy and vsd_https_proxy:
         proxies = {
                 "http": vsd_http_proxy,
@@ -209,6 +526,12 @@ def vsdcli(ctx, vsd_username, vsd_password, vsd_enterprise,
         raise click.exceptions.UsageError(
                 "https proxy can be ommited when http proxy is given, but not"
                 " the oposite")
+    from os.path import expanduser
+    if cache or refresh_cache:
+        from open_vsdcli.vsd_cache import ResponseCache
+        cache = ResponseCache('%s/.vsd/cache.db' % expanduser('~'))
+    else:
+        cache = None
     nc = VSDConnection(
             vsd_username,
             vsd_password,
@@ -218,10 +541,47 @@ def vsdcli(ctx, vsd_username, vsd_password, vsd_enterprise,
             disable_proxy=vsd_disable_proxy,
             proxy=proxies,
             debug=debug,
-            force_auth=force_auth
+            force_auth=force_auth,
+            pool_size=pool_size,
+            keep_alive=not no_keep_alive,
+            page_workers=page_workers,
+            page_size=page_size,
+            adaptive_page_size=adaptive_page_size,
+            cache=cache,
+            refresh_cache=refresh_cache,
+            names='%s/.vsd/names.db' % expanduser('~')
          )
     ctx.obj['nc'] = nc
+    # Names are resolved per VSD, user and enterprise, as API keys
+    ctx.obj['name_scope'] = nc.api_session_id
     ctx.obj['show_only'] = show_only
+    ctx.obj['format'] = output
+    ctx.obj['refresh_cache'] = refresh_cache
+    if not daemon_socket:
+        daemon_socket = '%s/.vsd/daemon.sock' % expanduser('~')
+    ctx.obj['daemon_socket'] = daemon_socket
+    from os.path import exists
+    if ctx.invoked_subcommand == 'serve' or exists(daemon_socket):
+        from open_vsdcli.vsd_daemon import connect_daemon
+        from open_vsdcli.vsd_daemon import identity
+        # Options changing how requests are sent: clients asking for other
+        # ones than the daemon talk to the VSD directly. --debug is sent
+        # with each request instead
+        settings = {'proxies': proxies, 'disable_proxy': vsd_disable_proxy,
+                    'pool_size': pool_size, 'keep_alive': not no_keep_alive,
+                    'page_workers': page_workers, 'page_size': page_size,
+                    'adaptive_page_size': adaptive_page_size,
+                    'cache': cache is not None}
+        ctx.obj['identity'] = identity(vsd_username, vsd_password,
+                                       vsd_enterprise, nc.base_url, settings)
+        if (not no_daemon and not force_auth and not refresh_cache and
+                ctx.invoked_subcommand != 'serve'):
+            daemon = connect_daemon(daemon_socket, ctx.obj['identity'],
+                                    debug=debug)
+            if daemon is not None:
+                ctx.obj['nc'] = daemon
+    if pool_stats:
+        ctx.call_on_close(lambda: print_pool_stats(ctx.obj['nc']))
 
 
 @vsdcli.command(name='me-show')
@@ -253,13 +613,19 @@ def me_show(ctx, verbose):
 @click.option('--body', metavar='<data json>',
               help='Specify body of the request in json format.'
                    ' Incompatible with --key-value.')
+@click.option('--raw', is_flag=True,
+              help='Copy response to stdout as received, without decoding'
+                   ' it. Pages are joined in one JSON array. Only with GET')
 @click.pass_context
-def free_api(ctx, ressource, verb, header, key_value, body):
+def free_api(ctx, ressource, verb, header, key_value, body, raw):
     """build your own API call (with headers and data)"""
     import json
     if key_value and body:
         raise click.exceptions.UsageError(
             "Use body or key-value")
+    if raw and verb != 'GET':
+        raise click.exceptions.UsageError(
+            "Use raw with GET verb only")
     if key_value:
         params = {}
         for kv in key_value:
@@ -276,6 +642,9 @@ def free_api(ctx, ressource, verb, header, key_value, body):
         for kv in header:
             key, value = kv.split(':', 1)
             h[key] = value
+    if verb == 'GET' and raw:
+        write_bytes(ctx.obj['nc'].iter_raw(ressource, headers=h))
+        return
     if verb == 'GET':
         result = ctx.obj['nc'].get(ressource, headers=h)
     elif verb == 'PUT':
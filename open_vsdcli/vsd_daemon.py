@@ -0,0 +1,296 @@
+# Copyright 2015 Maxime Terras <maxime.terras@numergy.com>
+# Copyright 2015 Pierre Padrixe <pierre.padrixe@gmail.com>
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import json
+import os
+import socket
+import threading
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+# Methods of VSDConnection callable through the daemon
+METHODS = ['get', 'iter_get', 'iter_raw', 'count', 'post', 'put', 'delete',
+           'me', 'connection_stats']
+
+
+def identity(username, password, enterprise, base_url, settings={}):
+    """Return a digest of the credentials and of the settings of the
+       connection. A daemon only serves clients using the same credentials,
+       VSD and settings as itself"""
+    import hashlib
+    data = json.dumps([username, password, enterprise, base_url, settings],
+                      sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _send(wfile, message):
+    wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+    wfile.flush()
+
+
+class ClientGone(Exception):
+    """Raised by DaemonHandler when its client closed the socket"""
+
+
+def _receive(rfile):
+    line = rfile.readline()
+    if not line:
+        raise EOFError('Connection closed by vsd serve')
+    return json.loads(line.decode('utf-8'))
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """Serve VSDConnection calls of one client, one JSON line per message.
+       First message of the client is its identity, then each request is
+       {"method", "args", "kwargs", "debug"}. Each request is answered by
+       zero or more {"object"} (iter_get, iter_raw) then {"result", "exit",
+       "output"}. Bytes of iter_raw are sent as latin-1 strings"""
+    def handle(self):
+        server = self.server
+        try:
+            hello = _receive(self.rfile)
+        except (EOFError, ValueError):
+            return
+        try:
+            if hello.get('identity') != server.identity:
+                self.reply({'error': 'Credentials do not match'})
+                return
+            self.reply({'ready': True, 'page_size': server.nc.page_size})
+            while True:
+                try:
+                    request = _receive(self.rfile)
+                except (EOFError, ValueError):
+                    return
+                self.serve_request(request)
+        except ClientGone:
+            return
+
+    def reply(self, message):
+        try:
+            _send(self.wfile, message)
+        except socket.error:
+            raise ClientGone()
+
+    def serve_request(self, request):
+        import sys
+        nc = self.server.nc
+        method = request.get('method')
+        if method not in METHODS:
+            self.reply({'result': None, 'exit': 1,
+                        'output': 'Error: Unknown method %s\n' % method})
+            return
+        args = request.get('args', [])
+        kwargs = request.get('kwargs', {})
+        result = None
+        status = 0
+        error_output = ''
+        sys.stdout.capture()
+        try:
+            with nc.thread_debug(request.get('debug', False)):
+                if method == 'iter_get':
+                    for obj in nc.iter_get(*args, **kwargs):
+                        self.reply({'object': obj})
+                elif method == 'iter_raw':
+                    for chunk in nc.iter_raw(*args, **kwargs):
+                        self.reply({'object': chunk.decode('latin-1')})
+                else:
+                    result = getattr(nc, method)(*args, **kwargs)
+        except SystemExit as error:
+            status = error.code if isinstance(error.code, int) else 1
+        except ClientGone:
+            raise
+        except Exception as error:
+            # Keep serving other requests, the client prints the error
+            result = None
+            status = 1
+            error_output = 'Error: %s\n' % error
+        finally:
+            output = sys.stdout.release()
+        self.reply({'result': result, 'exit': status,
+                    'output': output + error_output})
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    """Share one VSDConnection between clients connecting to a UNIX
+       socket. Each client is served in its own thread"""
+    daemon_threads = True
+
+    def __init__(self, path, nc, identity):
+        self.nc = nc
+        self.identity = identity
+        socketserver.ThreadingUnixStreamServer.__init__(self, path,
+                                                        DaemonHandler)
+
+    def server_bind(self):
+        # Only the user running the daemon may connect to it
+        old_umask = os.umask(0o077)
+        try:
+            socketserver.ThreadingUnixStreamServer.server_bind(self)
+        finally:
+            os.umask(old_umask)
+
+
+def daemon_is_running(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+
+
+class DaemonConnection(object):
+    """Drop-in replacement of VSDConnection sending calls to vsd serve.
+       A socket only carries one request at a time: each thread keeps its
+       idle sockets and opens a new one when all are busy, for instance
+       while iterating over objects of iter_get"""
+    def __init__(self, path, identity, debug=False):
+        self.path = path
+        self.identity = identity
+        self.debug = debug
+        # Page size of the VSDConnection of the daemon, sent with its answer
+        # to connect
+        self.page_size = None
+        self.local = threading.local()
+
+    def _idle(self):
+        if not hasattr(self.local, 'idle'):
+            self.local.idle = []
+        return self.local.idle
+
+    def connect(self):
+        """Open a socket and make it available to this thread. Raise
+           socket.error if the daemon is not running and ValueError if it
+           does not serve our credentials"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+            rfile = sock.makefile('rb')
+            wfile = sock.makefile('wb')
+            _send(wfile, {'identity': self.identity})
+            answer = _receive(rfile)
+        except (socket.error, EOFError):
+            sock.close()
+            raise socket.error('vsd serve is not reachable')
+        if not answer.get('ready'):
+            sock.close()
+            raise ValueError(answer.get('error'))
+        self.page_size = answer.get('page_size')
+        self._idle().append((sock, rfile, wfile))
+
+    def close(self):
+        """Close idle sockets of this thread"""
+        while self._idle():
+            for f in reversed(self._idle().pop()):
+                f.close()
+
+    def _request(self, method, args, kwargs):
+        """Send a request and yield the messages of the answer"""
+        import sys
+        if self.debug:
+            print('# Request through vsd serve: %s %s' %
+                  (method, ' '.join(str(a) for a in args)))
+        if not self._idle():
+            try:
+                self.connect()
+            except (socket.error, ValueError) as error:
+                print('Error: %s' % error)
+                raise SystemExit(1)
+        files = self._idle().pop()
+        sock, rfile, wfile = files
+        complete = False
+        try:
+            _send(wfile, {'method': method, 'args': args, 'kwargs': kwargs,
+                          'debug': self.debug})
+            while True:
+                message = _receive(rfile)
+                if 'object' not in message:
+                    complete = True
+                    break
+                yield message
+        except (socket.error, EOFError, ValueError) as error:
+            print('Error: Lost connection to vsd serve (%s)' % error)
+            raise SystemExit(1)
+        finally:
+            if complete:
+                self._idle().append(files)
+            else:
+                # Answer not read to the end: socket can not be reused
+                for f in reversed(files):
+                    f.close()
+        sys.stdout.write(message['output'])
+        if message['exit'] != 0:
+            raise SystemExit(message['exit'])
+        yield message
+
+    def _call(self, method, *args, **kwargs):
+        for message in self._request(method, args, kwargs):
+            pass
+        return message['result']
+
+    def get(self, url, filter=None, headers={}, limit=None, page=None):
+        return self._call('get', url, filter=filter, headers=headers,
+                          limit=limit, page=page)
+
+    def iter_get(self, url, filter=None, headers={}, limit=None, page=None):
+        for message in self._request('iter_get', [url],
+                                     {'filter': filter, 'headers': headers,
+                                      'limit': limit, 'page': page}):
+            if 'object' in message:
+                yield message['object']
+
+    def iter_raw(self, url, filter=None, headers={}):
+        for message in self._request('iter_raw', [url],
+                                     {'filter': filter, 'headers': headers}):
+            if 'object' in message:
+                yield message['object'].encode('latin-1')
+
+    def count(self, url, filter=None, headers={}):
+        return self._call('count', url, filter=filter, headers=headers)
+
+    def post(self, url, params, headers={}):
+        return self._call('post', url, params, headers=headers)
+
+    def put(self, url, params, headers={}):
+        return self._call('put', url, params, headers=headers)
+
+    def delete(self, url):
+        return self._call('delete', url)
+
+    def me(self):
+        return self._call('me')
+
+    def connection_stats(self):
+        return self._call('connection_stats')
+
+
+def connect_daemon(path, identity, debug=False):
+    """Return a DaemonConnection to the daemon listening on path, or None
+       if no daemon serving these credentials is running"""
+    if not os.path.exists(path):
+        return None
+    connection = DaemonConnection(path, identity, debug=debug)
+    try:
+        connection.connect()
+    except (socket.error, ValueError):
+        return None
+    return connection
@@ -1,4 +1,6 @@
 from open_vsdcli.vsd_common import *
+import binascii
+import socket
 
 
 @vsdcli.command(name='dhcp-option-list')
@@ -13,6 +15,7 @@ from open_vsdcli.vsd_common import *
 @click.option('--filter', metavar='<filter>',
               help='Filter for type, length, value, lastUpdatedDate,'
                    ' creationDate, externalID')
+@list_options()
 @click.pass_context
 def dhcp_option_list(ctx, filter, **ids):
     """List all dhcp option for a given vminterface, hostinterface,
@@ -20,14 +23,14 @@ def dhcp_option_list(ctx, filter, **ids):
     subnet, l2domain, domain, zone"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/dhcpoptions" % (id_type, id)
-    result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID", "Type", "Value", "Length"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID", "Type", "Value", "Length"])
     for line in result:
         table.add_row([line['ID'],
                        line['type'],
                        line['value'],
                        line['length']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='dhcp-option-show')
@@ -70,98 +73,157 @@ def dhcp_option_add(ctx, value, type, length,  **ids):
     print_object(result, only=ctx.obj['show_only'])
 
 
-def decode_ip(data):
-    """Decode IP address. Fulfill with 0 at the end if needed"""
-    ip = ''  # IP in text fomat
-    octet_count = 0  # count octet in IP
-    while len(data) > 0:  # Decode octet per octet
-        ip = ip + str(int(data[:2], 16))
-        data = data[2:]
-        octet_count += 1
-        if len(data) > 0:
-            ip += '.'
-    while octet_count < 4:  # Fulfill with 0
-        ip += '.0'
-        octet_count += 1
-    return ip
+# Size in bytes of addresses of each IP version. Options 79 and f9 only
+# carry IPv4 routes: commands use version 4, version 6 is only available
+# to callers of the codec
+ADDRESS_SIZES = {4: 4, 6: 16}
+
+FAMILIES = {4: socket.AF_INET, 6: socket.AF_INET6}
+
+
+def _ip_text(packed, version=4):
+    """Return text of an address given as bytes, fulfilled with 0"""
+    packed = bytes(packed) + b'\0' * (ADDRESS_SIZES[version] - len(packed))
+    if version == 4:
+        return '%d.%d.%d.%d' % tuple(bytearray(packed))
+    return socket.inet_ntop(socket.AF_INET6, packed)
+
+
+def _ip_bytes(ip, version=4):
+    """Return bytes of an address. Raise ValueError if ip is not an
+       address of this version"""
+    try:
+        return socket.inet_pton(FAMILIES[version], ip)
+    except (socket.error, ValueError, TypeError):
+        raise ValueError('Invalid IPv%s address: %s' % (version, ip))
+
+
+def _hex(packed):
+    return binascii.hexlify(packed).decode('ascii')
+
+
+def _unhexlify(data):
+    try:
+        return bytearray(binascii.unhexlify(data))
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError('Malformed value: %s' % data)
+
+
+def decode_ip(data, version=4):
+    """Decode IP address. Fulfill with 0 at the end if needed. Raise
+       ValueError if data is longer than an address"""
+    packed = _unhexlify(data)
+    if len(packed) > ADDRESS_SIZES[version]:
+        raise ValueError('Malformed value: %s' % data)
+    return _ip_text(packed, version)
+
 
+def decode_ips(data, version=4):
+    """Decode a list of IP addresses, such as routers of option 03. Raise
+       ValueError if data is not a list of addresses"""
+    packed = _unhexlify(data)
+    size = ADDRESS_SIZES[version]
+    if not packed or len(packed) % size:
+        raise ValueError('Malformed value: %s' % data)
+    return [_ip_text(packed[index:index + size], version)
+            for index in range(0, len(packed), size)]
 
-def encode_ip(ip, mask=None):
+
+def encode_ip(ip, mask=None, version=4):
     """Encode IP address into string accordinaly with RFC3442,
        if mask is given, add it at the begining"""
     if mask == 0:
         return '00'  # As Define in RFC
-    data = ''
+    packed = _ip_bytes(ip, version)
     if mask:
-        byte_count = int((mask-1)/8+1)
-        data = hex(mask)[2:].zfill(2)
-    else:
-        byte_count = 4
-    ip = ip.split('.')
-    while byte_count > 0:
-        data += hex(int(ip.pop(0)))[2:].zfill(2)
-        byte_count -= 1
-    return data
+        if not 0 < mask <= len(packed) * 8:
+            raise ValueError('Invalid mask for IPv%s: %s' % (version, mask))
+        return '%02x%s' % (mask, _hex(packed[:(mask + 7) // 8]))
+    return _hex(packed)
 
 
-def decode_route(data):
+def decode_route(data, version=4):
     """Extract all mask/ip from data. Data is a string encoded
-    accordinaly with RFC3442"""
+    accordinaly with RFC3442. Raise ValueError if data is malformed"""
+    packed = _unhexlify(data)
+    size = ADDRESS_SIZES[version]
     route = []
-    while len(data) > 0:
-        mask = int(data[:2], 16)
-        data = data[2:]
-        if mask == 0:
-            byte = 0
-            subnet = '0.0.0.0'
-        else:
-            byte = int((mask-1)/8+1)
-            subnet = decode_ip(data[:2*byte])
-            data = data[2*byte:]
-        gateway = decode_ip(data[:8])
-        data = data[8:]
+    index = 0
+    while index < len(packed):
+        mask = packed[index]
+        subnet_end = index + 1 + (mask + 7) // 8
+        gateway_end = subnet_end + size
+        if mask > size * 8 or gateway_end > len(packed):
+            raise ValueError('Malformed value: %s' % data)
         route.append({'mask':    str(mask),
-                      'subnet':  subnet,
-                      'gateway': gateway})
+                      'subnet':  _ip_text(packed[index + 1:subnet_end],
+                                          version),
+                      'gateway': _ip_text(packed[subnet_end:gateway_end],
+                                          version)})
+        index = gateway_end
     return route
 
 
-def encode_route(route):
+def encode_route(route, version=4):
     """Encode a list of route (a route is a dict with subnet, mask and gateway)
        into string accordinaly with RFC3442"""
-    data = ''
-    while len(route) > 0:
-        r = route.pop()
-        data += encode_ip(r['subnet'], int(r['mask']))
-        data += encode_ip(r['gateway'])
-    return data
+    return ''.join(encode_ip(r['subnet'], int(r['mask']), version) +
+                   encode_ip(r['gateway'], version=version) for r in route)
+
+
+def route_key(route):
+    return (route['subnet'], route['mask'], route['gateway'])
+
+
+def make_route(subnet, mask, gateway):
+    """Return route dict of an IPv4 route as it is once encoded, with host
+       bits of subnet cleared. Raise ValueError if it is not a route"""
+    try:
+        mask = int(mask)
+    except ValueError:
+        raise ValueError('Invalid mask for IPv4: %s' % mask)
+    return decode_route(encode_ip(subnet, mask) + encode_ip(gateway))[0]
+
+
+def option_routes(option):
+    """Return routes of a dhcp option 79 or f9. Raise ValueError if its
+       value is malformed"""
+    try:
+        return decode_route(option['value'])
+    except ValueError:
+        raise ValueError('Malformed option %s: %s' %
+                         (option['type'], option['value']))
 
 
 def decode_dhcp_data(data):
     """data is the raw result from the API. Return a list of dict,
        with dict contains (subnet, mask, gateway, option)
-       for each route"""
+       for each route. Raise ValueError if an option is malformed"""
     data_f9 = [item for item in data if item['type'] == 'f9']
     data_79 = [item for item in data if item['type'] == '79']
     if len(data_f9) > 1 and len(data_79) > 1:
         raise Exception("Abnormal count of DHCP option")
-    route = []
-    route_f9 = []  # List with route for dhcp option 79
-    route_79 = []  # List with route for dhcp option f9
+    route_f9 = []  # List with route for dhcp option f9
+    route_79 = []  # List with route for dhcp option 79
     if len(data_f9) != 0:
-        route_f9 = decode_route(data_f9[0]['value'])
+        route_f9 = option_routes(data_f9[0])
     if len(data_79) != 0:
-        route_79 = decode_route(data_79[0]['value'])
-    route = [dict(t) for t in set([tuple(d.items())
-                                  for d in route_79 + route_f9])]
+        route_79 = option_routes(data_79[0])
+    keys_f9 = set(route_key(r) for r in route_f9)
+    keys_79 = set(route_key(r) for r in route_79)
+    seen = set()
     route_w_option = []
-    for r in route:
+    for r in route_79 + route_f9:
+        key = route_key(r)
+        if key in seen:
+            continue
+        seen.add(key)
         option = []
-        if r in route_f9:
+        if key in keys_f9:
             option.append('f9')
-        if r in route_79:
+        if key in keys_79:
             option.append('79')
-        r.update({'option': option})
+        r['option'] = option
         route_w_option.append(r)
     return route_w_option
 
@@ -185,14 +247,18 @@ def dhcp_route_list(ctx, filter, **ids):
     request = "%ss/%s/dhcpoptions" % (id_type, id)
     result = ctx.obj['nc'].get(request, filter=filter)
 
-    route = decode_dhcp_data(result)
+    try:
+        route = decode_dhcp_data(result)
+    except ValueError as error:
+        print('Error: %s' % error)
+        raise SystemExit(1)
 
-    table = PrettyTable(["Subnet", "Gateway", "option"])
+    table = Table(["Subnet", "Gateway", "option"])
     for line in route:
         table.add_row([line['subnet'] + '/' + line['mask'],
                        line['gateway'],
                        line['option']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='dhcp-route-add')
@@ -211,16 +277,21 @@ def dhcp_route_add(ctx, subnet, mask, gateway, **ids):
        hostinterface, bridgeinterface, sharednetworkresource, subnet, l2domain
     """
     id_type, id = check_id(**ids)
+    try:
+        new_route = make_route(subnet, mask, gateway)
+    except ValueError as error:
+        print('Error: %s' % error)
+        raise SystemExit(1)
     result = ctx.obj['nc'].get("%ss/%s/dhcpoptions" % (id_type, id))
-    route = decode_dhcp_data(result)
-
-    # TODO: Check if subnet and gateway are valid IP
-    # TODO: Check mask is acceptable
-    # TODO Check if route already exist, then raise execption
-    route.append({'subnet':  subnet,
-                  'mask':    mask,
-                  'gateway': gateway,
-                  'option':  ['f9', '79']})
+    try:
+        route = decode_dhcp_data(result)
+    except ValueError as error:
+        print('Error: %s' % error)
+        raise SystemExit(1)
+
+    # An existing route is only added to the option missing it
+    if route_key(new_route) not in [route_key(r) for r in route]:
+        route.append(new_route)
     encoded_route = encode_route(route)
 
     params = {}
@@ -255,25 +326,31 @@ def dhcp_route_delete(ctx, subnet, mask, gateway, **ids):
        hostinterface, bridgeinterface, sharednetworkresource, subnet, l2domain
     """
     id_type, id = check_id(**ids)
+    try:
+        route_to_remove = make_route(subnet, mask, gateway)
+    except ValueError as error:
+        print('Error: %s' % error)
+        raise SystemExit(1)
     result = ctx.obj['nc'].get("%ss/%s/dhcpoptions" % (id_type, id))
-    route_list = decode_dhcp_data(result)
+    try:
+        route_list = decode_dhcp_data(result)
+    except ValueError as error:
+        print('Error: %s' % error)
+        raise SystemExit(1)
     if not len(route_list):
-        raise Exception("No route to delete")
-    # TODO: Check if subnet and gateway are valid IP
-    # TODO: Check mask is acceptable
-    route_to_remove = {'subnet':  subnet,
-                       'mask':    mask,
-                       'gateway': gateway}
+        print('Error: No route to delete')
+        raise SystemExit(1)
     new_route_list = []
     change = 0
     for route in route_list:
         route.pop('option')
-        if route == route_to_remove:
+        if route_key(route) == route_key(route_to_remove):
             change = 1
         else:
             new_route_list.append(route)
     if change == 0:
-        raise Exception('Route not present: unable to remove it')
+        print('Error: Route not present: unable to remove it')
+        raise SystemExit(1)
     if len(new_route_list) == 0:
         # Remove dhcp option because no more route
         for option in result:
@@ -289,6 +366,263 @@ def dhcp_route_delete(ctx, subnet, mask, gateway, **ids):
                 ctx.obj['nc'].put("dhcpoptions/%s" % option['ID'], params)
 
 
+# Entities having DHCP options which can be targeted by dhcp-route-sync
+ROUTE_TARGETS = ['subnet', 'l2domain', 'vminterface', 'hostinterface',
+                 'bridgeinterface', 'sharednetworkresource']
+
+
+def parse_route(text):
+    """Return route dict of `<network>/<length>,<gateway>`, an IPv4 route
+       as options 79 and f9 carry. Raise click.BadParameter if text is not
+       such a route"""
+    try:
+        network, gateway = text.split(',')
+        subnet, mask = network.split('/')
+        encode_ip(subnet, int(mask))
+        encode_ip(gateway)
+    except ValueError:
+        raise click.BadParameter(
+            '%s is not <network>/<length>,<gateway>' % text)
+    return {'subnet': subnet, 'mask': str(int(mask)), 'gateway': gateway}
+
+
+def route_set(routes):
+    """Return routes as a set of (subnet, mask, gateway), as they are once
+       encoded in a DHCP option"""
+    return set((r['subnet'], r['mask'], r['gateway'])
+               for r in decode_route(encode_route(routes)))
+
+
+def read_route_targets(targets):
+    """Return routes of each (entity, ID) of a file of targets. A line is
+       `<entity> <ID> [<network>/<length>,<gateway> ...]`, giving all
+       routes of the target. Empty lines and lines starting with # are
+       ignored"""
+    routes = {}
+    for number, line in enumerate(targets, 1):
+        words = line.split()
+        if not words or words[0].startswith('#'):
+            continue
+        if len(words) < 2 or words[0] not in ROUTE_TARGETS:
+            raise click.exceptions.UsageError(
+                "Line %s of %s is not <entity> <ID> [<network>/<length>,"
+                "<gateway> ...]" % (number, targets.name))
+        try:
+            routes[(words[0], words[1])] = [parse_route(r)
+                                            for r in words[2:]]
+        except click.BadParameter as error:
+            raise click.exceptions.UsageError(
+                "Line %s of %s: %s" % (number, targets.name,
+                                       error.message))
+    return routes
+
+
+@vsdcli.command(name='dhcp-route-sync')
+@click.option('--file', 'targets', type=click.File('r'), metavar='<path>',
+              help='File of targets, one `<entity> <ID> [<network>/<length>,'
+                   '<gateway> ...]` per line. - reads standard input')
+@click.option('--domain-id', metavar='<id>',
+              help='Give --route to all subnets of this domain')
+@click.option('--route', metavar='<network>/<length>,<gateway>',
+              multiple=True,
+              help='Route of the subnets of --domain-id. Can be repeated')
+@click.option('--clear', is_flag=True,
+              help='Remove routes of the subnets of --domain-id')
+@click.option('--dry-run', is_flag=True,
+              help='Only show the changes')
+@click.option('--workers', metavar='<count>', type=click.IntRange(1),
+              default=8,
+              help='Count of requests running concurrently. Default : 8')
+@click.pass_context
+def dhcp_route_sync(ctx, targets, domain_id, route, clear, dry_run, workers):
+    """Give routes in dhcp options 79 and f9 to many subnets, l2domains or
+       interfaces. DHCP options of targets are requested concurrently and
+       only options whose routes change are updated, created or deleted"""
+    from open_vsdcli.vsd_inventory import CrawlError
+    from open_vsdcli.vsd_inventory import Crawler
+    if not targets and not domain_id:
+        raise click.exceptions.UsageError(
+            "You must specify --file or --domain-id")
+    if domain_id and not route and not clear:
+        raise click.exceptions.UsageError(
+            "You must specify --route or --clear with --domain-id")
+    if clear and (route or not domain_id):
+        raise click.exceptions.UsageError(
+            "--clear is only used with --domain-id and without --route")
+    nc = ctx.obj['nc']
+    wanted = read_route_targets(targets) if targets else {}
+    if domain_id:
+        routes = [parse_route(r) for r in route]
+        for subnet in nc.get("domains/%s/subnets" % domain_id):
+            wanted[('subnet', subnet['ID'])] = routes
+    changes = {}
+
+    def handle(task, result):
+        if task[2] is None:
+            # Update of an option
+            return []
+        entity, id = task[2]
+        wanted_set = route_set(wanted[(entity, id)])
+        current_set = set()
+        encoded = encode_route([{'subnet': s, 'mask': m, 'gateway': g}
+                                for s, m, g in sorted(wanted_set)])
+        params = {'value': encoded,
+                  'length': hex(int(len(encoded) / 2))[2:].zfill(2)}
+        requests = []
+        types = []
+        for option in result:
+            if option['type'] not in ['79', 'f9']:
+                continue
+            types.append(option['type'])
+            label = option['type']
+            try:
+                routes = route_set(option_routes(option))
+            except ValueError:
+                # Overwritten by the routes of the target
+                label = '%s (malformed)' % option['type']
+                routes = None
+            else:
+                current_set |= routes
+            if not wanted_set:
+                requests.append(('DELETE', label, nc.delete,
+                                 ["dhcpoptions/%s" % option['ID']]))
+            elif routes != wanted_set:
+                requests.append(('PUT', label, nc.put,
+                                 ["dhcpoptions/%s" % option['ID'], params]))
+        for option_type in ['79', 'f9']:
+            if wanted_set and option_type not in types:
+                requests.append(('POST', option_type, nc.post,
+                                 ["%ss/%s/dhcpoptions" % (entity, id),
+                                  dict(params, type=option_type)]))
+        changes[(entity, id)] = (len(wanted_set - current_set),
+                                 len(current_set - wanted_set),
+                                 ', '.join('%s %s' % r[:2] for r in requests))
+        if dry_run:
+            return []
+        return [(r[2], r[3], None) for r in requests]
+
+    try:
+        Crawler(nc, workers=workers).run(
+            [(nc.get, ["%ss/%s/dhcpoptions" % target], target)
+             for target in sorted(wanted)], handle)
+    except CrawlError as error:
+        print('Error: %s' % error)
+        raise SystemExit(1)
+    if dry_run:
+        click.echo('# Dry run: no change is made', err=True)
+    table = Table(["Entity", "ID", "Added", "Removed", "Changes"])
+    for target in sorted(changes):
+        table.add_row(list(target) + list(changes[target]))
+    table.close()
+
+
+# Collections crawled by dhcp-route-audit below each entity type
+AUDIT_TREE = {
+    'enterprises': ['domains', 'l2domains'],
+    'domains': ['subnets'],
+    'subnets': ['dhcpoptions'],
+    'l2domains': ['dhcpoptions'],
+}
+
+
+def audit_routes(options):
+    """Return problems of routes in dhcp options 79 and f9 of a target:
+       repeated options, malformed values, duplicate routes and routes
+       which are not in both options"""
+    from collections import Counter
+
+    def text(key):
+        return '%s/%s via %s' % key
+
+    issues = []
+    routes = {}
+    malformed = False
+    for option_type in ['79', 'f9']:
+        values = [o['value'] for o in options if o['type'] == option_type]
+        if len(values) > 1:
+            issues.append('%s options %s' % (len(values), option_type))
+        if not values:
+            continue
+        try:
+            count = Counter(route_key(r) for r in decode_route(values[0]))
+        except ValueError:
+            issues.append('Malformed option %s: %s' %
+                          (option_type, values[0]))
+            malformed = True
+            continue
+        for key in sorted(k for k in count if count[k] > 1):
+            issues.append('Duplicate route %s in option %s' %
+                          (text(key), option_type))
+        routes[option_type] = set(count)
+    if len(routes) == 1 and not malformed:
+        issues.append('Option %s missing' %
+                      ('f9' if '79' in routes else '79'))
+    elif len(routes) == 2:
+        for option_type, other in [('79', 'f9'), ('f9', '79')]:
+            for key in sorted(routes[option_type] - routes[other]):
+                issues.append('Route %s only in option %s' %
+                              (text(key), option_type))
+    return issues
+
+
+@vsdcli.command(name='dhcp-route-audit')
+@click.option('--enterprise-id', metavar='<id>', required=True)
+@click.option('--workers', metavar='<count>', type=click.IntRange(1),
+              default=8,
+              help='Count of requests running concurrently. Default : 8')
+@click.pass_context
+def dhcp_route_audit(ctx, enterprise_id, workers):
+    """Check routes in dhcp options 79 and f9 of all subnets and l2domains
+       of an enterprise. Report options 79 and f9 which do not have the
+       same routes, malformed options and duplicate routes"""
+    import time
+    from open_vsdcli.vsd_inventory import CrawlError
+    from open_vsdcli.vsd_inventory import Crawler
+    nc = ctx.obj['nc']
+    crawler = Crawler(nc, workers=workers)
+    table = Table(["Entity", "ID", "Name", "Issue"])
+    stats = {'targets': 0, 'options': 0, 'issues': 0, 'decoding': 0}
+
+    def tasks(entity, obj):
+        return [(nc.get, ['%s/%s/%s' % (entity, obj['ID'], child)],
+                 (child, entity, obj))
+                for child in AUDIT_TREE.get(entity, [])]
+
+    def handle(task, objects):
+        entity, parent_entity, parent = task[2]
+        if entity != 'dhcpoptions':
+            new = []
+            for obj in objects:
+                new.extend(tasks(entity, obj))
+            return new
+        start = time.time()
+        issues = audit_routes(objects)
+        stats['decoding'] += time.time() - start
+        stats['targets'] += 1
+        stats['options'] += len([o for o in objects
+                                 if o['type'] in ['79', 'f9']])
+        stats['issues'] += len(issues)
+        for issue in issues:
+            table.add_row([parent_entity[:-1], parent['ID'],
+                           parent.get('name'), issue])
+        return []
+
+    try:
+        crawler.run(tasks('enterprises', {'ID': enterprise_id}), handle)
+    except CrawlError as error:
+        print('Error: %s' % error)
+        raise SystemExit(1)
+    finally:
+        click.echo('# Audit: %s targets, %s options, %s issues, %s requests'
+                   ' in %.1fs (%.1f options/s, %.0f options/s decoded)' %
+                   (stats['targets'], stats['options'], stats['issues'],
+                    crawler.requests, crawler.elapsed,
+                    stats['options'] / max(crawler.elapsed, 0.001),
+                    stats['options'] / max(stats['decoding'], 0.000001)),
+                   err=True)
+    table.close()
+
+
 @vsdcli.command(name='dhcp-gateway-show')
 @click.option('--vminterface-id', metavar='<id>')
 @click.option('--hostinterface-id', metavar='<id>')
@@ -308,10 +642,15 @@ def dhcp_gateway_show(ctx, filter, **ids):
     request = "%ss/%s/dhcpoptions" % (id_type, id)
     result = ctx.obj['nc'].get(request, filter=filter)
 
-    gateway = 'None'
+    gateways = ['None']
     for option in result:
         if option['type'] == '03':
-            gateway = decode_ip(option['value'])
-    table = PrettyTable(["Gateway"])
-    table.add_row([gateway])
-    print(table)
+            try:
+                gateways = decode_ips(option['value'])
+            except ValueError as error:
+                print('Error: %s' % error)
+                raise SystemExit(1)
+    table = Table(["Gateway"])
+    for gateway in gateways:
+        table.add_row([gateway])
+    table.close()
@@ -5,16 +5,17 @@ from open_vsdcli.vsd_common import *
 @click.option('--enterprise-id', metavar='<enterprise ID>', required=True)
 @click.option('--filter', metavar='<filter>',
               help='Filter for NEED TO BE UPDATED')
+@list_options()
 @click.pass_context
 def domaintemplate_list(ctx, enterprise_id, filter):
     """Show all domaintemplate for a given enterprise id"""
-    result = ctx.obj['nc'].get("enterprises/%s/domaintemplates" %
-                               enterprise_id, filter=filter)
-    table = PrettyTable(["Domain Template ID", "Name"])
+    result = list_objects(ctx, "enterprises/%s/domaintemplates" %
+                          enterprise_id, filter)
+    table = Table(["Domain Template ID", "Name"])
     for line in result:
         table.add_row([line['ID'],
                        line['name']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='domaintemplate-show')
@@ -71,6 +72,7 @@ def domaintemplate_update(ctx, domaintemplate_id, key_value):
               help='Filter for serviceID, name, description, customerID, '
                    'labelID, serviceID, lastUpdatedDate, creationDate, '
                    'externalID')
+@list_options()
 @click.pass_context
 def domain_list(ctx, filter, **ids):
     """List domain for optionnal enterprise or domain id"""
@@ -79,19 +81,15 @@ def domain_list(ctx, filter, **ids):
         query = "domains"
     else:
         query = "%ss/%s/domains" % (id_type, id)
-    if not filter:
-        result = ctx.obj['nc'].get(query)
-    else:
-        result = ctx.obj['nc'].get(query,
-                                   filter=filter)
-    table = PrettyTable(["Domain ID", "Name", "Description", "RT / RD"])
+    result = list_objects(ctx, query, filter)
+    table = Table(["Domain ID", "Name", "Description", "RT / RD"])
     for line in result:
         table.add_row([
             line['ID'],
             line['name'],
             line['description'],
             line['routeTarget'] + " / " + line['routeDistinguisher']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='domain-show')
@@ -146,6 +144,95 @@ def domain_update(ctx, domain_id, key_value):
     print_object(result, only=ctx.obj['show_only'])
 
 
+# Levels of domain-tree below a domain
+DOMAIN_TREE = ['zones', 'subnets', 'vports', 'vminterfaces']
+
+
+def tree_label(entity, obj):
+    """Return the text of an object in domain-tree"""
+    label = '%s %s' % (entity[:-1], obj.get('name'))
+    if entity == 'subnets':
+        label += ' %s' % object_cidr(obj)
+    elif entity == 'vminterfaces':
+        label += ' %s %s' % (obj.get('IPAddress'), obj.get('MAC'))
+    return '%s [%s]' % (label, obj['ID'])
+
+
+@vsdcli.command(name='domain-tree')
+@click.argument('domain-id', metavar='<domain ID>', required=True)
+@click.option('--depth', metavar='<levels>',
+              type=click.IntRange(1, len(DOMAIN_TREE)),
+              default=len(DOMAIN_TREE),
+              help='Levels shown below the domain, from 1 (zones) to 4'
+                   ' (VM interfaces). Default : 4')
+@click.option('--zone-filter', metavar='<filter>',
+              help='Filter for zones')
+@click.option('--subnet-filter', metavar='<filter>',
+              help='Filter for subnets')
+@click.option('--vport-filter', metavar='<filter>',
+              help='Filter for vports')
+@click.option('--vminterface-filter', metavar='<filter>',
+              help='Filter for VM interfaces')
+@click.option('--workers', metavar='<count>', type=click.IntRange(1),
+              default=8,
+              help='Count of requests running concurrently. Default : 8')
+@click.pass_context
+def domain_tree(ctx, domain_id, depth, workers, **filters):
+    """Show zones, subnets, vports and VM interfaces of a domain as a tree.
+       Children of an object are requested as soon as it is received.
+       Except for table format, objects are printed as they are received"""
+    from open_vsdcli.vsd_inventory import CrawlError
+    from open_vsdcli.vsd_inventory import Crawler
+    nc = ctx.obj['nc']
+    domain = nc.get("domains/%s" % domain_id)[0]
+    crawler = Crawler(nc, workers=workers)
+    # Objects of each collection, by position of their parent in the tree
+    children = {}
+    table = None
+    if output_format() != 'table':
+        table = Table(["Entity", "ID", "Name", "Parent ID", "Level"])
+
+    def tasks(level, parent_entity, parent_id, position):
+        if level >= depth:
+            return []
+        entity = DOMAIN_TREE[level]
+        return [(nc.get, ['%s/%s/%s' % (parent_entity, parent_id, entity),
+                          filters['%s_filter' % entity[:-1]]],
+                 (level, entity, parent_id, position))]
+
+    def handle(task, objects):
+        level, entity, parent_id, position = task[2]
+        children[position] = objects
+        new = []
+        for index, obj in enumerate(objects):
+            if table:
+                table.add_row([entity, obj['ID'], obj.get('name'),
+                               parent_id, level + 1])
+            new.extend(tasks(level + 1, entity, obj['ID'],
+                             position + (index,)))
+        return new
+
+    try:
+        crawler.run(tasks(0, 'domains', domain['ID'], ()), handle)
+    except CrawlError as error:
+        print('Error: %s' % error)
+        raise SystemExit(1)
+    if table:
+        table.close()
+        return
+
+    def print_tree(position, indent):
+        objects = children.get(position, [])
+        for index, obj in enumerate(objects):
+            last = index == len(objects) - 1
+            print('%s%s%s' % (indent, '`-- ' if last else '|-- ',
+                              tree_label(DOMAIN_TREE[len(position)], obj)))
+            print_tree(position + (index,),
+                       indent + ('    ' if last else '|   '))
+    print(tree_label('domains', domain))
+    print_tree((), '')
+
+
 @vsdcli.command(name='zone-list')
 @click.option('--domain-id', metavar='<domain ID>')
 @click.option('--filter', metavar='<filter>',
@@ -153,6 +240,7 @@ def domain_update(ctx, domain_id, key_value):
                    'numberOfHostsInSubnets, publicZone, address, netmask, '
                    'IPType, name, address, netmask, IPType, name, '
                    'lastUpdatedDate, creationDate, externalID')
+@list_options()
 @click.pass_context
 def zone_list(ctx, domain_id, filter):
     """Show zone for optionnal domain id"""
@@ -160,16 +248,12 @@ def zone_list(ctx, domain_id, filter):
         query = "zones"
     else:
         query = "domains/%s/zones" % domain_id
-    if not filter:
-        result = ctx.obj['nc'].get(query)
-    else:
-        result = ctx.obj['nc'].get(query,
-                                   filter=filter)
-    table = PrettyTable(["Zone ID", "Name"])
+    result = list_objects(ctx, query, filter)
+    table = Table(["Zone ID", "Name"])
     for line in result:
         table.add_row([line['ID'],
                        line['name']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='zone-show')
@@ -5,15 +5,16 @@ from open_vsdcli.vsd_common import *
 @click.option('--filter', metavar='<filter>',
               help='Filter for name, description, lastUpdatedDate, '
                    'creationDate, externalID')
+@list_options()
 @click.pass_context
 def enterprise_list(ctx, filter):
     """Show all enterprise within the VSD"""
-    result = ctx.obj['nc'].get("enterprises", filter=filter)
-    table = PrettyTable(["Enterprise ID", "Name"])
+    result = list_objects(ctx, "enterprises", filter)
+    table = Table(["Enterprise ID", "Name"])
     for line in result:
         table.add_row([line['ID'],
                        line['name']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='enterprise-show')
@@ -69,27 +70,25 @@ def enterprise_update(ctx, enterprise_id, key_value):
 @click.option('--filter', metavar='<filter>',
               help='Filter for name, lastUpdatedDate, creationDate, '
                    'externalID')
+@list_options()
 @click.pass_context
 def enterprisepermission_list(ctx, filter, **ids):
     """List all Enterprise Permission for a CSP entity"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/enterprisepermissions" % (id_type, id)
-    if not filter:
-        result = ctx.obj['nc'].get(request)
-    else:
-        result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID",
-                         "Action",
-                         "Entity ID",
-                         "Entity type",
-                         "Entity name"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID",
+                   "Action",
+                   "Entity ID",
+                   "Entity type",
+                   "Entity name"])
     for line in result:
         table.add_row([line['ID'],
                        line['permittedAction'],
                        line['permittedEntityID'],
                        line['permittedEntityType'],
                        line['permittedEntityName']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='enterprisepermission-show')
@@ -0,0 +1,456 @@
+# Copyright 2015 Maxime Terras <maxime.terras@numergy.com>
+# Copyright 2015 Pierre Padrixe <pierre.padrixe@gmail.com>
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Filter and sort expressions of list commands.
+
+A filter is made of comparisons `<field> <operator> <value>` combined with
+`and`, `or`, `not` and parentheses. Fields are attributes of VSD objects,
+or fields computed by the command (`cidr` of subnets for instance).
+
+    ==  !=  <  <=  >  >=             compare strings, numbers or booleans
+    contains  startswith  endswith   match part of a string
+    =~  !~                           match a regular expression
+    in                               address or network is in a network
+
+Values are quoted strings, numbers, true, false, null or bare words such
+as 10.0.0.0/8. Comparisons the VSD knows are sent in X-Nuage-Filter, the
+others are evaluated on objects as they are received.
+"""
+
+import binascii
+import re
+import socket
+
+from open_vsdcli.vsd_client import PAGE_SIZE_DEFAULT
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+class FilterError(ValueError):
+    pass
+
+
+TOKEN_RE = re.compile(r'''\s*(?:
+    (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    |(?P<op>==|!=|<=|>=|=~|!~|<|>)
+    |(?P<paren>[()])
+    |(?P<word>[^\s()"'<>=!~]+)
+    )''', re.VERBOSE)
+
+WORD_OPERATORS = ['in', 'contains', 'startswith', 'endswith']
+
+# Operators understood by the VSD in X-Nuage-Filter
+VSD_OPERATORS = {
+    '==': '==',
+    '!=': '!=',
+    '<': '<',
+    '<=': '<=',
+    '>': '>',
+    '>=': '>=',
+    'contains': 'CONTAINS',
+    'startswith': 'BEGINSWITH',
+    'endswith': 'ENDSWITH',
+}
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if match is None or match.end() == position:
+            raise FilterError('Unexpected character at position %s: %s' %
+                              (position, text[position:]))
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'string':
+            value = re.sub(r'\\(.)', r'\1', value[1:-1])
+        elif kind == 'word' and value.lower() in (
+                ['and', 'or', 'not'] + WORD_OPERATORS):
+            kind = value.lower()
+            if kind in WORD_OPERATORS:
+                kind, value = 'op', kind
+        tokens.append((kind, value))
+    return tokens
+
+
+def _literal(kind, value):
+    """Return typed value of a token"""
+    if kind == 'string':
+        return value
+    lower = value.lower()
+    if lower in ['true', 'false']:
+        return lower == 'true'
+    if lower == 'null':
+        return None
+    for number_type in [int, float]:
+        try:
+            return number_type(value)
+        except ValueError:
+            pass
+    return value
+
+
+class Parser(object):
+    """Build a tree of tuples from a filter:
+         ('or', left, right), ('and', left, right), ('not', node),
+         ('cmp', field, operator, value)"""
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def next(self, expected=None):
+        kind, value = self.peek()
+        if kind is None:
+            raise FilterError('Unexpected end of expression')
+        if expected and kind != expected:
+            raise FilterError('Expected %s instead of "%s"' %
+                              (expected, value))
+        self.position += 1
+        return kind, value
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek()[0] is not None:
+            raise FilterError('Unexpected "%s"' % self.peek()[1])
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek()[0] == 'or':
+            self.next()
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek()[0] == 'and':
+            self.next()
+            node = ('and', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek()[0] == 'not':
+            self.next()
+            return ('not', self.parse_not())
+        if self.peek()[0] == 'paren' and self.peek()[1] == '(':
+            self.next()
+            node = self.parse_or()
+            kind, value = self.next('paren')
+            if value != ')':
+                raise FilterError('Expected )')
+            return node
+        field = self.next('word')[1]
+        operator = self.next('op')[1]
+        kind, value = self.next()
+        if kind not in ['string', 'word']:
+            raise FilterError('Expected a value after %s' % operator)
+        return ('cmp', field, operator, _literal(kind, value))
+
+
+def parse_network(text):
+    """Return family, address as integer, prefix length and size in bits of
+       an address or a network"""
+    address, _, length = text_type(text).partition('/')
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    try:
+        packed = socket.inet_pton(family, address)
+    except (socket.error, ValueError):
+        raise FilterError('Invalid address: %s' % text)
+    bits = len(packed) * 8
+    number = int(binascii.hexlify(packed), 16)
+    try:
+        length = int(length) if length else bits
+    except ValueError:
+        raise FilterError('Invalid prefix length: %s' % text)
+    if length < 0 or length > bits:
+        raise FilterError('Invalid prefix length: %s' % text)
+    return family, number, length, bits
+
+
+def network_contains(network, value):
+    """Tell if value (address or network) is inside network"""
+    family, number, length, bits = network
+    try:
+        v_family, v_number, v_length, v_bits = parse_network(value)
+    except FilterError:
+        return False
+    if v_family != family or v_length < length:
+        return False
+    return (number ^ v_number) >> (bits - length) == 0
+
+
+def _text(value):
+    if isinstance(value, (text_type, str)):
+        return value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return text_type(value)
+
+
+def _compare(operator, value, literal):
+    if literal is None or value is None:
+        if operator == '==':
+            return value is literal
+        if operator == '!=':
+            return value is not literal
+        return False
+    if isinstance(literal, bool):
+        if not isinstance(value, bool):
+            value = _text(value).lower() == 'true'
+    elif isinstance(literal, (int, float)):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return operator == '!='
+    else:
+        value = _text(value)
+    if operator == '==':
+        return value == literal
+    if operator == '!=':
+        return value != literal
+    if operator == '<':
+        return value < literal
+    if operator == '<=':
+        return value <= literal
+    if operator == '>':
+        return value > literal
+    return value >= literal
+
+
+def compile_predicate(node, computed={}):
+    """Return a function telling if an object matches node"""
+    kind = node[0]
+    if kind in ['and', 'or']:
+        left = compile_predicate(node[1], computed)
+        right = compile_predicate(node[2], computed)
+        if kind == 'and':
+            return lambda obj: left(obj) and right(obj)
+        return lambda obj: left(obj) or right(obj)
+    if kind == 'not':
+        operand = compile_predicate(node[1], computed)
+        return lambda obj: not operand(obj)
+    field, operator, literal = node[1:]
+    if field in computed:
+        get_value = computed[field]
+    else:
+        def get_value(obj):
+            return obj.get(field)
+    if operator in ['=~', '!~']:
+        try:
+            regex = re.compile(_text(literal))
+        except re.error as error:
+            raise FilterError('Invalid regular expression %s: %s' %
+                              (literal, error))
+        match = operator == '=~'
+        return lambda obj: ((regex.search(_text(get_value(obj) or ''))
+                             is not None) == match)
+    if operator == 'in':
+        network = parse_network(literal)
+        return lambda obj: network_contains(network, get_value(obj))
+    if operator in ['contains', 'startswith', 'endswith']:
+        literal = _text(literal)
+        test = {'contains': lambda value: literal in value,
+                'startswith': lambda value: value.startswith(literal),
+                'endswith': lambda value: value.endswith(literal)}[operator]
+        return lambda obj: (get_value(obj) is not None and
+                            test(_text(get_value(obj))))
+    return lambda obj: _compare(operator, get_value(obj), literal)
+
+
+def can_push(node, computed={}):
+    """Tell if the VSD can evaluate node"""
+    kind = node[0]
+    if kind in ['and', 'or']:
+        return can_push(node[1], computed) and can_push(node[2], computed)
+    if kind == 'not':
+        return False
+    field, operator, literal = node[1:]
+    return (field not in computed and operator in VSD_OPERATORS and
+            literal is not None)
+
+
+def to_vsd_filter(node):
+    """Return node written as a X-Nuage-Filter expression"""
+    kind = node[0]
+    if kind in ['and', 'or']:
+        parts = []
+        for child in node[1:]:
+            if child[0] != kind and child[0] != 'cmp':
+                parts.append('(%s)' % to_vsd_filter(child))
+            else:
+                parts.append(to_vsd_filter(child))
+        return (' %s ' % kind).join(parts)
+    field, operator, literal = node[1:]
+    if isinstance(literal, bool):
+        value = 'true' if literal else 'false'
+    elif isinstance(literal, (int, float)):
+        value = repr(literal)
+    else:
+        value = '"%s"' % literal.replace('\\', '\\\\').replace('"', '\\"')
+    return '%s %s %s' % (field, VSD_OPERATORS[operator], value)
+
+
+def _conjuncts(node):
+    if node[0] == 'and':
+        return _conjuncts(node[1]) + _conjuncts(node[2])
+    return [node]
+
+
+def split_filter(text, computed={}):
+    """Return the X-Nuage-Filter part of a filter (or None), and a
+       predicate for the part evaluated on received objects (or None)"""
+    pushed = []
+    kept = []
+    for node in _conjuncts(Parser(text).parse()):
+        if can_push(node, computed):
+            pushed.append(node)
+        else:
+            kept.append(node)
+    server_filter = None
+    if pushed:
+        server_filter = ' and '.join(
+            '(%s)' % to_vsd_filter(n) if n[0] == 'or' else to_vsd_filter(n)
+            for n in pushed)
+    predicate = None
+    if kept:
+        predicates = [compile_predicate(n, computed) for n in kept]
+
+        def predicate(obj):
+            return all(p(obj) for p in predicates)
+    return server_filter, predicate
+
+
+def parse_sort(text):
+    """Return list of (field, descending) from `field,-field,...`"""
+    keys = []
+    for field in text.split(','):
+        field = field.strip()
+        descending = field.startswith('-')
+        field = field.lstrip('+-').strip()
+        if not field:
+            raise FilterError('Empty sort field in "%s"' % text)
+        keys.append((field, descending))
+    return keys
+
+
+def _sort_key(value):
+    # Objects without value come first, and values of different types
+    # must not be compared together
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    return (3, _text(value))
+
+
+def sort_objects(objects, keys, computed={}):
+    objects = list(objects)
+    for field, descending in reversed(keys):
+        if field in computed:
+            get_value = computed[field]
+        else:
+            get_value = (lambda field: lambda obj: obj.get(field))(field)
+        objects.sort(key=lambda obj: _sort_key(get_value(obj)),
+                     reverse=descending)
+    return objects
+
+
+class Query(object):
+    """Filter, sort and paging of a list command, split between the VSD
+       and the client"""
+    def __init__(self, where=None, sort=None, computed={}, order_by=None,
+                 limit=None, page=None, count=False):
+        self.computed = computed
+        self.count_only = count
+        self.server_filter = None
+        self.predicate = None
+        self.order_by = order_by
+        self.sort_keys = None
+        self.limit = limit
+        self.page = page
+        if where:
+            self.server_filter, self.predicate = split_filter(where,
+                                                              computed)
+        if sort and order_by:
+            raise FilterError('Sort and order by can not be used together')
+        if sort:
+            keys = parse_sort(sort)
+            if len(keys) == 1 and keys[0][0] not in computed:
+                self.order_by = '%s %s' % (keys[0][0],
+                                           'DESC' if keys[0][1] else 'ASC')
+            else:
+                self.sort_keys = keys
+
+    def _filter(self, filter):
+        """Return filter combined with conditions sent to the VSD"""
+        if filter and self.server_filter:
+            return '(%s) and (%s)' % (filter, self.server_filter)
+        return filter or self.server_filter
+
+    def _page_size(self, nc):
+        return self.limit or nc.page_size or PAGE_SIZE_DEFAULT
+
+    def iter_objects(self, nc, url, filter=None):
+        """Yield objects of url matching the query, in its order"""
+        from itertools import islice
+        headers = {}
+        if self.order_by:
+            headers['X-Nuage-OrderBy'] = self.order_by
+        filter = self._filter(filter)
+        if not self.predicate and not self.sort_keys:
+            # VSD pages are the pages of the query
+            return nc.iter_get(url, filter=filter, headers=headers,
+                               limit=self.limit, page=self.page)
+        objects = nc.iter_get(url, filter=filter, headers=headers)
+        if self.predicate:
+            objects = (obj for obj in objects if self.predicate(obj))
+        if self.sort_keys:
+            objects = iter(sort_objects(objects, self.sort_keys,
+                                        self.computed))
+        if self.page is not None:
+            size = self._page_size(nc)
+            objects = islice(objects, self.page * size,
+                             (self.page + 1) * size)
+        elif self.limit:
+            objects = islice(objects, self.limit)
+        return objects
+
+    def count(self, nc, url, filter=None):
+        """Return count of objects iter_objects would yield. Only objects
+           selected by the client are fetched"""
+        if self.predicate:
+            objects = nc.iter_get(url, filter=self._filter(filter))
+            total = sum(1 for obj in objects if self.predicate(obj))
+        else:
+            total = nc.count(url, filter=self._filter(filter))
+        if self.page is not None:
+            size = self._page_size(nc)
+            return max(0, min(size, total - self.page * size))
+        if self.limit:
+            return min(total, self.limit)
+        return total
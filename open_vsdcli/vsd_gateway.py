@@ -42,6 +42,7 @@ def gateway_delete(ctx, gateway_id):
 @click.option('--filter', metavar='<filter>',
               help='Filter for pending, systemID, name, description, '
                    'personality, lastUpdatedDate, creationDate, externalID')
+@list_options()
 @click.pass_context
 def gateway_list(ctx, enterprise_id, redundancygroup_id, filter):
     """list gateways for a given enterprise or group id"""
@@ -51,17 +52,14 @@ def gateway_list(ctx, enterprise_id, redundancygroup_id, filter):
         url_request = "redundancygroups/%s/gateways" % redundancygroup_id
     else:
         url_request = "gateways"
-    if not filter:
-        result = ctx.obj['nc'].get(url_request)
-    else:
-        result = ctx.obj['nc'].get(url_request, filter=filter)
-    table = PrettyTable(["ID",
-                         "System ID",
-                         "Name",
-                         "Description",
-                         "Pending",
-                         "Redundancy Group ID",
-                         "Personality"])
+    result = list_objects(ctx, url_request, filter)
+    table = Table(["ID",
+                   "System ID",
+                   "Name",
+                   "Description",
+                   "Pending",
+                   "Redundancy Group ID",
+                   "Personality"])
     for line in result:
         table.add_row([line['ID'],
                        line['systemID'],
@@ -70,7 +68,7 @@ def gateway_list(ctx, enterprise_id, redundancygroup_id, filter):
                        line['pending'],
                        line['redundancyGroupID'],
                        line['personality']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='gateway-show')
@@ -106,23 +104,21 @@ def gateway_update(ctx, gateway_id, key_value):
                    'useUserMnemonic, name, description, physicalName, '
                    'portType, VLANRange, lastUpdatedDate, creationDate, '
                    'externalID')
+@list_options()
 @click.pass_context
 def port_list(ctx, filter, **ids):
     """List all port for a given redundancygroup, gateway or
        autodiscoveredgateway"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/ports" % (id_type, id)
-    if not filter:
-        result = ctx.obj['nc'].get(request)
-    else:
-        result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID", "name", "physicalName", "Type"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID", "name", "physicalName", "Type"])
     for line in result:
         table.add_row([line['ID'],
                        line['name'],
                        line['physicalName'],
                        line['portType']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='port-show')
@@ -154,17 +150,18 @@ def port_update(ctx, port_id, key_value):
 @click.option('--filter', metavar='<filter>',
               help='Filter for value, userMnemonic, useUserMnemonic, '
                    'description, lastUpdatedDate, creationDate, externalID')
+@list_options()
 @click.pass_context
 def vlan_list(ctx, filter, port_id):
     """List all port for a given port"""
-    result = ctx.obj['nc'].get("ports/%s/vlans" % port_id, filter=filter)
-    table = PrettyTable(["ID", "name", "value", "userMnemonic"])
+    result = list_objects(ctx, "ports/%s/vlans" % port_id, filter)
+    table = Table(["ID", "name", "value", "userMnemonic"])
     for line in result:
         table.add_row([line['ID'],
                        line['description'],
                        line['value'],
                        line['userMnemonic']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='vlan-show')
@@ -227,18 +224,19 @@ def vlan_delete(ctx, vlan_id):
 @click.option('--filter', metavar='<filter>',
               help='Filter for name, type, lastUpdatedDate, creationDate, '
                    'externalID')
+@list_options()
 @click.pass_context
 def bridgeinterface_list(ctx, filter, **ids):
     """List all bridge interface for a given domain, l2domain or vport"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/bridgeinterfaces" % (id_type, id)
-    result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID", "name", "VPortID"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID", "name", "VPortID"])
     for line in result:
         table.add_row([line['ID'],
                        line['name'],
                        line['VPortID']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='gatewayredundancygroup-list')
@@ -246,6 +244,7 @@ def bridgeinterface_list(ctx, filter, **ids):
 @click.option('--filter', metavar='<filter>',
               help='Filter for vtep, name, description, personality, '
                    'ID, externalID')
+@list_options()
 @click.pass_context
 def gatewayredundancygroup_list(ctx, filter, enterprise_id):
     """list all gateway redundant groups"""
@@ -253,14 +252,14 @@ def gatewayredundancygroup_list(ctx, filter, enterprise_id):
         url_request = "enterprises/%s/redundancygroups" % enterprise_id
     else:
         url_request = "redundancygroups"
-    result = ctx.obj['nc'].get(url_request, filter=filter)
-    table = PrettyTable(["ID",
-                         "Redundant Gateway Status",
-                         "Name",
-                         "Description",
-                         "Personality",
-                         "gatewayPeer1Name",
-                         "gatewayPeer2Name"])
+    result = list_objects(ctx, url_request, filter)
+    table = Table(["ID",
+                   "Redundant Gateway Status",
+                   "Name",
+                   "Description",
+                   "Personality",
+                   "gatewayPeer1Name",
+                   "gatewayPeer2Name"])
     for line in result:
         table.add_row([line['ID'],
                        line['redundantGatewayStatus'],
@@ -269,7 +268,7 @@ def gatewayredundancygroup_list(ctx, filter, enterprise_id):
                        line['personality'],
                        line['gatewayPeer1Name'],
                        line['gatewayPeer2Name']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='gatewayredundancygroup-create')
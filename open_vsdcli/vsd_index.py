@@ -0,0 +1,215 @@
+# Copyright 2015 Maxime Terras <maxime.terras@numergy.com>
+# Copyright 2015 Pierre Padrixe <pierre.padrixe@gmail.com>
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+# Modules defining commands. Loaded on demand by the vsdcli group
+MODULES = [
+    'vsd_license',
+    'vsd_enterprise',
+    'vsd_domain',
+    'vsd_subnet',
+    'vsd_user',
+    'vsd_gateway',
+    'vsd_vsp',
+    'vsd_vm',
+    'vsd_vport',
+    'vsd_policy',
+    'vsd_dhcp',
+    'vsd_metadata',
+    'vsd_route',
+    'vsd_shell',
+    'vsd_serve',
+    'vsd_snapshot',
+]
+
+# Module of each command, so that running a command only imports its own
+# module. Run `python -m open_vsdcli.vsd_index` to rebuild it after adding
+# or renaming a command
+COMMANDS = {
+    'license-create': 'vsd_license',
+    'license-delete': 'vsd_license',
+    'license-list': 'vsd_license',
+    'license-show': 'vsd_license',
+    'enterprise-create': 'vsd_enterprise',
+    'enterprise-delete': 'vsd_enterprise',
+    'enterprise-list': 'vsd_enterprise',
+    'enterprise-show': 'vsd_enterprise',
+    'enterprise-update': 'vsd_enterprise',
+    'enterprisepermission-create': 'vsd_enterprise',
+    'enterprisepermission-list': 'vsd_enterprise',
+    'enterprisepermission-show': 'vsd_enterprise',
+    'domain-create': 'vsd_domain',
+    'domain-delete': 'vsd_domain',
+    'domain-list': 'vsd_domain',
+    'domain-show': 'vsd_domain',
+    'domain-tree': 'vsd_domain',
+    'domain-update': 'vsd_domain',
+    'domaintemplate-create': 'vsd_domain',
+    'domaintemplate-delete': 'vsd_domain',
+    'domaintemplate-list': 'vsd_domain',
+    'domaintemplate-show': 'vsd_domain',
+    'domaintemplate-update': 'vsd_domain',
+    'zone-create': 'vsd_domain',
+    'zone-delete': 'vsd_domain',
+    'zone-list': 'vsd_domain',
+    'zone-show': 'vsd_domain',
+    'floatingip-list': 'vsd_subnet',
+    'floatingip-show': 'vsd_subnet',
+    'l2domain-create': 'vsd_subnet',
+    'l2domain-delete': 'vsd_subnet',
+    'l2domain-list': 'vsd_subnet',
+    'l2domain-show': 'vsd_subnet',
+    'l2domain-update': 'vsd_subnet',
+    'shared-network-list': 'vsd_subnet',
+    'shared-network-show': 'vsd_subnet',
+    'subnet-create': 'vsd_subnet',
+    'subnet-delete': 'vsd_subnet',
+    'subnet-list': 'vsd_subnet',
+    'subnet-show': 'vsd_subnet',
+    'subnet-update': 'vsd_subnet',
+    'add-permission': 'vsd_user',
+    'group-add-user': 'vsd_user',
+    'group-create': 'vsd_user',
+    'group-del-user': 'vsd_user',
+    'group-delete': 'vsd_user',
+    'group-list': 'vsd_user',
+    'group-show': 'vsd_user',
+    'group-sync': 'vsd_user',
+    'group-update': 'vsd_user',
+    'permission-list': 'vsd_user',
+    'permission-show': 'vsd_user',
+    'user-create': 'vsd_user',
+    'user-delete': 'vsd_user',
+    'user-list': 'vsd_user',
+    'user-show': 'vsd_user',
+    'user-update': 'vsd_user',
+    'bridgeinterface-list': 'vsd_gateway',
+    'gateway-create': 'vsd_gateway',
+    'gateway-delete': 'vsd_gateway',
+    'gateway-list': 'vsd_gateway',
+    'gateway-show': 'vsd_gateway',
+    'gateway-update': 'vsd_gateway',
+    'gatewayredundancygroup-create': 'vsd_gateway',
+    'gatewayredundancygroup-delete': 'vsd_gateway',
+    'gatewayredundancygroup-list': 'vsd_gateway',
+    'gatewayredundancygroup-show': 'vsd_gateway',
+    'gatewayredundancygroup-update': 'vsd_gateway',
+    'port-list': 'vsd_gateway',
+    'port-show': 'vsd_gateway',
+    'port-update': 'vsd_gateway',
+    'vlan-create': 'vsd_gateway',
+    'vlan-delete': 'vsd_gateway',
+    'vlan-list': 'vsd_gateway',
+    'vlan-show': 'vsd_gateway',
+    'vlan-update': 'vsd_gateway',
+    'vsd-componant-list': 'vsd_vsp',
+    'vsd-list': 'vsd_vsp',
+    'vsd-show': 'vsd_vsp',
+    'vsp-list': 'vsd_vsp',
+    'vsp-show': 'vsd_vsp',
+    'vm-create': 'vsd_vm',
+    'vm-delete': 'vsd_vm',
+    'vm-list': 'vsd_vm',
+    'vm-show': 'vsd_vm',
+    'vm-update': 'vsd_vm',
+    'vminterface-create': 'vsd_vm',
+    'vminterface-list': 'vsd_vm',
+    'vminterface-show': 'vsd_vm',
+    'vminterface-update': 'vsd_vm',
+    'bridgeinterface-create': 'vsd_vport',
+    'bridgeinterface-delete': 'vsd_vport',
+    'bridgeinterface-show': 'vsd_vport',
+    'bridgeinterface-update': 'vsd_vport',
+    'trunk-create': 'vsd_vport',
+    'trunk-delete': 'vsd_vport',
+    'trunk-list': 'vsd_vport',
+    'trunk-show': 'vsd_vport',
+    'virtualip-create': 'vsd_vport',
+    'virtualip-delete': 'vsd_vport',
+    'virtualip-list': 'vsd_vport',
+    'virtualip-show': 'vsd_vport',
+    'virtualip-update': 'vsd_vport',
+    'vport-create': 'vsd_vport',
+    'vport-delete': 'vsd_vport',
+    'vport-list': 'vsd_vport',
+    'vport-show': 'vsd_vport',
+    'vport-update': 'vsd_vport',
+    'vporttag-list': 'vsd_vport',
+    'egressacltemplate-create': 'vsd_policy',
+    'egressacltemplate-delete': 'vsd_policy',
+    'egressacltemplate-list': 'vsd_policy',
+    'egressacltemplate-show': 'vsd_policy',
+    'egressacltemplate-update': 'vsd_policy',
+    'ingressacltemplate-create': 'vsd_policy',
+    'ingressacltemplate-delete': 'vsd_policy',
+    'ingressacltemplate-list': 'vsd_policy',
+    'ingressacltemplate-show': 'vsd_policy',
+    'ingressacltemplate-update': 'vsd_policy',
+    'dhcp-gateway-show': 'vsd_dhcp',
+    'dhcp-option-add': 'vsd_dhcp',
+    'dhcp-option-delete': 'vsd_dhcp',
+    'dhcp-option-list': 'vsd_dhcp',
+    'dhcp-option-show': 'vsd_dhcp',
+    'dhcp-route-add': 'vsd_dhcp',
+    'dhcp-route-audit': 'vsd_dhcp',
+    'dhcp-route-delete': 'vsd_dhcp',
+    'dhcp-route-list': 'vsd_dhcp',
+    'dhcp-route-sync': 'vsd_dhcp',
+    'metadata-add-tag': 'vsd_metadata',
+    'metadata-create': 'vsd_metadata',
+    'metadata-delete': 'vsd_metadata',
+    'metadata-list': 'vsd_metadata',
+    'metadata-remove-tag': 'vsd_metadata',
+    'metadata-show': 'vsd_metadata',
+    'metadata-update': 'vsd_metadata',
+    'metadatatag-create': 'vsd_metadata',
+    'metadatatag-delete': 'vsd_metadata',
+    'metadatatag-list': 'vsd_metadata',
+    'metadatatag-show': 'vsd_metadata',
+    'metadatatag-update': 'vsd_metadata',
+    'staticroute-create': 'vsd_route',
+    'staticroute-delete': 'vsd_route',
+    'staticroute-list': 'vsd_route',
+    'staticroute-show': 'vsd_route',
+    'staticroute-update': 'vsd_route',
+    'batch': 'vsd_shell',
+    'shell': 'vsd_shell',
+    'serve': 'vsd_serve',
+    'find': 'vsd_snapshot',
+    'snapshot': 'vsd_snapshot',
+}
+
+
+def build_command_index():
+    """Import all modules and return the module of each command they
+       register"""
+    from importlib import import_module
+    from open_vsdcli.vsd_common import vsdcli
+    index = {}
+    for module in MODULES:
+        known = set(vsdcli.commands)
+        import_module('open_vsdcli.%s' % module)
+        for name in set(vsdcli.commands) - known:
+            index[name] = module
+    return index
+
+
+if __name__ == '__main__':
+    index = build_command_index()
+    print('COMMANDS = {')
+    for module in MODULES:
+        for name in sorted(n for n, m in index.items() if m == module):
+            print("    '%s': '%s'," % (name, module))
+    print('}')
@@ -0,0 +1,533 @@
+# Copyright 2015 Maxime Terras <maxime.terras@numergy.com>
+# Copyright 2015 Pierre Padrixe <pierre.padrixe@gmail.com>
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+# Collections crawled below each entity type. None is the root of the VSD
+TREE = {
+    None: ['enterprises', 'gateways'],
+    'enterprises': ['domains', 'l2domains'],
+    'domains': ['zones'],
+    'zones': ['subnets'],
+    'subnets': ['vports', 'dhcpoptions'],
+    'l2domains': ['vports', 'dhcpoptions'],
+    'vports': ['vminterfaces', 'virtualips', 'dhcpoptions'],
+    'gateways': ['ports'],
+    'ports': ['vlans'],
+}
+
+# Attributes of objects indexed for vsd find
+LOOKUP_FIELDS = ['ID', 'name', 'externalID', 'IPAddress', 'IPv6Address',
+                 'virtualIP', 'MAC']
+
+ENTITIES = sorted(set(child for children in TREE.values()
+                      for child in children))
+
+# Root collections of the VSD holding objects with an ID, a name and an
+# externalID
+ROOT_ENTITIES = ['enterprises', 'domains', 'l2domains', 'zones', 'subnets',
+                 'vports', 'vminterfaces', 'gateways']
+
+# Root collections and attributes asked by vsd find when there is no
+# snapshot, by kind of searched value
+REMOTE_LOOKUPS = {
+    'ip': [('vminterfaces', 'IPAddress'), ('vminterfaces', 'IPv6Address'),
+           ('virtualips', 'virtualIP')],
+    'mac': [('vminterfaces', 'MAC'), ('virtualips', 'MAC')],
+    'id': [(entity, 'ID') for entity in ROOT_ENTITIES],
+    'name': [(entity, field) for entity in ROOT_ENTITIES
+             for field in ['name', 'externalID']],
+}
+
+
+def _depth(entity):
+    """Return the longest path from the root of the VSD to entity in
+       TREE. A collection is deeper than the collection of its parent"""
+    if entity is None:
+        return 0
+    return 1 + max(_depth(parent) for parent in TREE
+                   if entity in TREE[parent])
+
+
+class CrawlError(Exception):
+    pass
+
+
+def lookup_kind(value):
+    """Return the kind of a searched value: id, mac, ip or name"""
+    import re
+    from open_vsdcli.vsd_filter import FilterError
+    from open_vsdcli.vsd_filter import parse_network
+    if re.match(r'^[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12}$', value, re.I):
+        return 'id'
+    if re.match(r'^[0-9a-f]{2}(:[0-9a-f]{2}){5}$', value, re.I):
+        return 'mac'
+    try:
+        parse_network(value)
+        return 'ip'
+    except FilterError:
+        return 'name'
+
+
+# Attributes linking objects of an entity type to the parent shown by
+# vsd find, when it is not the parentType and parentID of objects. The
+# parent of a VM interface is its VM, outside of the enterprise tree
+PARENT_FIELDS = {
+    'vminterfaces': ('vports', 'VPortID'),
+}
+
+
+def _parent_of(entity, obj):
+    """Return (entity, ID) of the parent of obj shown by vsd find, or None
+       for objects at the root of the VSD"""
+    if entity in PARENT_FIELDS:
+        parent_entity, field = PARENT_FIELDS[entity]
+        if obj.get(field):
+            return parent_entity, obj[field]
+    if obj.get('parentType') and obj.get('parentID'):
+        return '%ss' % obj['parentType'], obj['parentID']
+    return None
+
+
+def remote_find(nc, value, prefix=False, workers=8):
+    """Find objects with filtered requests on root collections of the VSD.
+       Return (matches, failed): matches are (field, entity, object,
+       parents) like Inventory.find, parents are found with parentType and
+       parentID of objects, or PARENT_FIELDS. failed lists the requests
+       which failed, their matches are missing. Raise ValueError if value
+       can not be written in a filter"""
+    if '"' in value:
+        raise ValueError('Values with double quotes can only be found in'
+                         ' a snapshot')
+    operator = 'BEGINSWITH' if prefix else '=='
+    lookups = REMOTE_LOOKUPS[lookup_kind(value)]
+    matches = []
+
+    def parent_task(match, entity, obj):
+        parent = _parent_of(entity, obj)
+        if parent is None:
+            return []
+        return [(nc.get, ['%s/%s' % parent], (match, parent[0]))]
+
+    def handle(task, objects):
+        if isinstance(task[2], int):
+            new = []
+            entity, field = lookups[task[2]]
+            for position, obj in enumerate(objects):
+                match = ((task[2], position), field, entity, obj, [])
+                matches.append(match)
+                new.extend(parent_task(match, entity, obj))
+            return new
+        match, parent_entity = task[2]
+        match[4].insert(0, (parent_entity, objects[0]))
+        return parent_task(match, parent_entity, objects[0])
+
+    crawler = Crawler(nc, workers=workers)
+    try:
+        crawler.run(
+            [(nc.get, [entity, '%s %s "%s"' % (field, operator, value)], index)
+             for index, (entity, field) in enumerate(lookups)], handle)
+    except CrawlError:
+        pass
+    failed = [' '.join(task[1]) for task in crawler.failed]
+    return [match[1:] for match in sorted(matches, key=lambda m: m[0])], failed
+
+
+def _updated(obj):
+    """Return lastUpdatedDate of obj as an integer, or None"""
+    try:
+        return int(obj.get('lastUpdatedDate'))
+    except (TypeError, ValueError):
+        return None
+
+
+class Crawler(object):
+    """Run requests of a crawl with up to `workers` of them running
+       concurrently, and keep statistics of the crawl"""
+    def __init__(self, nc, workers=8):
+        self.nc = nc
+        self.workers = workers
+        self.objects = 0
+        self.requests = 0
+        self.errors = 0
+        self.failed = []
+        self.elapsed = 0
+        self.entities = {}
+
+    def _requests_count(self):
+        return self.nc.connection_stats()['requests']
+
+    def count_objects(self, entity, objects):
+        self.objects += len(objects)
+        self.entities[entity] = self.entities.get(entity, 0) + len(objects)
+
+    def run(self, tasks, handle):
+        """Run tasks in workers. A task is (function, args, info).
+           handle(task, result) is called by the calling thread with the
+           result of each task and returns new tasks. Raise CrawlError
+           once all tasks are done if a request failed, failed tasks are
+           kept in failed"""
+        from multiprocessing.pool import ThreadPool
+        start = time.time()
+        start_requests = self._requests_count()
+        results = queue.Queue()
+        pool = ThreadPool(self.workers)
+        pending = [0]
+
+        def call(task):
+            # Errors are kept for the calling thread. VSD errors are
+            # already printed by the connection
+            try:
+                return task, task[0](*task[1]), None
+            except BaseException as error:
+                return task, None, error
+
+        def submit(tasks):
+            for task in tasks:
+                pending[0] += 1
+                pool.apply_async(call, (task,), callback=results.put)
+
+        try:
+            submit(tasks)
+            while pending[0]:
+                task, result, error = results.get()
+                pending[0] -= 1
+                if isinstance(error, SystemExit):
+                    self.errors += 1
+                    self.failed.append(task)
+                    continue
+                if error is not None:
+                    raise error
+                submit(handle(task, result))
+        finally:
+            pool.terminate()
+            self.elapsed += time.time() - start
+            self.requests += self._requests_count() - start_requests
+        if self.errors:
+            raise CrawlError('%s requests failed' % self.errors)
+
+
+class Inventory(object):
+    """Snapshot of VSD objects stored in a SQLite database. Each object is
+       linked to its parent and to its enterprise. Each crawled collection
+       is kept with the last update date of its objects, so that it can
+       be synchronized with the VSD by fetching updated objects only"""
+    def __init__(self, path):
+        self.path = path
+        data_dir = os.path.dirname(path)
+        if data_dir and not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS objects ("
+                       " entity TEXT,"
+                       " id TEXT,"
+                       " name TEXT,"
+                       " parent_entity TEXT,"
+                       " parent_id TEXT,"
+                       " enterprise_id TEXT,"
+                       " updated INTEGER,"
+                       " data TEXT,"
+                       " PRIMARY KEY (entity, id))")
+            for column in ['id', 'name', 'parent_id', 'enterprise_id']:
+                db.execute("CREATE INDEX IF NOT EXISTS objects_%s"
+                           " ON objects (%s)" % (column, column))
+            db.execute("CREATE TABLE IF NOT EXISTS collections ("
+                       " url TEXT PRIMARY KEY,"
+                       " entity TEXT,"
+                       " parent_entity TEXT,"
+                       " parent_id TEXT,"
+                       " enterprise_id TEXT,"
+                       " watermark INTEGER)")
+            db.execute("CREATE INDEX IF NOT EXISTS collections_parent_id"
+                       " ON collections (parent_id)")
+            db.execute("CREATE TABLE IF NOT EXISTS lookups ("
+                       " value TEXT,"
+                       " field TEXT,"
+                       " entity TEXT,"
+                       " id TEXT)")
+            db.execute("CREATE INDEX IF NOT EXISTS lookups_value"
+                       " ON lookups (value)")
+            db.execute("CREATE INDEX IF NOT EXISTS lookups_object"
+                       " ON lookups (entity, id)")
+            db.execute("CREATE TRIGGER IF NOT EXISTS objects_lookups"
+                       " AFTER DELETE ON objects BEGIN"
+                       " DELETE FROM lookups"
+                       " WHERE entity = old.entity AND id = old.id;"
+                       " END")
+            db.execute("CREATE TABLE IF NOT EXISTS snapshots ("
+                       " enterprise_id TEXT PRIMARY KEY,"
+                       " date REAL,"
+                       " objects INTEGER,"
+                       " requests INTEGER,"
+                       " elapsed REAL)")
+        os.chmod(path, 0o600)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _children_tasks(self, nc, entity, obj_id, owner):
+        """Return tasks fetching collections below an object"""
+        return [(nc.get, ['%s/%s/%s' % (entity, obj_id, child)],
+                 ('crawl', '%s/%s/%s' % (entity, obj_id, child), child,
+                  entity, obj_id, owner))
+                for child in TREE.get(entity, [])]
+
+    def _root_tasks(self, nc, enterprise_id):
+        if enterprise_id:
+            url = 'enterprises/%s' % enterprise_id
+            return [(nc.get, [url],
+                     ('crawl', url, 'enterprises', None, None,
+                      enterprise_id)),
+                    (nc.get, [url + '/gateways'],
+                     ('crawl', url + '/gateways', 'gateways', 'enterprises',
+                      enterprise_id, enterprise_id))]
+        return [(nc.get, [entity], ('crawl', entity, entity, None, None,
+                                    None))
+                for entity in TREE[None]]
+
+    def _write(self, db, info, objects):
+        """Store objects of a collection and update its watermark. Return
+           objects which were unknown"""
+        kind, url, entity, parent_entity, parent_id, owner = info
+        new = []
+        rows = []
+        lookups = []
+        for obj in objects:
+            if entity == 'enterprises':
+                obj_owner = obj['ID']
+            else:
+                obj_owner = owner or obj.get('enterpriseID')
+            if db.execute("SELECT 1 FROM objects WHERE entity = ? AND id = ?",
+                          (entity, obj['ID'])).fetchone() is None:
+                new.append((obj, obj_owner))
+            rows.append((entity, obj['ID'], obj.get('name'), parent_entity,
+                         parent_id, obj_owner, _updated(obj),
+                         json.dumps(obj)))
+            lookups.extend((('%s' % obj[field]).lower(), field, entity,
+                            obj['ID'])
+                           for field in LOOKUP_FIELDS if obj.get(field))
+            db.execute("DELETE FROM lookups WHERE entity = ? AND id = ?",
+                       (entity, obj['ID']))
+        db.executemany("INSERT OR REPLACE INTO objects"
+                       " (entity, id, name, parent_entity, parent_id,"
+                       "  enterprise_id, updated, data)"
+                       " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        db.executemany("INSERT INTO lookups (value, field, entity, id)"
+                       " VALUES (?, ?, ?, ?)", lookups)
+        dates = [_updated(obj) for obj in objects
+                 if _updated(obj) is not None]
+        row = db.execute("SELECT watermark FROM collections WHERE url = ?",
+                         (url,)).fetchone()
+        if row is not None and row[0] is not None:
+            dates.append(row[0])
+        db.execute("INSERT OR REPLACE INTO collections"
+                   " (url, entity, parent_entity, parent_id, enterprise_id,"
+                   "  watermark)"
+                   " VALUES (?, ?, ?, ?, ?, ?)",
+                   (url, entity, parent_entity, parent_id, owner,
+                    max(dates) if dates else None))
+        return new
+
+    def _delete(self, db, entity, ids):
+        """Delete objects, and the objects and collections below them"""
+        deleted = 0
+        objects = [(entity, obj_id) for obj_id in ids]
+        while objects:
+            entity, obj_id = objects.pop()
+            db.execute("DELETE FROM objects WHERE entity = ? AND id = ?",
+                       (entity, obj_id))
+            db.execute("DELETE FROM collections"
+                       " WHERE parent_entity = ? AND parent_id = ?",
+                       (entity, obj_id))
+            objects.extend(db.execute(
+                "SELECT entity, id FROM objects"
+                " WHERE parent_entity = ? AND parent_id = ?",
+                (entity, obj_id)).fetchall())
+            deleted += 1
+        return deleted
+
+    def _collection_ids(self, db, entity, parent_entity, parent_id):
+        return set(row[0] for row in db.execute(
+            "SELECT id FROM objects WHERE entity = ?"
+            " AND parent_entity IS ? AND parent_id IS ?",
+            (entity, parent_entity, parent_id)))
+
+    def save(self, crawler, enterprise_id=None):
+        """Replace the snapshot of the whole VSD, or of one enterprise, by
+           a crawl. Nothing is replaced if the crawl fails"""
+        nc = crawler.nc
+
+        def handle(task, objects):
+            entity = task[2][2]
+            crawler.count_objects(entity, objects)
+            tasks = []
+            for obj, owner in self._write(db, task[2], objects):
+                tasks.extend(self._children_tasks(nc, entity, obj['ID'],
+                                                  owner))
+            return tasks
+
+        with self._connect() as db:
+            if enterprise_id:
+                self._delete(db, 'enterprises', [enterprise_id])
+                db.execute("DELETE FROM objects WHERE enterprise_id = ?",
+                           (enterprise_id,))
+                db.execute("DELETE FROM collections WHERE enterprise_id = ?",
+                           (enterprise_id,))
+            else:
+                for table in ['objects', 'collections', 'snapshots']:
+                    db.execute("DELETE FROM %s" % table)
+            crawler.run(self._root_tasks(nc, enterprise_id), handle)
+            self._save_stats(db, crawler, enterprise_id)
+
+    def sync(self, crawler, enterprise_id=None):
+        """Update the snapshot of the whole VSD, or of one enterprise, with
+           objects updated since it was taken. Each collection is asked for
+           objects updated after its watermark and for its count of
+           objects. Collections whose count differs from the snapshot are
+           listed again to find deleted objects. Collections below new
+           objects are crawled. Collections are synchronized from the root,
+           one level at a time, so that collections below deleted objects
+           are dropped before being asked. Return count of deleted
+           objects"""
+        nc = crawler.nc
+        deleted = [0]
+
+        def fetch_changes(url, watermark):
+            if len(url.split('/')) % 2 == 0:
+                # A single object (enterprise of the snapshot)
+                return nc.get(url), None
+            if watermark is None:
+                objects = nc.get(url)
+            else:
+                objects = nc.get(url,
+                                 filter='lastUpdatedDate > %s' % watermark)
+            return objects, nc.count(url)
+
+        def handle(task, result):
+            kind, url, entity, parent_entity, parent_id, owner = task[2]
+            if kind == 'sync':
+                objects, count = result
+            else:
+                objects, count = result, None
+            crawler.count_objects(entity, objects)
+            if kind == 'list':
+                # Full listing of a collection which lost objects
+                known = self._collection_ids(db, entity, parent_entity,
+                                             parent_id)
+                gone = known - set(obj['ID'] for obj in objects)
+                deleted[0] += self._delete(db, entity, gone)
+            new = self._write(db, task[2], objects)
+            tasks = []
+            for obj, obj_owner in new:
+                tasks.extend(self._children_tasks(nc, entity, obj['ID'],
+                                                  obj_owner))
+            if count is not None and count != len(self._collection_ids(
+                    db, entity, parent_entity, parent_id)):
+                tasks.append((nc.get, [url], ('list',) + task[2][1:]))
+            return tasks
+
+        with self._connect() as db:
+            query = ("SELECT url, entity, parent_entity, parent_id,"
+                     " enterprise_id, watermark FROM collections")
+            if enterprise_id:
+                rows = db.execute(query + " WHERE enterprise_id = ?",
+                                  (enterprise_id,)).fetchall()
+            else:
+                rows = db.execute(query).fetchall()
+            if not rows:
+                raise CrawlError('No snapshot to synchronize')
+            levels = {}
+            for row in rows:
+                levels.setdefault(_depth(row[2]), []).append(row)
+            for level in sorted(levels):
+                tasks = []
+                for row in levels[level]:
+                    if db.execute("SELECT 1 FROM collections WHERE url = ?",
+                                  (row[0],)).fetchone() is None:
+                        # Below an object deleted by a previous level
+                        continue
+                    tasks.append((fetch_changes, [row[0], row[5]],
+                                  ('sync',) + tuple(row[:5])))
+                crawler.run(tasks, handle)
+            self._save_stats(db, crawler, enterprise_id)
+        return deleted[0]
+
+    def indexed(self):
+        """Tell if the snapshot has objects to find"""
+        with self._connect() as db:
+            return db.execute("SELECT 1 FROM lookups"
+                              " LIMIT 1").fetchone() is not None
+
+    def find(self, value, prefix=False):
+        """Return (field, entity, object, parents) of objects whose ID,
+           name, externalID, address or MAC is value, or begins with value
+           if prefix is set. Values are compared case-insensitively.
+           parents are (entity, object) from the root to the object"""
+        value = value.lower()
+        with self._connect() as db:
+            if prefix:
+                rows = db.execute("SELECT field, entity, id FROM lookups"
+                                  " WHERE value >= ? AND value < ?",
+                                  (value, value + u'\uffff')).fetchall()
+            else:
+                rows = db.execute("SELECT field, entity, id FROM lookups"
+                                  " WHERE value = ?", (value,)).fetchall()
+            matches = []
+            for field, entity, obj_id in rows:
+                obj, parent_entity, parent_id = self._object(db, entity,
+                                                             obj_id)
+                parents = []
+                while parent_entity is not None:
+                    parent, grand_entity, grand_id = self._object(
+                        db, parent_entity, parent_id)
+                    if parent is None:
+                        # Parent of a collection of one enterprise
+                        break
+                    parents.insert(0, (parent_entity, parent))
+                    parent_entity, parent_id = grand_entity, grand_id
+                matches.append((field, entity, obj, parents))
+        return matches
+
+    def _object(self, db, entity, obj_id):
+        row = db.execute("SELECT data, parent_entity, parent_id FROM objects"
+                         " WHERE entity = ? AND id = ?",
+                         (entity, obj_id)).fetchone()
+        if row is None:
+            return None, None, None
+        return json.loads(row[0]), row[1], row[2]
+
+    def _save_stats(self, db, crawler, enterprise_id):
+        db.execute("INSERT OR REPLACE INTO snapshots"
+                   " (enterprise_id, date, objects, requests, elapsed)"
+                   " VALUES (?, ?, ?, ?, ?)",
+                   (enterprise_id or '', time.time(), crawler.objects,
+                    crawler.requests, crawler.elapsed))
@@ -2,18 +2,19 @@ from open_vsdcli.vsd_common import *
 
 
 @vsdcli.command(name='license-list')
+@list_options()
 @click.pass_context
 def license_list(ctx):
     """Show all license within the VSD"""
     from datetime import datetime
-    result = ctx.obj['nc'].get("licenses")
-    table = PrettyTable(["License id",
-                         "is Cluster",
-                         "Compagny",
-                         "Max NICs",
-                         "Max VMs",
-                         "Version",
-                         "Expiration"])
+    result = list_objects(ctx, "licenses")
+    table = Table(["License id",
+                   "is Cluster",
+                   "Compagny",
+                   "Max NICs",
+                   "Max VMs",
+                   "Version",
+                   "Expiration"])
     for line in result:
         version = line['productVersion'] + 'R' + str(line['majorRelease']),
         table.add_row([line['ID'],
@@ -26,7 +27,7 @@ def license_list(ctx):
                        datetime.fromtimestamp(
                            line['expirationDate'] /
                            1000).strftime('%Y-%m-%d %H:%M:%S')])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='license-show')
@@ -1,6 +1,28 @@
 from open_vsdcli.vsd_common import *
 
 
+def resolve_tags(nc, tag_ids, workers=8):
+    """Return metadata tags of tag_ids by ID. Each tag is requested once,
+       up to `workers` requests running concurrently. With --cache, tags
+       are kept in the response cache"""
+    from open_vsdcli.vsd_inventory import CrawlError
+    from open_vsdcli.vsd_inventory import Crawler
+    tags = {}
+
+    def handle(task, result):
+        tags[task[2]] = result[0]
+        return []
+
+    tasks = [(nc.get, ["metadatatags/%s" % tag_id], tag_id)
+             for tag_id in sorted(set(tag_ids))]
+    try:
+        Crawler(nc, workers=workers).run(tasks, handle)
+    except CrawlError:
+        # Missing tags are already reported by the connection
+        raise SystemExit(1)
+    return tags
+
+
 @vsdcli.command(name='metadata-list')
 @click.option('--entity', metavar='<name>', help="Can be any entity in VSD")
 @click.option('--id', metavar='<ID>', help="ID of the entity")
@@ -9,20 +31,37 @@ from open_vsdcli.vsd_common import *
 @click.option('--filter', metavar='<filter>',
               help='Filter for name, description, blob, global,'
                    ' networkNotificationDisabled, ID, externalID')
+@click.option('--with-tags', is_flag=True,
+              help="Show names of the tags of each metadata")
+@list_options()
 @click.pass_context
-def metadata_list(ctx, filter, entity, id, is_global):
+def metadata_list(ctx, filter, entity, id, is_global, with_tags):
     """List all metadata associated to any entity"""
     if is_global:
         request = "%ss/%s/globalmetadatas" % (entity, id)
     else:
         request = "%ss/%s/metadatas" % (entity, id)
-    result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID", "name", "description"])
+    result = list_objects(ctx, request, filter)
+    if not with_tags:
+        table = Table(["ID", "name", "description"])
+        for line in result:
+            table.add_row([line['ID'],
+                           line['name'],
+                           line['description']])
+        table.close()
+        return
+    # Tags of all metadata are resolved at once
+    result = list(result)
+    tags = resolve_tags(ctx.obj['nc'], [tag for line in result
+                                        for tag in line['metadataTagIDs']])
+    table = Table(["ID", "name", "description", "tags"])
     for line in result:
         table.add_row([line['ID'],
                        line['name'],
-                       line['description']])
-    print(table)
+                       line['description'],
+                       ', '.join(tags[tag]['name']
+                                 for tag in line['metadataTagIDs'])])
+    table.close()
 
 
 @vsdcli.command(name='metadata-show')
@@ -47,15 +86,13 @@ def metadata_show(ctx, metadata_id, data, is_global, list_tag):
     if not list_tag:
         print_object(result, only=ctx.obj['show_only'], exclude=['blob'])
         return
-    tags = []
-    for tag in result['metadataTagIDs']:
-        tags.append(ctx.obj['nc'].get("metadatatags/%s" % tag)[0])
-    table = PrettyTable(["ID", "name", "description"])
-    for line in tags:
+    tags = resolve_tags(ctx.obj['nc'], result['metadataTagIDs'])
+    table = Table(["ID", "name", "description"])
+    for line in [tags[tag] for tag in result['metadataTagIDs']]:
         table.add_row([line['ID'],
                        line['name'],
                        line['description']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='metadata-create')
@@ -118,12 +155,14 @@ def metadata_add_tag(ctx, metadata_id, is_global, tag):
         request = "globalmetadatas/%s" % metadata_id
     else:
         request = "metadatas/%s" % metadata_id
+    result = ctx.obj['nc'].get(request)[0]
     params = {}
-    params['metadataTagIDs'] = ctx.obj['nc'].get(request)[0]['metadataTagIDs']
+    params['metadataTagIDs'] = list(result['metadataTagIDs'])
     for t in tag:
         params['metadataTagIDs'].append(t)
     ctx.obj['nc'].put(request, params)
-    result = ctx.obj['nc'].get(request)[0]
+    # Metadata is not requested again: only its tags changed
+    result.update(params)
     print_object(result, only=ctx.obj['show_only'], exclude=['blob'])
 
 
@@ -141,7 +180,8 @@ def metadata_remove_tag(ctx, metadata_id, is_global, tag):
         request = "globalmetadatas/%s" % metadata_id
     else:
         request = "metadatas/%s" % metadata_id
-    existing_tag = ctx.obj['nc'].get(request)[0]['metadataTagIDs']
+    result = ctx.obj['nc'].get(request)[0]
+    existing_tag = result['metadataTagIDs']
     if not len(existing_tag):
         print("Error: There is no tag for metadata %s" % metadata_id)
         exit(1)
@@ -156,7 +196,8 @@ def metadata_remove_tag(ctx, metadata_id, is_global, tag):
         print("Warning: none of given tag exists in metadata %s" % metadata_id)
         exit(1)
     ctx.obj['nc'].put(request, params)
-    result = ctx.obj['nc'].get(request)[0]
+    # Metadata is not requested again: only its tags changed
+    result.update(params)
     print_object(result, only=ctx.obj['show_only'], exclude=['blob'])
 
 
@@ -175,6 +216,7 @@ def metadata_delete(ctx, metadata_id):
 @click.option('--filter', metavar='<filter>',
               help="Filter for name, description, associatedExternalServiceID"
                    ", autoCreated, ID, externalID")
+@list_options()
 @click.pass_context
 def metadatatag_list(ctx, enterprise_id, metadata_id, filter):
     """Show all metadata tags for a given enterprise or metadata.
@@ -186,13 +228,13 @@ def metadatatag_list(ctx, enterprise_id, metadata_id, filter):
         request = "metadatas/%s/metadatatags" % metadata_id
     else:
         request = "metadatatags"
-    result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID", "name", "description"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID", "name", "description"])
     for line in result:
         table.add_row([line['ID'],
                        line['name'],
                        line['description']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='metadatatag-show')
@@ -11,25 +11,26 @@ from open_vsdcli.vsd_common import *
                    'useUserMnemonic, name, description, physicalName, '
                    'portType, VLANRange, lastUpdatedDate, creationDate, '
                    'externalID')
+@list_options()
 @click.pass_context
 def egressacltemplate_list(ctx, filter, **ids):
     """List all egress acl template for a given l2domaintemplate,
        domaintemplate, domain or l2domain"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/egressacltemplates" % (id_type, id)
-    result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID",
-                         "name",
-                         "active",
-                         "defaultAllowIP",
-                         "defaultAllowNonIP"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID",
+                   "name",
+                   "active",
+                   "defaultAllowIP",
+                   "defaultAllowNonIP"])
     for line in result:
         table.add_row([line['ID'],
                        line['name'],
                        line['active'],
                        line['defaultAllowIP'],
                        line['defaultAllowNonIP']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='egressacltemplate-show')
@@ -96,19 +97,20 @@ def egressacltemplate_create(ctx, name, **ids):
               help='Filter for allowL2AddressSpoof, defaultAllowIP, '
                    'defaultAllowNonIP, name, description, active, '
                    'lastUpdatedDate, creationDate, externalID')
+@list_options()
 @click.pass_context
 def ingressacltemplate_list(ctx, filter, **ids):
     """List all ingress acl template for a given l2domaintemplate,
        domaintemplate, domain or l2domain"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/ingressacltemplates" % (id_type, id)
-    result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID",
-                         "name",
-                         "active",
-                         "defaultAllowIP",
-                         "defaultAllowNonIP",
-                         "allowL2AddressSpoof"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID",
+                   "name",
+                   "active",
+                   "defaultAllowIP",
+                   "defaultAllowNonIP",
+                   "allowL2AddressSpoof"])
     for line in result:
         table.add_row([line['ID'],
                        line['name'],
@@ -116,7 +118,7 @@ def ingressacltemplate_list(ctx, filter, **ids):
                        line['defaultAllowIP'],
                        line['defaultAllowNonIP'],
                        line['allowL2AddressSpoof']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='ingressacltemplate-show')
@@ -13,6 +13,7 @@ from open_vsdcli.vsd_common import *
               help='Filter for address, BFDEnabled, blackHoleEnabled, '
                    'externalID, IPType, IPv6Address, netmask, nextHopIP, '
                    'routeDistinguisher')
+@list_options(computed={'cidr': object_cidr})
 @click.pass_context
 def staticroute_list(ctx, filter, **ids):
     """List statics route"""
@@ -21,11 +22,8 @@ def staticroute_list(ctx, filter, **ids):
         uri = "staticroutes"
     else:
         uri = "%ss/%s/staticroutes" % (id_type, id)
-    if not filter:
-        result = ctx.obj['nc'].get(uri)
-    else:
-        result = ctx.obj['nc'].get(uri, filter=filter)
-    table = PrettyTable(["ID", "Subnet", "Next hop"])
+    result = list_objects(ctx, uri, filter)
+    table = Table(["ID", "Subnet", "Next hop"])
     for line in result:
         if line['IPType'] == 'IPV4':
             address = line['address'] + "/" + \
@@ -37,7 +35,7 @@ def staticroute_list(ctx, filter, **ids):
             address,
             line['nextHopIp']
         ])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='staticroute-show')
@@ -0,0 +1,46 @@
+from open_vsdcli.vsd_common import *
+
+
+@vsdcli.command(name='serve')
+@click.pass_context
+def serve(ctx):
+    """Share a warm VSD connection with other vsd commands through a UNIX
+       socket. API key, HTTP connections and response cache (--cache) are
+       kept while the daemon runs. Commands using the same credentials and
+       connection options (--page-size, --cache, --pool-size...) send their
+       requests to the daemon. Stop it with Ctrl-C or SIGTERM"""
+    import os
+    import signal
+    import sys
+    from open_vsdcli.vsd_daemon import DaemonServer
+    from open_vsdcli.vsd_daemon import daemon_is_running
+    path = ctx.obj['daemon_socket']
+    nc = ctx.obj['nc']
+    if os.path.exists(path):
+        if daemon_is_running(path):
+            print('Error: vsd serve is already running on %s' % path)
+            raise SystemExit(1)
+        # Left by a daemon which did not stop cleanly
+        os.remove(path)
+    socket_dir = os.path.dirname(path)
+    if socket_dir and not os.path.exists(socket_dir):
+        os.makedirs(socket_dir)
+    # Authenticate now so that first clients do not wait for it
+    nc.authenticate()
+    server = DaemonServer(path, nc, ctx.obj['identity'])
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+    signal.signal(signal.SIGTERM, stop)
+    stdout = sys.stdout
+    # Output of each request is sent back to its client
+    sys.stdout = ThreadOutput(stdout)
+    click.echo('# vsd serve listening on %s' % path, err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = stdout
+        server.server_close()
+        os.remove(path)
@@ -0,0 +1,193 @@
+from open_vsdcli.vsd_common import *
+
+
+SHELL_COMMANDS = ['exit', 'help', 'quit']
+
+
+def shell_run(ctx, args):
+    """Run a vsd command in the context of the shell and return its exit
+       status. Errors are printed and never leave the shell"""
+    group = ctx.command
+    name = args[0]
+    command = group.get_command(ctx, name)
+    if command is None or name in ['shell', 'batch', 'serve']:
+        print('Error: No such command "%s".' % name)
+        return 2
+    try:
+        with command.make_context(name, args[1:], parent=ctx) as sub_ctx:
+            command.invoke(sub_ctx)
+    except click.exceptions.ClickException as error:
+        error.show()
+        return error.exit_code
+    except click.exceptions.Abort:
+        print('Aborted!')
+        return 1
+    except click.exceptions.Exit as error:
+        return error.exit_code
+    except SystemExit as error:
+        if error.code is None:
+            return 0
+        if isinstance(error.code, int):
+            return error.code
+        print(error.code)
+        return 1
+    return 0
+
+
+def shell_completer(ctx):
+    """Return a readline completer for command names, then for options of
+       the command"""
+    import readline
+    group = ctx.command
+
+    def complete(text, state):
+        words = readline.get_line_buffer()[:readline.get_begidx()].split()
+        if not words:
+            candidates = SHELL_COMMANDS + group.list_commands(ctx)
+        else:
+            command = group.get_command(ctx, words[0])
+            if command is None:
+                return None
+            candidates = [opt for param in command.params
+                          for opt in param.opts if opt.startswith('-')]
+            candidates.append('--help')
+        candidates = sorted(c for c in candidates if c.startswith(text))
+        if state < len(candidates):
+            return candidates[state] + ' '
+        return None
+    return complete
+
+
+@vsdcli.command(name='shell')
+@click.pass_context
+def shell(ctx):
+    """Run vsd commands interactively with one VSD connection"""
+    import shlex
+    import sys
+    try:
+        read_line = raw_input
+    except NameError:
+        read_line = input
+    parent = ctx.parent
+    prompt = ''
+    if sys.stdin.isatty():
+        prompt = 'vsd> '
+        try:
+            import readline
+        except ImportError:
+            pass
+        else:
+            from os.path import expanduser
+            import atexit
+            history = '%s/.vsd/history' % expanduser('~')
+            try:
+                readline.read_history_file(history)
+            except (IOError, OSError):
+                pass
+
+            def save_history():
+                try:
+                    readline.write_history_file(history)
+                except (IOError, OSError):
+                    pass
+            atexit.register(save_history)
+            readline.set_completer_delims(' ')
+            readline.set_completer(shell_completer(parent))
+            readline.parse_and_bind('tab: complete')
+    while True:
+        try:
+            line = read_line(prompt)
+        except EOFError:
+            if prompt:
+                print('')
+            break
+        except KeyboardInterrupt:
+            print('')
+            continue
+        try:
+            args = shlex.split(line)
+        except ValueError as error:
+            print('Error: %s' % error)
+            continue
+        if not args:
+            continue
+        if args[0] in ['exit', 'quit']:
+            break
+        if args[0] == 'help':
+            click.echo(parent.get_help())
+            continue
+        try:
+            shell_run(parent, args)
+        except KeyboardInterrupt:
+            print('')
+
+
+@vsdcli.command(name='batch')
+@click.argument('batch-file', metavar='<file|->', type=click.File('r'))
+@click.option('--parallel', metavar='<count>', type=click.IntRange(1),
+              default=1,
+              help='Count of lines run concurrently. Lines must not depend'
+                   ' on each other. Default : 1')
+@click.option('--stop-on-error', is_flag=True,
+              help='Do not run lines following a failed one')
+@click.pass_context
+def batch(ctx, batch_file, parallel, stop_on_error):
+    """Run vsd commands of a file (- for stdin) with one VSD connection.
+       Empty lines and lines starting with # are ignored"""
+    import shlex
+    import sys
+    from open_vsdcli.vsd_client import imap_parallel
+    parent = ctx.parent
+    stdout = sys.stdout
+    stderr = sys.stderr
+
+    def read_lines():
+        for number, line in enumerate(batch_file, 1):
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield number, line
+
+    def run_line(item):
+        number, line = item
+        if parallel > 1:
+            sys.stdout.capture()
+            sys.stderr.capture()
+        try:
+            try:
+                status = shell_run(parent, shlex.split(line))
+            except ValueError as error:
+                print('Error: %s' % error)
+                status = 2
+        finally:
+            if parallel > 1:
+                output = (sys.stdout.release(), sys.stderr.release())
+            else:
+                output = ('', '')
+        return number, line, status, output
+
+    run = 0
+    failed = 0
+    if parallel > 1:
+        # Output of each line is kept apart and printed in order
+        sys.stdout = ThreadOutput(stdout)
+        sys.stderr = ThreadOutput(stderr)
+    try:
+        for number, line, status, output in imap_parallel(
+                run_line, read_lines(), parallel):
+            stdout.write(output[0])
+            stderr.write(output[1])
+            stdout.flush()
+            click.echo('# Line %s (exit %s): %s' % (number, status, line),
+                       err=True)
+            run += 1
+            if status != 0:
+                failed += 1
+                if stop_on_error:
+                    break
+    finally:
+        sys.stdout = stdout
+        sys.stderr = stderr
+    click.echo('# Batch: %s lines run, %s succeeded, %s failed' %
+               (run, run - failed, failed), err=True)
+    if failed:
+        raise SystemExit(1)
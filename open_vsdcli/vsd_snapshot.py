@@ -0,0 +1,102 @@
+from open_vsdcli.vsd_common import *
+
+
+def inventory_path(database):
+    """Return path of the inventory database, by default in ~/.vsd"""
+    if database:
+        return database
+    from os.path import expanduser
+    return '%s/.vsd/inventory.db' % expanduser('~')
+
+
+@vsdcli.command(name='find')
+@click.argument('value', metavar='<value>')
+@click.option('--prefix', is_flag=True,
+              help='Find values beginning with <value>')
+@click.option('--database', metavar='<path>', envvar='VSD_INVENTORY',
+              help='SQLite database of the snapshot. Default :'
+                   ' ~/.vsd/inventory.db')
+@click.option('--workers', metavar='<count>', type=click.IntRange(1),
+              default=8,
+              help='Count of requests running concurrently when asking the'
+                   ' VSD. Default : 8')
+@click.pass_context
+def find(ctx, value, prefix, database, workers):
+    """Find objects by IP, MAC, name, ID or externalID and show their
+       parents. Search the snapshot taken by vsd snapshot, or ask the VSD
+       if there is no snapshot"""
+    import os
+    from open_vsdcli.vsd_inventory import Inventory
+    from open_vsdcli.vsd_inventory import remote_find
+    path = inventory_path(database)
+    inventory = Inventory(path) if os.path.exists(path) else None
+    failed = []
+    if inventory is not None and inventory.indexed():
+        matches = inventory.find(value, prefix)
+    else:
+        click.echo('# No snapshot, asking the VSD', err=True)
+        try:
+            matches, failed = remote_find(ctx.obj['nc'], value, prefix,
+                                          workers)
+        except ValueError as error:
+            print('Error: %s' % error)
+            raise SystemExit(1)
+    table = Table(["Entity", "ID", "Name", "Field", "Parents"])
+    for field, entity, obj, parents in matches:
+        table.add_row([entity, obj['ID'], obj.get('name'), field,
+                       ' > '.join('%s:%s' % (parent_entity, parent.get('name'))
+                                  for parent_entity, parent in parents)])
+    table.close()
+    if failed:
+        # Matches above may be missing objects or parents
+        print('Error: %s lookups failed:' % len(failed))
+        for lookup in failed:
+            print('  %s' % lookup)
+        raise SystemExit(1)
+
+
+@vsdcli.command(name='snapshot')
+@click.option('--enterprise-id', metavar='<id>',
+              help='Only crawl this enterprise and its gateways, replacing'
+                   ' their previous snapshot')
+@click.option('--workers', metavar='<count>', type=click.IntRange(1),
+              default=8,
+              help='Count of requests running concurrently. Default : 8')
+@click.option('--database', metavar='<path>', envvar='VSD_INVENTORY',
+              help='SQLite database of the snapshot. Default :'
+                   ' ~/.vsd/inventory.db')
+@click.option('--incremental', is_flag=True,
+              help='Only fetch objects updated since the previous snapshot'
+                   ' and find deleted objects with counts')
+@click.pass_context
+def snapshot(ctx, enterprise_id, workers, database, incremental):
+    """Copy enterprises, domains, l2domains, zones, subnets, vports, VM
+       interfaces, virtual IPs, DHCP options, gateways, ports and VLANs
+       of the VSD in a local SQLite database"""
+    from open_vsdcli.vsd_inventory import CrawlError
+    from open_vsdcli.vsd_inventory import Crawler
+    from open_vsdcli.vsd_inventory import Inventory
+    inventory = Inventory(inventory_path(database))
+    crawler = Crawler(ctx.obj['nc'], workers=workers)
+    deleted = 0
+    try:
+        if incremental:
+            deleted = inventory.sync(crawler, enterprise_id)
+        else:
+            inventory.save(crawler, enterprise_id)
+    except CrawlError as error:
+        print('Error: %s, previous snapshot is kept' % error)
+        raise SystemExit(1)
+    finally:
+        elapsed = max(crawler.elapsed, 0.001)
+        click.echo('# Snapshot: %s objects, %s requests in %.1fs'
+                   ' (%.1f objects/s, %.1f requests/s)' %
+                   (crawler.objects, crawler.requests, crawler.elapsed,
+                    crawler.objects / elapsed, crawler.requests / elapsed),
+                   err=True)
+    if incremental:
+        click.echo('# Deleted objects: %s' % deleted, err=True)
+    table = Table(["Entity", "Objects"])
+    for entity in sorted(crawler.entities):
+        table.add_row([entity, crawler.entities[entity]])
+    table.close()
@@ -10,6 +10,7 @@ from open_vsdcli.vsd_common import *
               help='Filter for address, netmask, IPType, name, gateway, '
                    'description, serviceID, assocApplicationObjectType, '
                    'splitSubnet, proxyARP, enableMulticast, externalID')
+@list_options(computed={'cidr': object_cidr})
 @click.pass_context
 def subnet_list(ctx, filter, **ids):
     """List subnets for optionnal zone, app, subnettemplate, or domain id"""
@@ -18,17 +19,13 @@ def subnet_list(ctx, filter, **ids):
         query = "subnets"
     else:
         query = "%ss/%s/subnets" % (id_type, id)
-    if not filter:
-        result = ctx.obj['nc'].get(query)
-    else:
-        result = ctx.obj['nc'].get(query,
-                                   filter=filter)
-    table = PrettyTable(["Subnet ID",
-                         "Name",
-                         "Address",
-                         "Gateway",
-                         "RT / RD",
-                         "External ID"])
+    result = list_objects(ctx, query, filter)
+    table = Table(["Subnet ID",
+                   "Name",
+                   "Address",
+                   "Gateway",
+                   "RT / RD",
+                   "External ID"])
     for line in result:
         if line['address']:
             address = line['address'] + "/" + \
@@ -42,7 +39,7 @@ def subnet_list(ctx, filter, **ids):
                        line['gateway'],
                        rt_rd,
                        line['externalID']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='subnet-show')
@@ -109,20 +106,18 @@ def subnet_delete(ctx, subnet_id):
     help='Filter for name, description, address, netmask, gateway, '
          'type, domainRouteDistinguisher, domainRouteTarget, externalID'
 )
+@list_options(computed={'cidr': object_cidr})
 @click.pass_context
 def shared_network_list(ctx, filter):
     """List all shared network ressource"""
-    if not filter:
-        result = ctx.obj['nc'].get("sharednetworkresources")
-    else:
-        result = ctx.obj['nc'].get("sharednetworkresources", filter=filter)
-    table = PrettyTable(["ID",
-                         "Name",
-                         "Description",
-                         "Type",
-                         "Address",
-                         "Gateway",
-                         "RT / RD"])
+    result = list_objects(ctx, "sharednetworkresources", filter)
+    table = Table(["ID",
+                   "Name",
+                   "Description",
+                   "Type",
+                   "Address",
+                   "Gateway",
+                   "RT / RD"])
     for line in result:
         table.add_row([
             line['ID'],
@@ -135,7 +130,7 @@ def shared_network_list(ctx, filter):
                 line['domainRouteTarget'],
                 line['domainRouteDistinguisher']])
         ])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='shared-network-show')
@@ -155,16 +150,13 @@ def shared_network_show(ctx, shared_network_id):
 @click.option('--filter', metavar='<filter>',
               help='Filter for description, name, serviceID, description, '
                    'name, lastUpdatedDate, creationDate, externalID')
+@list_options(computed={'cidr': object_cidr})
 @click.pass_context
 def l2domain_list(ctx, filter, **ids):
     """List L2 domain for a given enterprise or l2 domain template"""
     id_type, id = check_id(**ids)
-    if not filter:
-        result = ctx.obj['nc'].get("%ss/%s/l2domains" % (id_type, id))
-    else:
-        result = ctx.obj['nc'].get("%ss/%s/l2domains" % (id_type, id),
-                                   filter=filter)
-    table = PrettyTable(["L2 Domain ID", "Name", "Description", "RT / RD"])
+    result = list_objects(ctx, "%ss/%s/l2domains" % (id_type, id), filter)
+    table = Table(["L2 Domain ID", "Name", "Description", "RT / RD"])
     for line in result:
         table.add_row([
             line['ID'],
@@ -172,7 +164,7 @@ def l2domain_list(ctx, filter, **ids):
             line['description'],
             line['routeTarget'] + " / " + line['routeDistinguisher']
         ])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='l2domain-show')
@@ -232,21 +224,18 @@ def l2domain_update(ctx, l2domain_id, key_value):
 @click.option('--filter', metavar='<filter>',
               help='Filter for assigned, lastUpdatedDate, creationDate, '
                    'externalID')
+@list_options()
 @click.pass_context
 def floatingip_list(ctx, id, filter):
     """List floating IP for a given domain ID"""
-    if not filter:
-        result = ctx.obj['nc'].get("domains/%s/floatingips" % id)
-    else:
-        result = ctx.obj['nc'].get("domains/%s/floatingips" % id,
-                                   filter=filter)
-    table = PrettyTable(["ID", "address", "assigned", "externalID"])
+    result = list_objects(ctx, "domains/%s/floatingips" % id, filter)
+    table = Table(["ID", "address", "assigned", "externalID"])
     for line in result:
         table.add_row([line['ID'],
                        line['address'],
                        line['assigned'],
                        line['externalID']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='floatingip-show')
@@ -7,27 +7,24 @@ from open_vsdcli.vsd_common import *
 @click.option('--filter', metavar='<filter>',
               help='Filter for firstName, lastName, userName, email, '
                    'lastUpdatedDate, creationDate, externalID')
+@list_options()
 @click.pass_context
 def user_list_list(ctx, filter, **ids):
     """list users for a given enterprise or group id"""
     id_type, id = check_id(**ids)
-    if not filter:
-        result = ctx.obj['nc'].get("%ss/%s/users" % (id_type, id))
-    else:
-        result = ctx.obj['nc'].get("%ss/%s/users" % (id_type, id),
-                                   filter=filter)
-    table = PrettyTable(["ID",
-                         "User name",
-                         "First name",
-                         "Last name",
-                         "Email"])
+    result = list_objects(ctx, "%ss/%s/users" % (id_type, id), filter)
+    table = Table(["ID",
+                   "User name",
+                   "First name",
+                   "Last name",
+                   "Email"])
     for line in result:
         table.add_row([line['ID'],
                        line['userName'],
                        line['firstName'],
                        line['lastName'],
                        line['email']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='user-show')
@@ -91,16 +88,13 @@ def user_update(ctx, user_id, key_value):
 @click.option('--filter', metavar='<filter>',
               help='Filter for name, description, role, private, '
                    'lastUpdatedDate, creationDate, externalID')
+@list_options()
 @click.pass_context
 def group_list(ctx, filter, **ids):
     """list groups for a given enterprise id or that an user belongs to"""
     id_type, id = check_id(**ids)
-    if not filter:
-        result = ctx.obj['nc'].get("%ss/%s/groups" % (id_type, id))
-    else:
-        result = ctx.obj['nc'].get("%ss/%s/groups" % (id_type, id),
-                                   filter=filter)
-    table = PrettyTable(["ID", "Name", "Description", "Role", "Private"])
+    result = list_objects(ctx, "%ss/%s/groups" % (id_type, id), filter)
+    table = Table(["ID", "Name", "Description", "Role", "Private"])
     table.max_width['Description'] = 40
     for line in result:
         table.add_row([line['ID'],
@@ -108,7 +102,7 @@ def group_list(ctx, filter, **ids):
                        line['description'],
                        line['role'],
                        line['private']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='group-show')
@@ -191,6 +185,105 @@ def group_del_user(ctx, group_id, user_id):
         ctx.obj['nc'].put("groups/%s/users" % group_id, user_ids)
 
 
+def read_memberships(memberships):
+    """Return (group ID, action, user ID) of each line of a file of
+       memberships. A line is `<group ID> add|remove <user ID>`. Empty
+       lines and lines starting with # are ignored"""
+    changes = []
+    for number, line in enumerate(memberships, 1):
+        words = line.split()
+        if not words or words[0].startswith('#'):
+            continue
+        if len(words) != 3 or words[1] not in ['add', 'remove']:
+            raise click.exceptions.UsageError(
+                "Line %s of %s is not <group ID> add|remove <user ID>" %
+                (number, memberships.name))
+        changes.append(tuple(words))
+    return changes
+
+
+@vsdcli.command(name='group-sync')
+@click.option('--group-id', metavar='<group ID>', multiple=True,
+              help='Group receiving --add-user and --remove-user.'
+                   ' Can be repeated')
+@click.option('--add-user', metavar='<user ID>', multiple=True,
+              help='User to add to the groups. Can be repeated')
+@click.option('--remove-user', metavar='<user ID>', multiple=True,
+              help='User to remove from the groups. Can be repeated')
+@click.option('--file', 'memberships', type=click.File('r'),
+              metavar='<path>',
+              help='File of changes, one `<group ID> add|remove <user ID>`'
+                   ' per line. - reads standard input')
+@click.option('--exact', is_flag=True,
+              help='Remove users which are not added from the groups')
+@click.option('--allow-empty', is_flag=True,
+              help='With --exact, remove all users of groups having no user'
+                   ' to add')
+@click.option('--workers', metavar='<count>', type=click.IntRange(1),
+              default=8,
+              help='Count of requests running concurrently. Default : 8')
+@click.pass_context
+def group_sync(ctx, group_id, add_user, remove_user, memberships, exact,
+               allow_empty, workers):
+    """Add and remove many users to many groups. Users of each group are
+       requested once and updated with one request if they change, groups
+       being updated concurrently"""
+    from open_vsdcli.vsd_inventory import CrawlError
+    from open_vsdcli.vsd_inventory import Crawler
+    changes = [(g, 'add', u) for g in group_id for u in add_user]
+    changes += [(g, 'remove', u) for g in group_id for u in remove_user]
+    if memberships:
+        changes += read_memberships(memberships)
+    groups = {}
+    for group, action, user in changes:
+        groups.setdefault(group, {'add': set(), 'remove': set()})
+        groups[group][action].add(user)
+    for group in group_id:
+        groups.setdefault(group, {'add': set(), 'remove': set()})
+    if not groups:
+        raise click.exceptions.UsageError(
+            "You must specify --group-id or --file")
+    empty = sorted(g for g in groups
+                   if not groups[g]['add'] - groups[g]['remove'])
+    if exact and empty and not allow_empty:
+        raise click.exceptions.UsageError(
+            "--exact removes all users of %s: add users to them or use"
+            " --allow-empty" % ', '.join(empty))
+    nc = ctx.obj['nc']
+    results = {}
+
+    def handle(task, result):
+        group, updated = task[2]
+        if updated is not None:
+            # Users of the group were replaced
+            return []
+        current = [user['ID'] for user in result]
+        wanted = groups[group]
+        if exact:
+            members = [u for u in current if u in wanted['add']]
+        else:
+            members = [u for u in current if u not in wanted['remove']]
+        members += sorted(wanted['add'] - set(current) - wanted['remove'])
+        results[group] = (len(set(members) - set(current)),
+                          len(set(current) - set(members)), len(members))
+        if members == current:
+            return []
+        return [(nc.put, ["groups/%s/users" % group, members],
+                 (group, members))]
+
+    try:
+        Crawler(nc, workers=workers).run(
+            [(nc.get, ["groups/%s/users" % group], (group, None))
+             for group in sorted(groups)], handle)
+    except CrawlError as error:
+        print('Error: %s' % error)
+        raise SystemExit(1)
+    table = Table(["Group ID", "Added", "Removed", "Members"])
+    for group in sorted(results):
+        table.add_row([group] + list(results[group]))
+    table.close()
+
+
 @vsdcli.command(name='permission-list')
 @click.option('--zone-id', metavar='<id>')
 @click.option('--domaintemplate-id', metavar='<id>')
@@ -205,27 +298,25 @@ def group_del_user(ctx, group_id, user_id):
 @click.option('--filter', metavar='<filter>',
               help='Filter for name, lastUpdatedDate, creationDate, '
                    'externalID')
+@list_options()
 @click.pass_context
 def permission_list(ctx, filter, **ids):
     """List all permissions"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/permissions" % (id_type, id)
-    if not filter:
-        result = ctx.obj['nc'].get(request)
-    else:
-        result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID",
-                         "Action",
-                         "Entity ID",
-                         "Entity type",
-                         "Entity name"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID",
+                   "Action",
+                   "Entity ID",
+                   "Entity type",
+                   "Entity name"])
     for line in result:
         table.add_row([line['ID'],
                        line['permittedAction'],
                        line['permittedEntityID'],
                        line['permittedEntityType'],
                        line['permittedEntityName']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='permission-show')
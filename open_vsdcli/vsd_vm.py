@@ -16,6 +16,7 @@ from open_vsdcli.vsd_common import *
 @click.option('--filter', metavar='<filter>',
               help='Filter for UUID, name, status, reasonType, hypervisorIP, '
                    'lastUpdatedDate, creationDate, externalID')
+@list_options()
 @click.pass_context
 def vm_list(ctx, filter, **ids):
     """List all VMs"""
@@ -24,16 +25,13 @@ def vm_list(ctx, filter, **ids):
     if id:
         if id_type:
             request = "%ss/%s/vms" % (id_type, id)
-    if not filter:
-        result = ctx.obj['nc'].get(request)
-    else:
-        result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID",
-                         "Vm UUID",
-                         "Name",
-                         "Status",
-                         "Hypervisor IP",
-                         "Reason Type"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID",
+                   "Vm UUID",
+                   "Name",
+                   "Status",
+                   "Hypervisor IP",
+                   "Reason Type"])
     for line in result:
         table.add_row([line['ID'],
                        line['UUID'],
@@ -41,7 +39,7 @@ def vm_list(ctx, filter, **ids):
                        line['status'],
                        line['hypervisorIP'],
                        line['reasonType']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='vm-show')
@@ -112,6 +110,7 @@ def vm_update(ctx, vm_id, key_value):
 @click.option('--filter', metavar='<filter>',
               help='Filter for name, IPAddress, MAC, name, IPAddress, name, '
                    'lastUpdatedDate, creationDate, externalID')
+@list_options()
 @click.pass_context
 def vminterfaces_list(ctx, filter, **ids):
     """List VM interfaces"""
@@ -122,15 +121,12 @@ def vminterfaces_list(ctx, filter, **ids):
         request = "%ss/%s/vminterfaces" % (id_type, id)
     else:
         request = "vminterfaces"
-    if not filter:
-        result = ctx.obj['nc'].get(request)
-    else:
-        result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID",
-                         "VM UUID",
-                         "IP Address",
-                         "MAC",
-                         "Vport id"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID",
+                   "VM UUID",
+                   "IP Address",
+                   "MAC",
+                   "Vport id"])
     for line in result:
         if line['IPAddress']:
             cidr = line['IPAddress'] + '/' + netmask_to_length(line['netmask'])
@@ -141,7 +137,7 @@ def vminterfaces_list(ctx, filter, **ids):
                        cidr,
                        line['MAC'],
                        line['VPortID']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='vminterface-show')
@@ -10,22 +10,20 @@ from open_vsdcli.vsd_common import *
 @click.option('--vminterface-id', metavar='<id>')
 @click.option('--filter', metavar='<filter>',
               help='Filter for lastUpdatedDate, creationDate, externalID')
+@list_options()
 @click.pass_context
 def vporttag_list(ctx, filter, **ids):
     """List all vPort tag"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/vporttags" % (id_type, id)
-    if not filter:
-        result = ctx.obj['nc'].get(request)
-    else:
-        result = ctx.obj['nc'].get(request, filter=filter)
-    table = PrettyTable(["ID", "Description", "Name", "endPoint Type"])
+    result = list_objects(ctx, request, filter)
+    table = Table(["ID", "Description", "Name", "endPoint Type"])
     for line in result:
         table.add_row([line['ID'],
                        line['description'],
                        line['name'],
                        line['endPointType']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='vport-list')
@@ -39,20 +37,21 @@ def vporttag_list(ctx, filter, **ids):
 @click.option('--filter', metavar='<filter>',
               help='Filter for name, type, lastUpdatedDate, creationDate, '
                    'externalID')
+@list_options()
 @click.pass_context
 def vport_list(ctx, filter, **ids):
     """List all ingress acl template for a given domain, l2domain, floatingip,
        vrs or vporttag"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/vports" % (id_type, id)
-    result = ctx.obj['nc'].get(request, filter=filter)
+    result = list_objects(ctx, request, filter)
     if id_type == "trunk":
-        table = PrettyTable(["ID",
-                             "name",
-                             "active",
-                             "type",
-                             "Trunk role",
-                             "Vlan"])
+        table = Table(["ID",
+                       "name",
+                       "active",
+                       "type",
+                       "Trunk role",
+                       "Vlan"])
         for line in result:
             table.add_row([line['ID'],
                            line['name'],
@@ -61,13 +60,13 @@ def vport_list(ctx, filter, **ids):
                            line['trunkRole'],
                            line['segmentationID']])
     else:
-        table = PrettyTable(["ID", "name", "active", "type"])
+        table = Table(["ID", "name", "active", "type"])
         for line in result:
             table.add_row([line['ID'],
                            line['name'],
                            line['active'],
                            line['type']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='vport-show')
@@ -182,19 +181,20 @@ def bridgeinterface_create(ctx, name, vport_id):
 @click.option('--vport-id', metavar='<id>')
 @click.option('--filter', metavar='<filter>',
               help='Filter for name or externalID')
+@list_options()
 @click.pass_context
 def trunk_list(ctx, filter, **ids):
     """List all trunk in enterprise or attach to a vport"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/trunks" % (id_type, id)
-    result = ctx.obj['nc'].get(request, filter=filter)
+    result = list_objects(ctx, request, filter)
 
-    table = PrettyTable(["ID", "name", "associatedVPortID"])
+    table = Table(["ID", "name", "associatedVPortID"])
     for line in result:
         table.add_row([line['ID'],
                        line['name'],
                        line['associatedVPortID']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='trunk-show')
@@ -243,9 +243,8 @@ def trunk_delete(ctx, trunk_id, force):
         result = ctx.obj['nc'].delete(request + "?responseChoice=1")
     else:
         # Check if there is more than 1 vport
-        result = ctx.obj['nc'].get("trunks/%s/vports" % trunk_id)
-        sub_port_count = sum(map(lambda x: x['trunkRole'] == 'SUB_PORT',
-                                 result))
+        sub_port_count = ctx.obj['nc'].count(
+            "trunks/%s/vports" % trunk_id, filter='trunkRole == "SUB_PORT"')
         if sub_port_count > 0:
             print("Error: There is %s sub-port attached. "
                   "Use --force to delete" % sub_port_count)
@@ -260,26 +259,27 @@ def trunk_delete(ctx, trunk_id, force):
 @click.option('--subnet-id', metavar='<id>')
 @click.option('--filter', metavar='<filter>',
               help='Filter for Virtual IP, externalID or IP type (IPV4 or 6)')
+@list_options()
 @click.pass_context
 def virtualip_list(ctx, filter, **ids):
     """List all virtual IP associated to a vport, a redirection target"""
     """or a subnet"""
     id_type, id = check_id(**ids)
     request = "%ss/%s/virtualips" % (id_type, id)
-    result = ctx.obj['nc'].get(request, filter=filter)
+    result = list_objects(ctx, request, filter)
 
-    table = PrettyTable(['ID',
-                         'Virtual IP',
-                         'MAC',
-                         'Parent type',
-                         'Parent ID'])
+    table = Table(['ID',
+                   'Virtual IP',
+                   'MAC',
+                   'Parent type',
+                   'Parent ID'])
     for line in result:
         table.add_row([line['ID'],
                        line['virtualIP'],
                        line['MAC'],
                        line['parentType'],
                        line['parentID']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='virtualip-show')
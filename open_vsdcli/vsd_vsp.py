@@ -5,20 +5,18 @@ from open_vsdcli.vsd_common import *
 @click.option('--filter', metavar='<filter>',
               help='Filter for productVersion, name, description, location, '
                    'lastUpdatedDate, creationDate, externalID')
+@list_options()
 @click.pass_context
 def vsp_list(ctx, filter):
     """list all vsp"""
-    if not filter:
-        result = ctx.obj['nc'].get("vsps/")
-    else:
-        result = ctx.obj['nc'].get("vsps/", filter=filter)
-    table = PrettyTable(["ID", "Name", "Description", "Version"])
+    result = list_objects(ctx, "vsps/", filter)
+    table = Table(["ID", "Name", "Description", "Version"])
     for line in result:
         table.add_row([line['ID'],
                        line['name'],
                        line['description'],
                        line['productVersion']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='vsp-show')
@@ -36,21 +34,19 @@ def vsp_show(ctx, vsp_id):
               help='Filter for address, managementIP, name, location, '
                    'description, productVersion, status, lastUpdatedDate, '
                    'creationDate, externalID')
+@list_options()
 @click.pass_context
 def vsd_list(ctx, vsp_id, filter):
     """List all vsd for a given vsp"""
-    if not filter:
-        result = ctx.obj['nc'].get("vsps/%s/vsds" % vsp_id)
-    else:
-        result = ctx.obj['nc'].get("vsps/%s/vsds" % vsp_id, filter=filter)
-    table = PrettyTable(["ID", "Name", "Description", "Status", "Mode"])
+    result = list_objects(ctx, "vsps/%s/vsds" % vsp_id, filter)
+    table = Table(["ID", "Name", "Description", "Status", "Mode"])
     for line in result:
         table.add_row([line['ID'],
                        line['name'],
                        line['description'],
                        line['status'],
                        line['mode']])
-    print(table)
+    table.close()
 
 
 @vsdcli.command(name='vsd-show')
@@ -68,17 +64,18 @@ def vsd_show(ctx, vsd_id, verbose):
 
 @vsdcli.command(name='vsd-componant-list')
 @click.argument('vsd-id', metavar='<vsd ID>', required=True)
+@list_options()
 @click.pass_context
 def vsd_componant_list(ctx, vsd_id):
     """List componant for a given VSD ID"""
-    result = ctx.obj['nc'].get("vsds/%s/components" % vsd_id)
-    table = PrettyTable(["ID",
-                         "Name",
-                         "Description",
-                         "Status",
-                         "Address",
-                         "Version",
-                         "type"])
+    result = list_objects(ctx, "vsds/%s/components" % vsd_id)
+    table = Table(["ID",
+                   "Name",
+                   "Description",
+                   "Status",
+                   "Address",
+                   "Version",
+                   "type"])
     for line in result:
         table.add_row([line['ID'],
                        line['name'],
@@ -87,4 +84,4 @@ def vsd_componant_list(ctx, vsd_id):
                        line['address'],
                        line['productVersion'],
                        line['type']])
-    print(table)
+    table.close()
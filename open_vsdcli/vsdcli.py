@@ -14,19 +14,8 @@
 #    under the License.
 
 
-from open_vsdcli.vsd_license import *
-from open_vsdcli.vsd_enterprise import *
-from open_vsdcli.vsd_domain import *
-from open_vsdcli.vsd_subnet import *
-from open_vsdcli.vsd_user import *
-from open_vsdcli.vsd_gateway import *
-from open_vsdcli.vsd_vsp import *
-from open_vsdcli.vsd_vm import *
-from open_vsdcli.vsd_vport import *
-from open_vsdcli.vsd_policy import *
-from open_vsdcli.vsd_dhcp import *
-from open_vsdcli.vsd_metadata import *
-from open_vsdcli.vsd_route import *
+# Commands are loaded on demand by the vsdcli group, see vsd_index
+from open_vsdcli.vsd_common import vsdcli
 
 
 def main():
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+# Copyright 2015 Maxime Terras <maxime.terras@numergy.com>
+# Copyright 2015 Pierre Padrixe <pierre.padrixe@gmail.com>
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure startup time of vsd commands.
+
+For each command, `vsd <command> --help` is run in a new interpreter.
+Reported times are the best of all runs:
+  - process: wall time of the whole process, interpreter startup included
+  - import: time spent importing open_vsdcli and parsing the command line
+  - modules: vsd_* command modules imported to run the command
+
+Usage: python bench_startup.py [--repeat N] [command ...]
+Without command, one command of each module is measured.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+SNIPPET = '''
+import json
+import sys
+import time
+start = time.time()
+from open_vsdcli import vsdcli
+sys.argv = ['vsd', %r, '--help']
+try:
+    vsdcli.main()
+except SystemExit:
+    pass
+modules = sorted(m[len('open_vsdcli.'):] for m in sys.modules
+                 if m.startswith('open_vsdcli.vsd_') and sys.modules[m])
+sys.stderr.write(json.dumps([time.time() - start, modules]))
+'''
+
+DEFAULT_COMMANDS = ['me-show', 'license-list', 'enterprise-list',
+                    'domain-list', 'subnet-list', 'user-list', 'gateway-list',
+                    'vsp-list', 'vm-list', 'vport-show',
+                    'egressacltemplate-list', 'dhcp-option-list',
+                    'metadata-list', 'staticroute-list']
+
+
+def run(command):
+    env = dict(os.environ,
+               VSD_API_URL='http://127.0.0.1:5000',
+               VSD_USERNAME='bench',
+               VSD_PASSWORD='bench',
+               VSD_ENTERPRISE='bench',
+               VSD_API_VERSION='5_0')
+    start = time.time()
+    process = subprocess.Popen([sys.executable, '-c', SNIPPET % command],
+                               env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    elapsed = time.time() - start
+    import_time, modules = json.loads(err.decode('utf-8').splitlines()[-1])
+    return elapsed, import_time, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure startup time of'
+                                                 ' vsd commands')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='Count of runs per command (default: 10)')
+    parser.add_argument('commands', nargs='*', default=DEFAULT_COMMANDS)
+    args = parser.parse_args()
+
+    print('%-30s %10s %10s  %s' % ('command', 'process', 'import',
+                                   'modules'))
+    for command in args.commands:
+        runs = [run(command) for i in range(args.repeat)]
+        print('%-30s %8.1fms %8.1fms  %s' % (
+            command,
+            min(r[0] for r in runs) * 1000,
+            min(r[1] for r in runs) * 1000,
+            ' '.join(runs[-1][2])))
+
+
+if __name__ == '__main__':
+    main()
@@ -39,6 +39,9 @@ exit_script() {
 
 TEST_LIST="
 vsdcli
+shell
+serve
+snapshot
 enterprise
 license
 domain
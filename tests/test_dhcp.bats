@@ -140,3 +140,202 @@ source common.bash
     assert_output_not_contains_in_table 192.168.10.0/24 192.168.0.1
     assert_output_contains_in_table 192.168.11.0/24 192.168.0.2
 }
+
+
+@test "DHCP route: add and delete with host bits in subnet" {
+    run vsd dhcp-route-delete --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --subnet 192.168.11.7 --mask 24 --gateway 192.168.0.2
+    assert_success
+    run vsd dhcp-route-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_output_not_contains 192.168.11
+    run vsd dhcp-route-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --subnet 192.168.11.5 --mask 24 --gateway 192.168.0.2
+    assert_success
+    run vsd dhcp-route-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_output_contains_in_table 192.168.11.0/24 192.168.0.2 "['f9', '79']"
+}
+
+
+@test "DHCP route: add and delete invalid routes" {
+    run vsd dhcp-route-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --subnet 10.0.0.0 --mask 33 --gateway 192.168.0.1
+    assert_fail
+    assert_line_equals 0 "Error: Invalid mask for IPv4: 33"
+    run vsd dhcp-route-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --subnet 10.0.0.0 --mask 8 --gateway foo
+    assert_fail
+    assert_line_equals 0 "Error: Invalid IPv4 address: foo"
+    run vsd dhcp-route-delete --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --subnet 10.0.0.0 --mask eight --gateway 192.168.0.1
+    assert_fail
+    assert_line_equals 0 "Error: Invalid mask for IPv4: eight"
+    run vsd dhcp-route-delete --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --subnet 10.0.0.0 --mask 8 --gateway 192.168.0.1
+    assert_fail
+    assert_line_equals 0 "Error: Route not present: unable to remove it"
+}
+
+
+@test "DHCP route: sync from a file in dry run" {
+    run bash -c "echo 'subnet 255d9673-7281-43c4-be57-fdec677f6e07 192.168.11.0/24,192.168.0.2 10.0.0.0/8,192.168.0.254' | vsd dhcp-route-sync --file - --dry-run"
+    assert_success
+    assert_output_contains "# Dry run: no change is made"
+    assert_output_contains_in_table subnet 255d9673-7281-43c4-be57-fdec677f6e07 1 0
+    assert_output_contains "PUT 79"
+    assert_output_contains "PUT f9"
+    run vsd dhcp-route-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_output_not_contains 10.0.0.0/8
+}
+
+
+@test "DHCP route: sync only changed options" {
+    echo 'subnet 255d9673-7281-43c4-be57-fdec677f6e07 192.168.11.0/24,192.168.0.2 10.0.0.0/8,192.168.0.254' > ${BATS_TMPDIR}/routes
+    run vsd --debug dhcp-route-sync --file ${BATS_TMPDIR}/routes
+    assert_success
+    [ "$(echo "$output" | grep -c '# Method: PUT')" == "2" ]
+    run vsd dhcp-route-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_output_contains_in_table 10.0.0.0/8 192.168.0.254 "['f9', '79']"
+    assert_output_contains_in_table 192.168.11.0/24 192.168.0.2 "['f9', '79']"
+
+    run vsd --debug dhcp-route-sync --file ${BATS_TMPDIR}/routes
+    assert_success
+    [ "$(echo "$output" | grep -c '# Method: \(PUT\|POST\|DELETE\)')" == "0" ]
+    assert_output_contains_in_table subnet 255d9673-7281-43c4-be57-fdec677f6e07 0 0
+    rm -f ${BATS_TMPDIR}/routes
+}
+
+
+@test "DHCP route: sync subnets of a domain" {
+    command vsd free-api enterprises/92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e/domains --verb POST --key-value name:Domain
+    run vsd dhcp-route-sync --domain-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_fail
+    assert_line_equals -1 "Error: You must specify --route or --clear with --domain-id"
+    run vsd dhcp-route-sync --domain-id 255d9673-7281-43c4-be57-fdec677f6e07 --clear --route 172.16.0.0/12,192.168.0.1
+    assert_fail
+    assert_line_equals -1 "Error: --clear is only used with --domain-id and without --route"
+    run vsd dhcp-route-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_output_contains 192.168
+
+    run vsd dhcp-route-sync --domain-id 255d9673-7281-43c4-be57-fdec677f6e07 --clear
+    assert_success
+    assert_output_contains_in_table subnet 255d9673-7281-43c4-be57-fdec677f6e07 0 2
+    assert_output_contains "DELETE 79"
+    assert_output_contains "DELETE f9"
+    run vsd dhcp-route-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_output_not_contains 192.168
+
+    run vsd dhcp-route-sync --domain-id 255d9673-7281-43c4-be57-fdec677f6e07 --route 172.16.0.0/12,192.168.0.1
+    assert_success
+    assert_output_contains_in_table subnet 255d9673-7281-43c4-be57-fdec677f6e07 1 0 "POST 79, POST f9"
+}
+
+
+@test "DHCP route: sync with invalid targets" {
+    run vsd dhcp-route-sync
+    assert_fail
+    assert_line_equals -1 "Error: You must specify --file or --domain-id"
+    run bash -c "echo 'subnet 255d9673-7281-43c4-be57-fdec677f6e07 10.0.0.0/33,192.168.0.1' | vsd dhcp-route-sync --file -"
+    assert_fail
+    assert_line_equals -1 "Error: Line 1 of <stdin>: 10.0.0.0/33,192.168.0.1 is not <network>/<length>,<gateway>"
+    run bash -c "echo 'zone 255d9673-7281-43c4-be57-fdec677f6e07' | vsd dhcp-route-sync --file -"
+    assert_fail
+    assert_output_contains "Error: Line 1 of <stdin> is not <entity> <ID>"
+}
+
+
+@test "DHCP route: audit routes of an enterprise" {
+    run vsd dhcp-route-audit --enterprise-id 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e
+    assert_success
+    assert_line_contains 0 "# Audit: 1 targets, 2 options, 0 issues, "
+    assert_output_not_contains subnet
+    command vsd dhcp-option-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --type 79 --value 18c0a80a --length 04
+    run vsd dhcp-route-audit --enterprise-id 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e
+    assert_success
+    assert_line_contains 0 "# Audit: 1 targets, 3 options, 1 issues, "
+    assert_output_contains_in_table subnet 255d9673-7281-43c4-be57-fdec677f6e07 Subnet "2 options 79"
+}
+
+
+@test "DHCP route: report mismatches, malformed values and duplicates" {
+    # Remove routes of the subnet
+    command bash -c "echo 'subnet 255d9673-7281-43c4-be57-fdec677f6e07' | vsd dhcp-route-sync --file -"
+    command vsd dhcp-option-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --type 79 --value 18c0a80ac0a8000118c0a80ac0a80001080ac0a80002 --length 16
+    command vsd dhcp-option-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --type f9 --value 18c0a80ac0a80001 --length 08
+    run vsd dhcp-route-audit --enterprise-id 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e
+    assert_success
+    assert_output_contains_in_table subnet 255d9673-7281-43c4-be57-fdec677f6e07 Subnet "Duplicate route 192.168.10.0/24 via 192.168.0.1 in option 79"
+    assert_output_contains_in_table subnet 255d9673-7281-43c4-be57-fdec677f6e07 Subnet "Route 10.0.0.0/8 via 192.168.0.2 only in option 79"
+
+    command bash -c "echo 'subnet 255d9673-7281-43c4-be57-fdec677f6e07' | vsd dhcp-route-sync --file -"
+    command vsd dhcp-option-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --type 79 --value 18c0a80ac0a800 --length 07
+    command vsd dhcp-option-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --type f9 --value 18c0a80ac0a80001 --length 08
+    run vsd dhcp-route-audit --enterprise-id 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e
+    assert_success
+    assert_output_contains_in_table subnet 255d9673-7281-43c4-be57-fdec677f6e07 Subnet "Malformed option 79: 18c0a80ac0a800"
+    assert_output_not_contains "Option 79 missing"
+
+    command bash -c "echo 'subnet 255d9673-7281-43c4-be57-fdec677f6e07' | vsd dhcp-route-sync --file -"
+    command vsd dhcp-option-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --type f9 --value 18c0a80ac0a80001 --length 08
+    run vsd dhcp-route-audit --enterprise-id 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e
+    assert_success
+    assert_line_contains 0 "# Audit: 1 targets, 1 options, 1 issues, "
+    assert_output_contains_in_table subnet 255d9673-7281-43c4-be57-fdec677f6e07 Subnet "Option 79 missing"
+}
+
+
+@test "DHCP route: encode and decode routes" {
+    command bash -c "echo 'subnet 255d9673-7281-43c4-be57-fdec677f6e07' | vsd dhcp-route-sync --file -"
+    command vsd dhcp-route-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --subnet 0.0.0.0 --mask 0 --gateway 192.168.0.1
+    command vsd dhcp-route-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --subnet 10.0.0.0 --mask 8 --gateway 192.168.0.2
+    run vsd dhcp-option-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_success
+    assert_output_contains_in_table 79 0b 00c0a80001080ac0a80002
+    assert_output_contains_in_table f9 0b 00c0a80001080ac0a80002
+    run vsd dhcp-route-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_success
+    assert_output_contains_in_table 0.0.0.0/0 192.168.0.1 "['f9', '79']"
+    assert_output_contains_in_table 10.0.0.0/8 192.168.0.2 "['f9', '79']"
+
+    command bash -c "echo 'subnet 255d9673-7281-43c4-be57-fdec677f6e07' | vsd dhcp-route-sync --file -"
+    for value in 21c0a80ac0a80001 18c0a8 zz; do
+        UUID=$(vsd --show-only ID dhcp-option-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --type 79 --value ${value} --length 08)
+        run vsd dhcp-route-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+        assert_fail
+        assert_line_equals 0 "Error: Malformed option 79: ${value}"
+        command vsd dhcp-option-delete ${UUID}
+    done
+}
+
+
+@test "DHCP gateway: show several routers" {
+    UUID=$(vsd --show-only ID dhcp-option-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --type 03 --value c0a80001c0a80002 --length 08)
+    run vsd dhcp-gateway-show --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_success
+    assert_output_contains_in_table 192.168.0.1
+    assert_output_contains_in_table 192.168.0.2
+    command vsd dhcp-option-delete ${UUID}
+    command vsd dhcp-option-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --type 03 --value c0a80001c0a8 --length 06
+    run vsd dhcp-gateway-show --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_fail
+    assert_line_equals 0 "Error: Malformed value: c0a80001c0a8"
+}
+
+
+@test "DHCP route: report malformed options" {
+    # Remove routes of the subnet
+    command bash -c "echo 'subnet 255d9673-7281-43c4-be57-fdec677f6e07' | vsd dhcp-route-sync --file -"
+    command vsd dhcp-option-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --type 79 --value 18c0a80a --length 04
+    run vsd dhcp-route-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_fail
+    assert_line_equals 0 "Error: Malformed option 79: 18c0a80a"
+    run vsd dhcp-route-add --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --subnet 10.0.0.0 --mask 8 --gateway 192.168.0.1
+    assert_fail
+    assert_line_equals 0 "Error: Malformed option 79: 18c0a80a"
+    run vsd dhcp-route-delete --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07 --subnet 10.0.0.0 --mask 8 --gateway 192.168.0.1
+    assert_fail
+    assert_line_equals 0 "Error: Malformed option 79: 18c0a80a"
+}
+
+
+@test "DHCP route: sync overwrites malformed options" {
+    run bash -c "echo 'subnet 255d9673-7281-43c4-be57-fdec677f6e07 10.0.0.0/8,192.168.0.1' | vsd dhcp-route-sync --file -"
+    assert_success
+    assert_output_contains_in_table subnet 255d9673-7281-43c4-be57-fdec677f6e07 1 0 "PUT 79 (malformed), POST f9"
+    run vsd dhcp-route-list --subnet-id 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_success
+    assert_output_contains_in_table 10.0.0.0/8 192.168.0.1 "['f9', '79']"
+}
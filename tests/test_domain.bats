@@ -257,3 +257,39 @@ source common.bash
     assert_success
     assert_line_equals 0 255d9673-7281-43c4-be57-fdec677f6e07
 }
+
+
+@test "Domain: tree" {
+    command vsd subnet-create Subnet-1 --zone-id 255d9673-7281-43c4-be57-fdec677f6e07 --address 10.0.0.0 --netmask 255.255.255.0
+    command vsd free-api subnets/255d9673-7281-43c4-be57-fdec677f6e07/vports --verb POST --key-value name:Vport-1
+    command vsd free-api vports/255d9673-7281-43c4-be57-fdec677f6e07/vminterfaces --verb POST --key-value name:Interface-1 --key-value IPAddress:10.0.0.5
+    run vsd domain-tree 255d9673-7281-43c4-be57-fdec677f6e07
+    assert_success
+    assert_line_equals 0 "domain Domain-1 [255d9673-7281-43c4-be57-fdec677f6e07]"
+    assert_line_equals 1 '`-- zone Zone-1 [255d9673-7281-43c4-be57-fdec677f6e07]'
+    assert_line_equals 2 '    `-- subnet Subnet-1 10.0.0.0/24 [255d9673-7281-43c4-be57-fdec677f6e07]'
+    assert_line_equals 3 '        `-- vport Vport-1 [255d9673-7281-43c4-be57-fdec677f6e07]'
+    assert_line_equals 4 '            `-- vminterface Interface-1 10.0.0.5 None [255d9673-7281-43c4-be57-fdec677f6e07]'
+}
+
+
+@test "Domain: tree with depth and filters" {
+    command vsd subnet-create Subnet-2 --zone-id 255d9673-7281-43c4-be57-fdec677f6e07 --address 10.0.1.0 --netmask 255.255.255.0
+    run vsd domain-tree 255d9673-7281-43c4-be57-fdec677f6e07 --depth 2
+    assert_success
+    assert_line_equals 2 '    |-- subnet Subnet-1 10.0.0.0/24 [255d9673-7281-43c4-be57-fdec677f6e07]'
+    assert_line_equals 3 '    `-- subnet Subnet-2 10.0.1.0/24 [255d9673-7281-43c4-be57-fdec677f6e07]'
+    assert_output_not_contains vport
+    run vsd domain-tree 255d9673-7281-43c4-be57-fdec677f6e07 --depth 2 --subnet-filter 'name == "Subnet-2"'
+    assert_success
+    assert_output_not_contains Subnet-1
+    assert_line_equals -1 '    `-- subnet Subnet-2 10.0.1.0/24 [255d9673-7281-43c4-be57-fdec677f6e07]'
+}
+
+
+@test "Domain: tree in jsonl" {
+    run vsd --format jsonl domain-tree 255d9673-7281-43c4-be57-fdec677f6e07 --depth 1
+    assert_success
+    assert_line_equals 0 '{"Entity": "zones", "ID": "255d9673-7281-43c4-be57-fdec677f6e07", "Name": "Zone-1", "Parent ID": "255d9673-7281-43c4-be57-fdec677f6e07", "Level": 1}'
+    [ "${#lines[@]}" == "1" ]
+}
@@ -147,3 +147,15 @@ source common.bash
     assert_output_contains_in_table A335F5AB-AB63-4C58-9ACA-717A22AC7ACC
 }
 
+
+@test "Metadata: list with tags" {
+    command vsd free-api reset
+    command vsd metadatatag-create --enterprise-id 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e tagName
+    command vsd metadata-create meta-1 --entity enterprise --id 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e --data "Data 1" --tag 255d9673-7281-43c4-be57-fdec677f6e07
+    command vsd metadata-create meta-2 --entity enterprise --id 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e --data "Data 2" --tag 255d9673-7281-43c4-be57-fdec677f6e07
+    run vsd --debug metadata-list --entity enterprise --id 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e --with-tags
+    assert_success
+    assert_output_contains_in_table meta-1 tagName
+    assert_output_contains_in_table meta-2 tagName
+    [ "$(echo "$output" | grep -c '# URL: .*/metadatatags/')" == "1" ]
+}
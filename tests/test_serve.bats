@@ -0,0 +1,200 @@
+#!/usr/bin/env bats
+
+# Copyright 2015 Maxime Terras <maxime.terras@numergy.com>
+# Copyright 2015 Pierre Padrixe <pierre.padrixe@gmail.com>
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+load helpers
+source common.bash
+
+SOCKET=${BATS_TMPDIR}/vsd-test.sock
+
+
+@test "Pep8: vsd_serve.py" {
+    command pep8 --first ../open_vsdcli/vsd_serve.py
+}
+
+
+@test "Pep8: vsd_daemon.py" {
+    command pep8 --first ../open_vsdcli/vsd_daemon.py
+}
+
+
+@test "VSD mock: reset" {
+    command vsd free-api reset
+}
+
+
+@test "Serve: start daemon" {
+    vsd --daemon-socket ${SOCKET} serve >/dev/null 2>&1 3>&- &
+    echo $! > ${BATS_TMPDIR}/vsd-serve.pid
+    for i in $(seq 1 50); do
+        [ -S ${SOCKET} ] && break
+        sleep 0.1
+    done
+    [ -S ${SOCKET} ]
+    [ "$(stat -c %a ${SOCKET})" == "700" ]
+}
+
+
+@test "Serve: refuse to start twice" {
+    run vsd --daemon-socket ${SOCKET} serve
+    assert_fail
+    assert_line_equals 0 "Error: vsd serve is already running on ${SOCKET}"
+}
+
+
+@test "Serve: send requests through daemon" {
+    run vsd --daemon-socket ${SOCKET} --debug enterprise-list
+    assert_success
+    assert_line_equals 0 "# Request through vsd serve: iter_get enterprises"
+    assert_output_contains_in_table nulab-1
+    assert_output_contains "# URL: ${VSD_API_URL}/nuage/api/v${VSD_API_VERSION}/enterprises"
+}
+
+
+@test "Serve: share connection between commands" {
+    command vsd --daemon-socket ${SOCKET} enterprise-list
+    run vsd --daemon-socket ${SOCKET} --pool-stats --show-only name enterprise-show 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e
+    assert_success
+    assert_line_equals 0 "nulab-1"
+    assert_line_equals 1 "# Connections: 1 opened, 2 reused (3 requests)"
+}
+
+
+@test "Serve: forward errors of the VSD" {
+    run vsd --daemon-socket ${SOCKET} enterprise-show wrong-id
+    assert_fail
+    assert_line_equals 0 "Error: Cannot find object with ID"
+}
+
+
+@test "Serve: stream objects of list" {
+    run python -c "
+from open_vsdcli.vsd_common import vsdcli
+ctx = vsdcli.make_context('vsd', ['--daemon-socket', '${SOCKET}', 'enterprise-list'], obj={})
+ctx.invoke(vsdcli.callback, **ctx.params)
+nc = ctx.obj['nc']
+print(type(nc).__name__)
+objects = nc.iter_get('enterprises', headers={'X-Nuage-PageSize': '1'})
+print(next(objects)['name'])
+print(nc.get('enterprises', filter='nulab-2')[0]['name'])"
+    assert_success
+    assert_line_equals 0 "DaemonConnection"
+    assert_line_equals 1 "nulab-1"
+    assert_line_equals 2 "nulab-2"
+}
+
+
+@test "Serve: keep serving after errors and lost clients" {
+    run python -c "
+from open_vsdcli.vsd_common import vsdcli
+ctx = vsdcli.make_context('vsd', ['--daemon-socket', '${SOCKET}', 'enterprise-list'], obj={})
+ctx.invoke(vsdcli.callback, **ctx.params)
+nc = ctx.obj['nc']
+objects = nc.iter_get('enterprises', headers={'X-Nuage-PageSize': '1'})
+print(next(objects)['name'])
+objects.close()
+try:
+    nc._call('get', 'enterprises', wrong_argument=True)
+except SystemExit as error:
+    print('exit %s' % error.code)
+print(nc.get('enterprises', filter='nulab-2')[0]['name'])"
+    assert_success
+    assert_line_equals 0 "nulab-1"
+    assert_line_contains 1 "unexpected keyword argument"
+    assert_line_equals 2 "exit 1"
+    assert_line_equals 3 "nulab-2"
+}
+
+
+@test "Serve: copy raw response" {
+    run vsd --daemon-socket ${SOCKET} --debug free-api enterprises --raw --header X-Nuage-PageSize:1
+    assert_success
+    assert_line_equals 0 "# Request through vsd serve: iter_raw enterprises"
+    assert_output_contains '"d63701e0-9246-4c7a-9f43-0c66d0fe45e3"},{"ID": "5b2cc2f3-2b86-42ec-892d-edde741b2fd4"'
+}
+
+
+@test "Serve: count objects through daemon" {
+    run vsd --daemon-socket ${SOCKET} --debug enterprise-list --count
+    assert_success
+    assert_line_equals 0 "# Request through vsd serve: count enterprises"
+    assert_line_equals -1 "2"
+}
+
+
+@test "Serve: do not use daemon of other credentials" {
+    VSD_PASSWORD=other run vsd --daemon-socket ${SOCKET} --debug enterprise-list
+    assert_success
+    assert_output_not_contains "# Request through vsd serve"
+}
+
+
+@test "Serve: do not use daemon of other connection options" {
+    for option in "--page-size 1" "--page-workers 2" "--adaptive-page-size" "--cache" "--pool-size 2" "--no-keep-alive"; do
+        run vsd --daemon-socket ${SOCKET} --debug ${option} enterprise-list
+        assert_success
+        assert_output_not_contains "# Request through vsd serve"
+        assert_output_contains_in_table nulab-1
+    done
+}
+
+
+@test "Serve: bypass daemon" {
+    run vsd --daemon-socket ${SOCKET} --no-daemon --debug enterprise-list
+    assert_success
+    assert_output_not_contains "# Request through vsd serve"
+    run vsd --daemon-socket ${SOCKET} --force-auth --debug enterprise-list
+    assert_success
+    assert_output_not_contains "# Request through vsd serve"
+}
+
+
+@test "Serve: stop daemon" {
+    kill $(cat ${BATS_TMPDIR}/vsd-serve.pid)
+    for i in $(seq 1 50); do
+        [ ! -S ${SOCKET} ] && break
+        sleep 0.1
+    done
+    [ ! -S ${SOCKET} ]
+    run vsd --daemon-socket ${SOCKET} --debug enterprise-list
+    assert_success
+    assert_output_not_contains "# Request through vsd serve"
+}
+
+
+@test "Serve: use page size of daemon" {
+    vsd --daemon-socket ${SOCKET} --page-size 1 serve >/dev/null 2>&1 3>&- &
+    PID=$!
+    for i in $(seq 1 50); do
+        [ -S ${SOCKET} ] && break
+        sleep 0.1
+    done
+    run python -c "
+from open_vsdcli.vsd_common import vsdcli
+from open_vsdcli.vsd_filter import Query
+ctx = vsdcli.make_context('vsd', ['--daemon-socket', '${SOCKET}', '--page-size', '1', 'enterprise-list'], obj={})
+ctx.invoke(vsdcli.callback, **ctx.params)
+nc = ctx.obj['nc']
+print(type(nc).__name__)
+print(nc.page_size)
+print(Query()._page_size(nc))"
+    kill ${PID}
+    assert_success
+    assert_line_equals 0 "DaemonConnection"
+    assert_line_equals 1 "1"
+    assert_line_equals 2 "1"
+}
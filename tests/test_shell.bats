@@ -0,0 +1,139 @@
+#!/usr/bin/env bats
+
+# Copyright 2015 Maxime Terras <maxime.terras@numergy.com>
+# Copyright 2015 Pierre Padrixe <pierre.padrixe@gmail.com>
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+load helpers
+source common.bash
+
+
+@test "Pep8: vsd_shell.py" {
+    command pep8 --first ../open_vsdcli/vsd_shell.py
+}
+
+
+@test "VSD mock: reset" {
+    command vsd free-api reset
+}
+
+
+@test "Shell: run commands" {
+    run bash -c "printf 'enterprise-list\nenterprise-show 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e\n' | vsd --show-only name shell"
+    assert_success
+    assert_output_contains_in_table nulab-1
+    assert_output_contains_in_table nulab-2
+    assert_line_equals -1 "nulab-1"
+}
+
+
+@test "Shell: reuse connection between commands" {
+    # Make sure a valid API key is stored
+    command vsd enterprise-list
+    run bash -c "printf 'enterprise-list\nlicense-list\nexit\n' | vsd --pool-stats shell"
+    assert_success
+    assert_line_equals -1 "# Connections: 1 opened, 1 reused (2 requests)"
+}
+
+
+@test "Shell: keep running after errors" {
+    run bash -c "printf 'wrong-command\nenterprise-show\nenterprise-show wrong-id\nshell\nenterprise-list \"nulab\n\nenterprise-list\n' | vsd shell"
+    assert_success
+    assert_line_equals 0 'Error: No such command "wrong-command".'
+    assert_output_contains 'Error: Missing argument "<enterprise-id>".'
+    assert_output_contains 'Error: Cannot find object with ID'
+    assert_output_contains 'Error: No such command "shell".'
+    assert_output_contains 'Error: No closing quotation'
+    assert_output_contains_in_table nulab-2
+}
+
+
+@test "Shell: stop on exit" {
+    run bash -c "printf 'exit\nenterprise-list\n' | vsd shell"
+    assert_success
+    assert_output_not_contains nulab
+}
+
+
+@test "Shell: print help" {
+    run bash -c "printf 'help\n' | vsd shell"
+    assert_success
+    assert_output_contains 'Usage: vsd [OPTIONS] COMMAND [ARGS]...'
+    assert_output_contains 'vport-show'
+}
+
+
+@test "Shell: complete command names" {
+    run python -c "
+from open_vsdcli.vsd_common import vsdcli
+from open_vsdcli.vsd_shell import shell_completer
+complete = shell_completer(vsdcli.make_context('vsd', ['shell']))
+print(complete('enterprise-l', 0))
+print(complete('enterprise-l', 1))
+print(complete('ex', 0))"
+    assert_success
+    assert_line_equals 0 "enterprise-list "
+    assert_line_equals 1 "None"
+    assert_line_equals 2 "exit "
+}
+
+
+@test "Batch: run commands of a file" {
+    command vsd free-api reset
+    printf '# Enterprises\nenterprise-list\n\nenterprise-show 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e\n' > ${BATS_TMPDIR}/batch
+    run vsd --show-only name --pool-stats batch ${BATS_TMPDIR}/batch
+    assert_success
+    assert_output_contains_in_table nulab-2
+    assert_output_contains '# Line 2 (exit 0): enterprise-list'
+    assert_line_equals -4 'nulab-1'
+    assert_line_equals -3 '# Line 4 (exit 0): enterprise-show 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e'
+    assert_line_equals -2 '# Batch: 2 lines run, 2 succeeded, 0 failed'
+    assert_line_equals -1 '# Connections: 1 opened, 1 reused (2 requests)'
+}
+
+
+@test "Batch: report failed lines" {
+    run bash -c "printf 'enterprise-show wrong-id\nwrong-command\nenterprise-list\n' | vsd batch -"
+    assert_fail
+    assert_output_contains '# Line 1 (exit 1): enterprise-show wrong-id'
+    assert_output_contains '# Line 2 (exit 2): wrong-command'
+    assert_output_contains '# Line 3 (exit 0): enterprise-list'
+    assert_line_equals -1 '# Batch: 3 lines run, 1 succeeded, 2 failed'
+}
+
+
+@test "Batch: stop on error" {
+    run bash -c "printf 'enterprise-list\nenterprise-show wrong-id\nenterprise-list\n' | vsd batch --stop-on-error -"
+    assert_fail
+    assert_output_not_contains '# Line 3'
+    assert_line_equals -1 '# Batch: 2 lines run, 1 succeeded, 1 failed'
+}
+
+
+@test "Batch: run lines in parallel and keep output in order" {
+    for i in $(seq 1 6); do
+        echo "enterprise-show 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e"
+        echo "enterprise-show 5b2cc2f3-2b86-42ec-892d-edde741b2fd4"
+    done > ${BATS_TMPDIR}/batch
+    run vsd --show-only name batch --parallel 4 ${BATS_TMPDIR}/batch
+    assert_success
+    for i in $(seq 1 2 12); do
+        assert_line_equals $((i * 2 - 2)) "nulab-1"
+        assert_line_equals $((i * 2 - 1)) "# Line ${i} (exit 0): enterprise-show 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e"
+        assert_line_equals $((i * 2)) "nulab-2"
+        assert_line_equals $((i * 2 + 1)) "# Line $((i + 1)) (exit 0): enterprise-show 5b2cc2f3-2b86-42ec-892d-edde741b2fd4"
+    done
+    assert_line_equals -1 '# Batch: 12 lines run, 12 succeeded, 0 failed'
+}
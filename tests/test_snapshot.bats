@@ -0,0 +1,230 @@
+#!/usr/bin/env bats
+
+# Copyright 2015 Maxime Terras <maxime.terras@numergy.com>
+# Copyright 2015 Pierre Padrixe <pierre.padrixe@gmail.com>
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+load helpers
+source common.bash
+DATABASE=${BATS_TMPDIR}/vsd-inventory.db
+
+
+@test "Pep8: vsd_snapshot.py" {
+    command pep8 --first ../open_vsdcli/vsd_snapshot.py
+}
+
+
+@test "Pep8: vsd_inventory.py" {
+    command pep8 --first ../open_vsdcli/vsd_inventory.py
+}
+
+
+@test "VSD mock: reset" {
+    rm -f ${DATABASE}
+    command vsd free-api reset
+    command vsd free-api enterprises/92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e/domains --verb POST --key-value name:Domain
+    command vsd free-api domains/255d9673-7281-43c4-be57-fdec677f6e07/zones --verb POST --key-value name:Zone
+    command vsd subnet-create Subnet-1 --zone-id 255d9673-7281-43c4-be57-fdec677f6e07 --address 192.168.0.0 --netmask 255.255.255.0
+}
+
+
+@test "Snapshot: crawl the VSD" {
+    run vsd snapshot --database ${DATABASE}
+    assert_success
+    assert_line_contains 0 "# Snapshot: 5 objects, "
+    assert_line_contains 0 " objects/s, "
+    assert_output_contains_in_table enterprises 2
+    assert_output_contains_in_table subnets 1
+    assert_output_contains_in_table vports 0
+    [ "$(stat -c %a ${DATABASE})" == "600" ]
+}
+
+
+@test "Snapshot: link objects to their parent and enterprise" {
+    run python -c "
+import sqlite3
+db = sqlite3.connect('${DATABASE}')
+for row in db.execute('SELECT entity, name, parent_entity, enterprise_id'
+                      ' FROM objects ORDER BY entity, name'):
+    print(' '.join(str(c) for c in row))"
+    assert_success
+    assert_line_equals 0 "domains Domain enterprises 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e"
+    assert_line_equals 1 "enterprises nulab-1 None 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e"
+    assert_line_equals 2 "enterprises nulab-2 None 5b2cc2f3-2b86-42ec-892d-edde741b2fd4"
+    assert_line_equals 3 "subnets Subnet-1 zones 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e"
+    assert_line_equals 4 "zones Zone domains 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e"
+}
+
+
+@test "Snapshot: crawl one enterprise" {
+    command vsd subnet-update 255d9673-7281-43c4-be57-fdec677f6e07 --key-value name:Subnet-2
+    run vsd snapshot --database ${DATABASE} --enterprise-id 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e
+    assert_success
+    assert_line_contains 0 "# Snapshot: 4 objects, "
+    run python -c "
+import sqlite3
+db = sqlite3.connect('${DATABASE}')
+print(db.execute('SELECT count(*) FROM objects').fetchone()[0])
+print(db.execute('SELECT name FROM objects WHERE entity = \"subnets\"').fetchone()[0])"
+    assert_success
+    assert_line_equals 0 "5"
+    assert_line_equals 1 "Subnet-2"
+}
+
+
+@test "Snapshot: keep previous snapshot when a request fails" {
+    run vsd snapshot --database ${DATABASE} --enterprise-id wrong-id
+    assert_fail
+    assert_output_contains "Error: 2 requests failed, previous snapshot is kept"
+    run python -c "
+import sqlite3
+db = sqlite3.connect('${DATABASE}')
+print(db.execute('SELECT count(*) FROM objects').fetchone()[0])"
+    assert_line_equals 0 "5"
+}
+
+
+@test "Snapshot: fetch objects updated since the previous snapshot" {
+    command vsd subnet-update 255d9673-7281-43c4-be57-fdec677f6e07 --key-value lastUpdatedDate:1000
+    command vsd snapshot --database ${DATABASE}
+    command vsd subnet-update 255d9673-7281-43c4-be57-fdec677f6e07 --key-value name:Subnet-3 --key-value lastUpdatedDate:2000
+    run vsd --debug snapshot --database ${DATABASE} --incremental
+    assert_success
+    assert_output_contains '"X-Nuage-Filter": "lastUpdatedDate > 1000"'
+    assert_output_contains "# Deleted objects: 0"
+    assert_output_contains_in_table subnets 1
+    run python -c "
+import sqlite3
+db = sqlite3.connect('${DATABASE}')
+print(db.execute('SELECT count(*) FROM objects').fetchone()[0])
+print(db.execute('SELECT name FROM objects WHERE entity = \"subnets\"').fetchone()[0])"
+    assert_success
+    assert_line_equals 0 "5"
+    assert_line_equals 1 "Subnet-3"
+}
+
+
+@test "Snapshot: remove deleted objects and the objects below them" {
+    command vsd free-api zones/255d9673-7281-43c4-be57-fdec677f6e07 --verb DELETE
+    run vsd snapshot --database ${DATABASE} --incremental
+    assert_success
+    assert_output_contains "# Deleted objects: 2"
+    run python -c "
+import sqlite3
+db = sqlite3.connect('${DATABASE}')
+print(db.execute('SELECT count(*) FROM objects').fetchone()[0])"
+    assert_line_equals 0 "3"
+}
+
+
+@test "Snapshot: synchronize without previous snapshot" {
+    run vsd snapshot --database ${DATABASE}-missing --incremental
+    assert_fail
+    assert_output_contains "Error: No snapshot to synchronize, previous snapshot is kept"
+    rm -f ${DATABASE}-missing
+}
+
+
+@test "Find: reset" {
+    rm -f ${DATABASE}
+    command vsd free-api reset
+    command vsd free-api enterprises/92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e/domains --verb POST --key-value name:Domain --key-value parentType:enterprise --key-value parentID:92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e
+    command vsd free-api domains/255d9673-7281-43c4-be57-fdec677f6e07/zones --verb POST --key-value name:Zone --key-value parentType:domain --key-value parentID:255d9673-7281-43c4-be57-fdec677f6e07
+    command vsd free-api zones/255d9673-7281-43c4-be57-fdec677f6e07/subnets --verb POST --key-value name:Subnet-1 --key-value parentType:zone --key-value parentID:255d9673-7281-43c4-be57-fdec677f6e07
+    command vsd free-api subnets/255d9673-7281-43c4-be57-fdec677f6e07/vports --verb POST --key-value name:Vport-1 --key-value parentType:subnet --key-value parentID:255d9673-7281-43c4-be57-fdec677f6e07
+    command vsd free-api vports/255d9673-7281-43c4-be57-fdec677f6e07/virtualips --verb POST --key-value virtualIP:10.0.0.5 --key-value MAC:AA:BB:CC:DD:EE:FF --key-value externalID:vip-1 --key-value parentType:vport --key-value parentID:255d9673-7281-43c4-be57-fdec677f6e07
+    command vsd free-api vms --verb POST --key-value name:VM-1
+    command vsd free-api vms/255d9673-7281-43c4-be57-fdec677f6e07/vminterfaces --verb POST --key-value IPAddress:10.0.0.7 --key-value VPortID:255d9673-7281-43c4-be57-fdec677f6e07 --key-value parentType:vm --key-value parentID:255d9673-7281-43c4-be57-fdec677f6e07
+}
+
+
+@test "Find: ask the VSD without snapshot" {
+    run vsd --debug find 10.0.0.5 --database ${DATABASE}
+    assert_success
+    assert_output_contains "# No snapshot, asking the VSD"
+    assert_output_contains 'virtualIP == \"10.0.0.5\"'
+    assert_output_contains_in_table virtualips virtualIP "enterprises:nulab-1 > domains:Domain > zones:Zone > subnets:Subnet-1 > vports:Vport-1"
+    [ ! -e ${DATABASE} ]
+}
+
+
+@test "Find: show the vport of a VM interface without snapshot" {
+    run vsd find 10.0.0.7 --database ${DATABASE} --workers 2
+    assert_success
+    assert_output_contains_in_table vminterfaces IPAddress "enterprises:nulab-1 > domains:Domain > zones:Zone > subnets:Subnet-1 > vports:Vport-1"
+    assert_output_not_contains "vms:"
+    run vsd find Vport-1 --database ${DATABASE}
+    assert_success
+    assert_output_contains_in_table vports Vport-1 name "enterprises:nulab-1 > domains:Domain > zones:Zone > subnets:Subnet-1"
+    [ ! -e ${DATABASE} ]
+}
+
+
+@test "Find: an IP address in the snapshot" {
+    command vsd snapshot --database ${DATABASE}
+    run vsd --debug find 10.0.0.5 --database ${DATABASE}
+    assert_success
+    assert_output_not_contains "asking the VSD"
+    assert_output_not_contains "# URL"
+    assert_output_contains_in_table virtualips virtualIP "enterprises:nulab-1 > domains:Domain > zones:Zone > subnets:Subnet-1 > vports:Vport-1"
+}
+
+
+@test "Find: a MAC, a name or an externalID in the snapshot" {
+    run vsd find aa:bb:cc:dd:ee:ff --database ${DATABASE}
+    assert_success
+    assert_output_contains_in_table virtualips MAC
+    run vsd find vport-1 --database ${DATABASE}
+    assert_success
+    assert_output_contains_in_table vports Vport-1 name "enterprises:nulab-1 > domains:Domain > zones:Zone > subnets:Subnet-1"
+    run vsd find vip-1 --database ${DATABASE}
+    assert_success
+    assert_output_contains_in_table virtualips externalID
+}
+
+
+@test "Find: values beginning with a prefix" {
+    run vsd find 10.0. --prefix --database ${DATABASE}
+    assert_success
+    assert_output_contains_in_table virtualips virtualIP
+    run vsd find 10.0. --database ${DATABASE}
+    assert_success
+    assert_output_not_contains virtualips
+}
+
+
+@test "Find: only ask root collections without snapshot" {
+    rm -f ${DATABASE}
+    run vsd --debug find Vport-1 --database ${DATABASE}
+    assert_success
+    assert_output_contains_in_table vports Vport-1 name
+    assert_output_contains "# URL: ${VSD_API_URL}/nuage/api/v${VSD_API_VERSION}/vports"
+    [ "$(echo "$output" | grep -c 'X-Nuage-Filter')" == "16" ]
+    assert_output_not_contains "/dhcpoptions"
+    assert_output_not_contains "/vlans"
+    run vsd find 'Vport"1' --database ${DATABASE}
+    assert_fail
+    assert_line_equals -1 "Error: Values with double quotes can only be found in a snapshot"
+}
+
+
+@test "Find: show matches and failed lookups without snapshot" {
+    command vsd free-api vms/255d9673-7281-43c4-be57-fdec677f6e07/vminterfaces --verb POST --key-value IPAddress:10.0.0.9 --key-value VPortID:6e1b8c53-0000-4b4e-9c7d-unknownvport --key-value parentType:vm --key-value parentID:255d9673-7281-43c4-be57-fdec677f6e07
+    run vsd find 10.0.0.9 --database ${DATABASE}
+    assert_fail
+    assert_output_contains_in_table vminterfaces IPAddress
+    assert_line_equals -2 "Error: 1 lookups failed:"
+    assert_line_equals -1 "  vports/6e1b8c53-0000-4b4e-9c7d-unknownvport"
+}
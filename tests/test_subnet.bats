@@ -97,6 +97,17 @@ source common.bash
 }
 
 
+@test "Subnet: list with where on cidr" {
+    run vsd subnet-list --domain-id 255d9673-7281-43c4-be57-fdec677f6e07 --where 'cidr in 192.168.0.0/16'
+    assert_success
+    assert_output_contains 255d9673-7281-43c4-be57-fdec677f6e07
+
+    run vsd subnet-list --domain-id 255d9673-7281-43c4-be57-fdec677f6e07 --where 'cidr in 10.0.0.0/8 or name == "noSubnet"'
+    assert_success
+    assert_output_not_contains 255d9673-7281-43c4-be57-fdec677f6e07
+}
+
+
 @test "Subnet: show" {
     run vsd subnet-show 255d9673-7281-43c4-be57-fdec677f6e07
     assert_success
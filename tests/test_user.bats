@@ -184,3 +184,62 @@ source common.bash
     assert_success
     assert_output_empty
 }
+
+
+@test "Group: add many users with one request" {
+    run vsd --debug group-sync --group-id 255d9673-7281-43c4-be57-fdec677f6e07 --add-user user-a --add-user user-b
+    assert_success
+    [ "$(echo "$output" | grep -c '# Method: PUT')" == "1" ]
+    assert_output_contains_in_table 255d9673-7281-43c4-be57-fdec677f6e07 2 0 2
+
+    run vsd --debug group-sync --group-id 255d9673-7281-43c4-be57-fdec677f6e07 --add-user user-a
+    assert_success
+    [ "$(echo "$output" | grep -c '# Method: PUT')" == "0" ]
+    assert_output_contains_in_table 255d9673-7281-43c4-be57-fdec677f6e07 0 0 2
+}
+
+
+@test "Group: sync users from a file" {
+    run bash -c "printf '255d9673-7281-43c4-be57-fdec677f6e07 remove user-a\n\n# New user\n255d9673-7281-43c4-be57-fdec677f6e07 add user-c\n' | vsd group-sync --file -"
+    assert_success
+    assert_output_contains_in_table 255d9673-7281-43c4-be57-fdec677f6e07 1 1 2
+    run vsd free-api groups/255d9673-7281-43c4-be57-fdec677f6e07/users
+    assert_output_not_contains user-a
+    assert_output_contains user-b
+    assert_output_contains user-c
+
+    run bash -c "echo '255d9673-7281-43c4-be57-fdec677f6e07 user-c' | vsd group-sync --file -"
+    assert_fail
+    assert_line_equals -1 'Error: Line 1 of <stdin> is not <group ID> add|remove <user ID>'
+}
+
+
+@test "Group: sync exact list of users" {
+    run vsd group-sync --group-id 255d9673-7281-43c4-be57-fdec677f6e07 --add-user user-c --add-user user-d --exact
+    assert_success
+    assert_output_contains_in_table 255d9673-7281-43c4-be57-fdec677f6e07 1 1 2
+    run vsd free-api groups/255d9673-7281-43c4-be57-fdec677f6e07/users
+    assert_output_not_contains user-b
+    assert_output_contains user-d
+
+    run vsd group-sync --add-user user-c
+    assert_fail
+    assert_line_equals -1 'Error: You must specify --group-id or --file'
+}
+
+
+@test "Group: refuse to empty a group with exact list of users" {
+    run vsd --debug group-sync --group-id 255d9673-7281-43c4-be57-fdec677f6e07 --exact
+    assert_fail
+    assert_line_equals -1 'Error: --exact removes all users of 255d9673-7281-43c4-be57-fdec677f6e07: add users to them or use --allow-empty'
+    assert_output_not_contains '# Method'
+    run bash -c "echo '255d9673-7281-43c4-be57-fdec677f6e07 remove user-c' | vsd group-sync --file - --exact"
+    assert_fail
+    run vsd free-api groups/255d9673-7281-43c4-be57-fdec677f6e07/users
+    assert_output_contains user-c
+    assert_output_contains user-d
+
+    run vsd group-sync --group-id 255d9673-7281-43c4-be57-fdec677f6e07 --exact --allow-empty
+    assert_success
+    assert_output_contains_in_table 255d9673-7281-43c4-be57-fdec677f6e07 0 2 0
+}
@@ -35,6 +35,21 @@ source common.bash
 }
 
 
+@test "Pep8: vsd_cache.py" {
+    command pep8 --first ../open_vsdcli/vsd_cache.py
+}
+
+
+@test "Pep8: vsd_index.py" {
+    command pep8 --first ../open_vsdcli/vsd_index.py
+}
+
+
+@test "Pep8: vsd_filter.py" {
+    command pep8 --first ../open_vsdcli/vsd_filter.py
+}
+
+
 @test "VSD client: is available" {
     command -v vsd
 }
@@ -72,6 +87,30 @@ source common.bash
 }
 
 
+@test "VSD client: command index is up to date" {
+    run python -c "
+from open_vsdcli.vsd_index import COMMANDS, build_command_index
+print(build_command_index() == COMMANDS)"
+    assert_success
+    assert_line_equals 0 "True"
+}
+
+
+@test "VSD client: only import module of the command" {
+    run python -c "
+import sys
+from open_vsdcli import vsdcli
+sys.argv = ['vsd', 'vport-show', '--help']
+try:
+    vsdcli.main()
+except SystemExit:
+    pass
+print(sorted(m for m in sys.modules if m.startswith('open_vsdcli.vsd_')))"
+    assert_success
+    assert_line_equals -1 "['open_vsdcli.vsd_client', 'open_vsdcli.vsd_common', 'open_vsdcli.vsd_index', 'open_vsdcli.vsd_vport']"
+}
+
+
 @test "VSD client: request bag object" {
     run vsd enterprise-show bad-object
     assert_fail
@@ -133,6 +172,72 @@ source common.bash
 }
 
 
+@test "VSD client: APIKey file is keyed by VSD, user and enterprise" {
+    run cat ${APIKey}
+    assert_output_contains "\"test@test ${VSD_API_URL}/nuage/api/v${VSD_API_VERSION}/\""
+}
+
+
+@test "VSD client: do not use APIKey of another user" {
+    export VSD_USERNAME=date
+    run vsd --debug enterprise-list
+    assert_success
+    assert_output_contains "/nuage/api/v3_2/me"
+    run cat ${APIKey}
+    assert_output_contains "\"date@test ${VSD_API_URL}/"
+    assert_output_contains "\"test@test ${VSD_API_URL}/"
+}
+
+
+@test "VSD client: keep APIKey until near expiry" {
+    expiry=$(( ($(date +%s) + 3600) * 1000 ))
+    echo "{\"test@test ${VSD_API_URL}/nuage/api/v${VSD_API_VERSION}/\":" \
+         "{\"APIKey\": \"02a99c64\", \"APIKeyExpiry\": ${expiry}}}" > ${APIKey}
+    run vsd --debug enterprise-list
+    assert_success
+    assert_output_not_contains "/nuage/api/v3_2/me"
+}
+
+
+@test "VSD client: renew APIKey near expiry" {
+    expiry=$(( ($(date +%s) + 30) * 1000 ))
+    echo "{\"test@test ${VSD_API_URL}/nuage/api/v${VSD_API_VERSION}/\":" \
+         "{\"APIKey\": \"02a99c64\", \"APIKeyExpiry\": ${expiry}}}" > ${APIKey}
+    run vsd --debug enterprise-list
+    assert_success
+    assert_output_contains "/nuage/api/v3_2/me"
+}
+
+
+@test "VSD client: ignore APIKey file in former format" {
+    echo '{"APIKey": "02a99c64", "APIKeyExpiry": 0, "APIKeyCreation": 0}' > ${APIKey}
+    run vsd --debug enterprise-list
+    assert_success
+    assert_output_contains "/nuage/api/v3_2/me"
+}
+
+
+@test "VSD client: reuse connection between requests" {
+    run vsd --force-auth --pool-stats enterprise-list
+    assert_success
+    assert_output_contains "# Connections: 1 opened, 1 reused (2 requests)"
+}
+
+
+@test "VSD client: disable keep alive" {
+    run vsd --force-auth --pool-stats --no-keep-alive enterprise-list
+    assert_success
+    assert_output_contains "# Connections: 2 opened, 0 reused (2 requests)"
+}
+
+
+@test "VSD client: pool size must be positive" {
+    run vsd --pool-size 0 enterprise-list
+    assert_fail
+    assert_output_contains 'Invalid value for "--pool-size"'
+}
+
+
 @test "VSD client: make wrong authentication" {
     run vsd --vsd-username bad-user me-show
     assert_fail
@@ -157,6 +262,100 @@ source common.bash
 }
 
 
+@test "VSD client: fetch all pages one by one" {
+    run vsd --debug free-api enterprises --header X-Nuage-PageSize:1
+    assert_success
+    assert_output_contains '"X-Nuage-Page": "1"'
+    assert_output_contains '"name": "nulab-1"'
+    assert_output_contains '"name": "nulab-2"'
+}
+
+
+@test "VSD client: fetch pages concurrently in page order" {
+    run vsd --page-workers 4 free-api enterprises --header X-Nuage-PageSize:1
+    assert_success
+    [ $(echo "$output" | grep -n nulab-1 | cut -d: -f1) -lt \
+      $(echo "$output" | grep -n nulab-2 | cut -d: -f1) ]
+}
+
+
+@test "VSD client: set page size" {
+    run vsd --debug --page-size 1 enterprise-list
+    assert_success
+    assert_output_contains '"X-Nuage-PageSize": "1"'
+    assert_output_contains_in_table nulab-1
+    assert_output_contains_in_table nulab-2
+}
+
+
+@test "VSD client: iterate objects page by page" {
+    run python -c "
+from open_vsdcli.vsd_client import VSDConnection
+nc = VSDConnection('test', 'test', 'test', '${VSD_API_URL}',
+                   '${VSD_API_VERSION}', disable_proxy=True, force_auth=True)
+objects = nc.iter_get('enterprises', headers={'X-Nuage-PageSize': '1'})
+print('%s %s' % (next(objects)['name'], nc.requests_count))
+print('%s %s' % (next(objects)['name'], nc.requests_count))"
+    assert_success
+    assert_line_equals 0 "nulab-1 2"
+    assert_line_equals 1 "nulab-2 3"
+}
+
+
+@test "VSD client: renew APIKey expiring between pages" {
+    run python -c "
+import os
+from open_vsdcli import vsd_client
+nc = vsd_client.VSDConnection('test', 'test', 'test', '${VSD_API_URL}',
+                              '${VSD_API_VERSION}', disable_proxy=True,
+                              force_auth=True)
+objects = nc.iter_get('enterprises', headers={'X-Nuage-PageSize': '1'})
+print('%s %s' % (next(objects)['name'], nc.requests_count))
+vsd_client._api_sessions[nc.api_session_id]['APIKeyExpiry'] = 0
+os.remove(os.path.expanduser('~/.vsd/APIKey'))
+print('%s %s' % (next(objects)['name'], nc.requests_count))"
+    assert_success
+    assert_line_equals 0 "nulab-1 2"
+    assert_line_equals 1 "nulab-2 4"
+}
+
+
+@test "VSD client: filter does not leak into next request" {
+    run python -c "
+from open_vsdcli.vsd_client import VSDConnection
+nc = VSDConnection('test', 'test', 'test', '${VSD_API_URL}',
+                   '${VSD_API_VERSION}', disable_proxy=True)
+print(len(nc.get('enterprises', filter='nulab-1')))
+print(len(nc.get('enterprises')))"
+    assert_success
+    assert_line_equals 0 "1"
+    assert_line_equals 1 "2"
+}
+
+
+@test "VSD client: share connection between threads" {
+    run python -c "
+from multiprocessing.pool import ThreadPool
+from open_vsdcli.vsd_client import VSDConnection
+nc = VSDConnection('test', 'test', 'test', '${VSD_API_URL}',
+                   '${VSD_API_VERSION}', disable_proxy=True, force_auth=True,
+                   pool_size=4)
+
+def list_enterprise(name):
+    return [e['name'] for e in nc.get('enterprises', filter=name,
+                                      headers={'X-Nuage-PageSize': '1'})]
+
+names = ['nulab-%s' % (i % 2 + 1) for i in range(64)]
+results = ThreadPool(16).map(list_enterprise, names)
+print(all(r == [n] for r, n in zip(results, names)))
+print(nc.connection_stats())"
+    assert_success
+    assert_line_equals 0 "True"
+    assert_output_contains "'requests': 65"
+    assert_output_contains "'opened': 4"
+}
+
+
 @test "free-api: use with non-existing verb" {
     run vsd free-api enterprises --verb FALSE
     assert_fail
@@ -214,6 +413,38 @@ source common.bash
 }
 
 
+@test "free-api: copy raw response of all pages" {
+    run bash -c "vsd free-api enterprises --raw --header X-Nuage-PageSize:1 | python -c 'import json, sys; print([e[\"name\"] for e in json.load(sys.stdin)])'"
+    assert_success
+    assert_line_equals 0 "['nulab-1', 'nulab-2']"
+    run vsd free-api enterprises --raw --header X-Nuage-Filter:nothing
+    assert_success
+    assert_line_equals 0 "[]"
+}
+
+
+@test "free-api: raw is only available with GET" {
+    run vsd free-api enterprises --raw --verb POST
+    assert_fail
+    assert_line_equals -1 'Error: Use raw with GET verb only'
+}
+
+
+@test "VSD client: strip JSON array split in chunks" {
+    run python -c "
+from open_vsdcli.vsd_client import _strip_json_array
+for chunks in [[b' [{\"a\": [1]}, ', b'{\"b\": 2}]]', b'] \n'],
+               [b'[', b'{}', b']'], [b'[]'], [b'  '], [b'[[1]', b', [2]]']]:
+    print('|%s|' % b''.join(_strip_json_array(iter(chunks))).decode())"
+    assert_success
+    assert_line_equals 0 '|{"a": [1]}, {"b": 2}]]|'
+    assert_line_equals 1 '|{}|'
+    assert_line_equals 2 '||'
+    assert_line_equals 3 '||'
+    assert_line_equals 4 '|[1], [2]|'
+}
+
+
 @test "free-api: body needs to be a valid JSON" {
     run vsd free-api enterprises/255d9673-7281-43c4-be57-fdec677f6e07 --verb PUT --body '[{ "name": }]'
     assert_fail
@@ -226,3 +457,326 @@ source common.bash
     assert_fail
     assert_line_equals -1 'Error: Use body or key-value'
 }
+
+
+@test "VSD client: grow page size while pages are fast" {
+    command vsd free-api reset
+    for zone in 1 2 3 4 5 6 7; do
+        command vsd free-api enterprises/92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e/zones --verb POST --key-value name:Zone-${zone}
+    done
+    run vsd --debug --page-size 1 --adaptive-page-size zone-list
+    assert_success
+    assert_output_contains '"X-Nuage-PageSize": "4"'
+    for zone in 1 2 3 4 5 6 7; do
+        [ $(echo "$output" | grep -c "| *Zone-${zone} *|") -eq 1 ]
+    done
+}
+
+
+@test "VSD client: cache is not used by default" {
+    rm -f ~/.vsd/cache.db
+    command vsd enterprise-list
+    [ ! -f ~/.vsd/cache.db ]
+}
+
+
+@test "VSD client: reuse cached response" {
+    command vsd free-api reset
+    rm -f ~/.vsd/cache.db
+    command vsd --cache enterprise-list
+    [ -f ~/.vsd/cache.db ]
+    run vsd --cache --debug enterprise-list
+    assert_success
+    assert_line_equals 0 '# Response from cache: enterprises'
+    assert_output_contains 'nulab'
+    run vsd --no-cache --debug enterprise-list
+    assert_output_not_contains '# Response from cache'
+}
+
+
+@test "VSD client: refresh cached response" {
+    command vsd --cache enterprise-list
+    run vsd --refresh-cache --debug enterprise-list
+    assert_success
+    assert_output_not_contains '# Response from cache'
+}
+
+
+@test "VSD client: invalidate cached response on change" {
+    command vsd free-api reset
+    command vsd --cache enterprise-list
+    command vsd --cache enterprise-create cached-ent
+    run vsd --cache --debug enterprise-list
+    assert_success
+    assert_output_not_contains '# Response from cache'
+    assert_output_contains 'cached-ent'
+}
+
+
+@test "VSD client: do not cache fast changing objects" {
+    command vsd --cache free-api enterprises/92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e/zones
+    run vsd --cache --debug free-api enterprises/92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e/zones
+    assert_success
+    assert_output_not_contains '# Response from cache'
+}
+
+
+@test "VSD client: print list in json" {
+    command vsd free-api reset
+    run vsd --format json enterprise-list
+    assert_success
+    assert_line_equals 0 '['
+    assert_line_equals 1 '{"Enterprise ID": "92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e", "Name": "nulab-1"},'
+    assert_line_equals 2 '{"Enterprise ID": "5b2cc2f3-2b86-42ec-892d-edde741b2fd4", "Name": "nulab-2"}'
+    assert_line_equals 3 ']'
+    run vsd --format json enterprise-list --filter nothing
+    assert_success
+    assert_line_equals 0 '[]'
+}
+
+
+@test "VSD client: print list in jsonl" {
+    run vsd --format jsonl enterprise-list
+    assert_success
+    assert_line_equals 0 '{"Enterprise ID": "92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e", "Name": "nulab-1"}'
+    assert_line_equals 1 '{"Enterprise ID": "5b2cc2f3-2b86-42ec-892d-edde741b2fd4", "Name": "nulab-2"}'
+}
+
+
+@test "VSD client: print list in csv and tsv" {
+    run vsd --format csv enterprise-list
+    assert_success
+    assert_line_equals 0 'Enterprise ID,Name'
+    assert_line_equals 1 '92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e,nulab-1'
+    run env VSD_FORMAT=tsv vsd enterprise-list --filter nothing
+    assert_success
+    assert_line_equals 0 "$(printf 'Enterprise ID\tName')"
+    [ "${#lines[@]}" -eq 1 ]
+}
+
+
+@test "VSD client: print object in json" {
+    run vsd --format jsonl enterprise-show 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e
+    assert_success
+    assert_line_equals 0 '{"ID": "92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e", "description": "None", "enterpriseProfileID": "d63701e0-9246-4c7a-9f43-0c66d0fe45e3", "name": "nulab-1", "parentType": "null"}'
+    run vsd --format json enterprise-show 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e
+    assert_success
+    assert_line_equals 0 '{'
+    assert_line_equals 1 '    "ID": "92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e",'
+}
+
+
+@test "VSD client: print rows before next page is requested" {
+    run vsd --debug --page-size 1 --format jsonl enterprise-list
+    assert_success
+    row=$(echo "$output" | grep -n '"Name": "nulab-1"' | cut -d: -f1)
+    next_page=$(echo "$output" | grep -n '"X-Nuage-Page": "1"' | head -1 | cut -d: -f1)
+    [ "${row}" -lt "${next_page}" ]
+}
+
+
+@test "VSD client: reject unknown format" {
+    run vsd --format xml enterprise-list
+    assert_fail
+    assert_output_contains 'Invalid value for "--format"'
+}
+
+
+@test "VSD client: send conditions of where known by the VSD in filter" {
+    run vsd --debug enterprise-list --where 'name startswith "nulab" and name =~ "2$"'
+    assert_success
+    assert_output_contains '"X-Nuage-Filter": "name BEGINSWITH \"nulab\""'
+    assert_output_contains_in_table 5b2cc2f3-2b86-42ec-892d-edde741b2fd4 nulab-2
+    assert_output_not_contains_in_table nulab-1
+}
+
+
+@test "VSD client: combine filter and where" {
+    run vsd --debug enterprise-list --filter nulab --where 'name endswith "1"'
+    assert_success
+    assert_output_contains '"X-Nuage-Filter": "(nulab) and (name ENDSWITH \"1\")"'
+}
+
+
+@test "VSD client: evaluate other conditions of where on objects" {
+    run python -c "from open_vsdcli.vsd_filter import split_filter
+server, match = split_filter('(a == 1 or b != \"x\") and not c == 2 and '
+                             'net in 10.0.0.0/8 and d =~ \"^w\"')
+print(server)
+objects = [{'a': 1, 'net': '10.1.0.0/16', 'd': 'web'},
+           {'a': 1, 'net': '11.0.0.1', 'd': 'web'},
+           {'a': 1, 'net': '10.0.0.1', 'd': 'db'},
+           {'a': 1, 'c': 2, 'net': '10.0.0.1', 'd': 'web'}]
+print([match(o) for o in objects])
+server, match = split_filter('net in 2001:db8::/32')
+print([match({'net': n}) for n in ['2001:db8:1::/48', '2001:db9::1',
+                                   '10.0.0.1']])"
+    assert_success
+    assert_line_equals 0 '(a == 1 or b != "x")'
+    assert_line_equals 1 '[True, False, False, False]'
+    assert_line_equals 2 '[True, False, False]'
+}
+
+
+@test "VSD client: sort list" {
+    run vsd --debug --format csv enterprise-list --sort -name
+    assert_success
+    assert_output_contains '"X-Nuage-OrderBy": "name DESC"'
+    assert_line_equals -2 '5b2cc2f3-2b86-42ec-892d-edde741b2fd4,nulab-2'
+    assert_line_equals -1 '92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e,nulab-1'
+    run vsd --debug --format csv enterprise-list --sort=-description,-name
+    assert_success
+    assert_output_not_contains 'X-Nuage-OrderBy'
+    assert_line_equals -2 '5b2cc2f3-2b86-42ec-892d-edde741b2fd4,nulab-2'
+    assert_line_equals -1 '92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e,nulab-1'
+}
+
+
+@test "VSD client: reject invalid where and sort" {
+    run vsd enterprise-list --where 'name =='
+    assert_fail
+    assert_line_equals -1 'Error: Unexpected end of expression'
+    run vsd enterprise-list --where 'name =~ "("'
+    assert_fail
+    assert_output_contains 'Error: Invalid regular expression'
+    run vsd enterprise-list --sort 'name,'
+    assert_fail
+    assert_output_contains 'Error: Empty sort field'
+}
+
+
+@test "VSD client: stop paging once limit is reached" {
+    command vsd free-api reset
+    for zone in 1 2 3 4 5 6 7; do
+        command vsd free-api enterprises/92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e/zones --verb POST --key-value name:Zone-${zone}
+    done
+    run vsd --debug --page-size 2 zone-list --limit 5
+    assert_success
+    assert_output_contains '"X-Nuage-Page": "1"'
+    # Last request only asks for the missing object
+    assert_output_contains '"X-Nuage-Page": "4"'
+    assert_output_contains '"X-Nuage-PageSize": "1"'
+    assert_output_not_contains '"X-Nuage-Page": "2"'
+    assert_output_contains_in_table Zone-5
+    assert_output_not_contains_in_table Zone-6
+}
+
+
+@test "VSD client: fetch a single page" {
+    run vsd --debug zone-list --limit 3 --page 1
+    assert_success
+    assert_output_not_contains '"X-Nuage-Page": "0"'
+    assert_output_contains '"X-Nuage-PageSize": "3"'
+    assert_output_not_contains_in_table Zone-3
+    assert_output_contains_in_table Zone-4
+    assert_output_contains_in_table Zone-6
+    assert_output_not_contains_in_table Zone-7
+    run vsd --format jsonl zone-list --limit 2 --page 1 --where 'name =~ "[1357]"'
+    assert_success
+    assert_line_equals 0 '{"Zone ID": "255d9673-7281-43c4-be57-fdec677f6e07", "Name": "Zone-5"}'
+    assert_line_equals 1 '{"Zone ID": "255d9673-7281-43c4-be57-fdec677f6e07", "Name": "Zone-7"}'
+}
+
+
+@test "VSD client: order by and limit in one request" {
+    run vsd --debug zone-list --order-by 'name DESC' --limit 2
+    assert_success
+    assert_output_contains '"X-Nuage-OrderBy": "name DESC"'
+    assert_output_not_contains '"X-Nuage-Page": "1"'
+    assert_line_equals -3 '| 255d9673-7281-43c4-be57-fdec677f6e07 | Zone-7 |'
+    assert_line_equals -2 '| 255d9673-7281-43c4-be57-fdec677f6e07 | Zone-6 |'
+    run vsd zone-list --order-by 'name DESC' --sort name
+    assert_fail
+    assert_output_contains 'Error: Sort and order by can not be used together'
+}
+
+
+@test "VSD client: get a limited count of objects" {
+    run python -c "
+from open_vsdcli.vsd_client import VSDConnection
+nc = VSDConnection('test', 'test', 'test', '${VSD_API_URL}',
+                   '${VSD_API_VERSION}', disable_proxy=True, force_auth=True)
+print(len(nc.get('enterprises/92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e/zones',
+                 limit=3)))
+print(nc.requests_count)"
+    assert_success
+    assert_line_equals 0 "3"
+    assert_line_equals 1 "2"
+}
+
+
+@test "VSD client: count objects with a single request" {
+    run vsd --debug zone-list --count
+    assert_success
+    assert_output_contains '"X-Nuage-PageSize": "1"'
+    assert_output_not_contains '"X-Nuage-Page": "1"'
+    assert_line_equals -1 '7'
+    run vsd zone-list --count --filter Zone-3
+    assert_success
+    assert_line_equals 0 '1'
+    run vsd zone-list --count --where 'name =~ "[1357]"'
+    assert_success
+    assert_line_equals 0 '4'
+    run vsd zone-list --count --limit 5
+    assert_success
+    assert_line_equals 0 '5'
+    run vsd zone-list --count --limit 3 --page 2
+    assert_success
+    assert_line_equals 0 '1'
+    run python -c "
+from open_vsdcli.vsd_client import VSDConnection
+nc = VSDConnection('test', 'test', 'test', '${VSD_API_URL}',
+                   '${VSD_API_VERSION}', disable_proxy=True)
+print(nc.count('enterprises'))
+print(nc.count('enterprises', filter='name == \"nulab-2\"'))"
+    assert_success
+    assert_line_equals 0 '2'
+    assert_line_equals 1 '1'
+}
+
+
+@test "VSD client: resolve name:<path> references once" {
+    rm -f ${HOME}/.vsd/names.db
+    command vsd free-api enterprises/92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e/domains --verb POST --key-value name:Domain-names --key-value routeTarget:1:1 --key-value routeDistinguisher:1:1
+    run vsd --debug domain-show name:nulab-1/Domain-names
+    assert_success
+    [ "$(echo "$output" | grep -c '# URL: .*/enterprises$')" == "1" ]
+    [ "$(echo "$output" | grep -c '# URL: .*/enterprises/92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e/domains$')" == "1" ]
+    assert_output_contains_in_table name Domain-names
+    run vsd --debug domain-list --enterprise-id name:nulab-1
+    assert_success
+    [ "$(echo "$output" | grep -c '# URL: .*/enterprises$')" == "0" ]
+    assert_output_contains_in_table 255d9673-7281-43c4-be57-fdec677f6e07 Domain-names
+    [ "$(stat -c %a ${HOME}/.vsd/names.db)" == "600" ]
+    run vsd --debug --vsd-enterprise other domain-list --enterprise-id name:nulab-1
+    assert_success
+    [ "$(echo "$output" | grep -c '# URL: .*/enterprises$')" == "1" ]
+}
+
+
+@test "VSD client: forget names of modified collections" {
+    command vsd domain-list --enterprise-id name:nulab-1
+    command vsd free-api enterprises/5b2cc2f3-2b86-42ec-892d-edde741b2fd4 --verb PUT --key-value name:nulab-1
+    run vsd domain-list --enterprise-id name:nulab-1
+    assert_fail
+    assert_line_equals 0 "Error: Several enterprises named nulab-1: 5b2cc2f3-2b86-42ec-892d-edde741b2fd4, 92a76e6f-2ac4-43f2-8c1f-a052c5f4d90e"
+    command vsd free-api enterprises/5b2cc2f3-2b86-42ec-892d-edde741b2fd4 --verb PUT --key-value name:nulab-2
+    command vsd domain-show name:nulab-1/Domain-names
+    command vsd free-api domains/255d9673-7281-43c4-be57-fdec677f6e07 --verb DELETE
+    run vsd domain-show name:nulab-1/Domain-names
+    assert_fail
+    assert_line_equals 0 "Error: Cannot find domain named Domain-names"
+}
+
+
+@test "VSD client: reject unknown names and invalid paths" {
+    run vsd domain-show name:nulab-1/Nothing
+    assert_fail
+    assert_line_equals 0 "Error: Cannot find domain named Nothing"
+    run vsd domain-show name:nulab-1
+    assert_fail
+    assert_output_contains "Path of a domain is enterprise/domain"
+    run vsd vport-show name:a/b
+    assert_fail
+    assert_output_contains "Path of a vport is enterprise/l2domain/vport or enterprise/domain/zone/subnet/vport"
+}
@@ -14,6 +14,7 @@
 #    under the License.
 
 
+import re
 import sys
 from flask import Flask, request, make_response
 import json
@@ -23,6 +24,12 @@ app = Flask(__name__)
 
 database = {}
 
+# Parent of objects created below another one: (parent name, parent ID)
+parents = {}
+
+# IDs of the users of each group
+members = {}
+
 base_url="/nuage/api/v3_2/"
 
 def get_object_id(obj_name, key, value):
@@ -35,12 +42,56 @@ def get_object_id(obj_name, key, value):
     return {}
 
 
+FILTER_OPERATORS = {
+    '==': lambda value, literal: value == literal,
+    '!=': lambda value, literal: value != literal,
+    'CONTAINS': lambda value, literal: literal in value,
+    'BEGINSWITH': lambda value, literal: value.startswith(literal),
+    'ENDSWITH': lambda value, literal: value.endswith(literal),
+    '>': lambda value, literal: (is_number(value) and
+                                 float(value) > float(literal)),
+    '<': lambda value, literal: (is_number(value) and
+                                 float(value) < float(literal))}
+
+
+def is_number(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def parse_filter(filter):
+    """Return conditions of an expression `field OP "value" and ...`, or
+       None if filter is not such an expression"""
+    conditions = []
+    for part in filter.split(' and '):
+        match = re.match(r'^\(*(\w+) (%s) "?(.*?)"?\)*$' %
+                         '|'.join(re.escape(op) for op in FILTER_OPERATORS),
+                         part.strip())
+        if match is None:
+            return None
+        conditions.append(match.groups())
+    return conditions
+
+
+def object_key(obj_name, obj):
+    # Created objects share the same ID: identify them by their dict
+    return (obj_name, id(obj))
+
+
 def filter_objets(obj_name, filter):
     ret = []
     if obj_name not in database:
         return ret
     if filter is None:
         return database[obj_name]
+    conditions = parse_filter(filter)
+    if conditions is not None:
+        return [o for o in database[obj_name]
+                if all(FILTER_OPERATORS[op](str(o.get(field, '')), value)
+                       for field, op, value in conditions)]
     for object in database[obj_name]:
         for k in object.keys():
             if filter in object[k]:
@@ -49,9 +100,28 @@ def filter_objets(obj_name, filter):
     return ret
 
 
+def paginate(objects):
+    """Reply one page of objects with paging headers, as the VSD does"""
+    page_size = int(request.headers.get('X-Nuage-PageSize', 50))
+    page = int(request.headers.get('X-Nuage-Page', 0))
+    order_by = request.headers.get('X-Nuage-OrderBy')
+    if order_by:
+        field, order = order_by.split()
+        objects = sorted(objects, key=lambda o: o.get(field),
+                         reverse=order == 'DESC')
+    response = make_response(json.dumps(
+        objects[page * page_size:(page + 1) * page_size]))
+    response.headers['X-Nuage-Count'] = str(len(objects))
+    response.headers['X-Nuage-Page'] = str(page)
+    response.headers['X-Nuage-PageSize'] = str(page_size)
+    return response
+
+
 @app.route(base_url + "reset", methods=['GET'])
 def reset():
     database.clear()
+    parents.clear()
+    members.clear()
     database.update(
         {
             'enterprises':  [
@@ -175,7 +245,7 @@ def bag_object():
 @app.route(base_url + "<obj_name>", methods=['GET'])
 def object_list(obj_name):
     filter = request.headers.get('X-Nuage-Filter')
-    return json.dumps(filter_objets(obj_name, filter))
+    return paginate(filter_objets(obj_name, filter))
 
 
 @app.route(base_url + "<obj_name>/<obj_id>", methods=['GET'])
@@ -195,23 +265,39 @@ def get_object_list_with_parent(parent_name, parent_id, obj_name):
         return make_response(json.dumps(
             get_object_id('messages', 'name', 'not found')['message']), '404')
     filter = request.headers.get('X-Nuage-Filter')
-    return json.dumps(filter_objets(obj_name, filter))
+    # Objects created below another parent of the same type are not listed
+    objects = [o for o in filter_objets(obj_name, filter)
+               if parents.get(object_key(obj_name, o), (None,))[0] !=
+               parent_name or
+               parents[object_key(obj_name, o)][1] == parent_id]
+    return paginate(objects)
+
+
+@app.route(base_url + "groups/<obj_id>/users", methods=['GET'])
+def get_group_user_list(obj_id):
+    if get_object_id('groups', 'ID', obj_id) == {}:
+        return make_response(json.dumps(
+            get_object_id('messages', 'name', 'not found')['message']), '404')
+    # Users which are not in the database are only known by their ID
+    return paginate([get_object_id('users', 'ID', user_id) or
+                     {'ID': user_id}
+                     for user_id in members.get(obj_id, [])])
 
 
 @app.route(base_url + "groups/<obj_id>/users", methods=['PUT'])
 def update_group_user_list(obj_id):
-    # ToDo: Currently the server_mock doesn't do anything while we update
-    #       the list of users in the group. If you wan to implement this
-    #       mock method, you should at first fix the user-list mock: it
-    #       currently doesn't list user by group-id (mock of "vsd user-list
-    #       --group-id xD42x" currently doesn't work)
-    #
-    #       What we planned to do for a short term solution:
-    #       don't use mock server to test it and just add more checks on
-    #       the type of the parameters in the tests.
+    members[obj_id] = json.loads(request.data)
     return '{}'
 
 
+@app.after_request
+def honour_connection_close(response):
+    # Werkzeug keeps HTTP/1.1 connection open even if client asks to close
+    if request.headers.get('Connection', '').lower() == 'close':
+        response.headers['Connection'] = 'close'
+    return response
+
+
 def increment_id(id):
     """Increment each byte by one"""
     """111111 becomes 22222 and so on"""
@@ -399,6 +485,7 @@ def object_create_with_parent(parent_name, parent_id, obj_name):
     if obj_name not in database:
         database.update({obj_name: []})
     database[obj_name].append(data_update)
+    parents[object_key(obj_name, data_update)] = (parent_name, parent_id)
     return json.dumps([get_object_id(obj_name, 'ID', uuid)])
 
 
@@ -417,10 +504,14 @@ def object_delete(obj_name, obj_id):
         return make_response(json.dumps(
             get_object_id('messages', 'name', 'not found')['message']), '404')
     database[obj_name].remove(data_src)
+    parents.pop(object_key(obj_name, data_src), None)
     return '{}'
 
 
 if __name__ == "__main__":
+    from werkzeug.serving import WSGIRequestHandler
+    # Keep connections alive between requests like the VSD does
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
     if '--debug' in sys.argv:
         app.debug = True
-    app.run(host='127.0.0.1')
+    app.run(host='127.0.0.1', threaded=True)